@@ -1,5 +1,7 @@
 import asyncio
+import functools
 import threading
+import config
 from config import TELEGRAM_TOKEN
 import telebot
 from telegram.ext import Application, CommandHandler, CallbackContext
@@ -15,7 +17,38 @@ from handlers.posicion_handler import handle_posicion
 from handlers.registro_handler import handle_registro
 from handlers.visionado_handler import handle_visionado
 from handlers.promocion_handler import handle_promocion
-from database.db_connection import db_connection
+from database.db_connection import db_connection, check_pool_size
+from database.db_sql import start_answer_buffer, flush_answers, AnswerFlushError
+from database.migrations import ensure_schema, MigrationError
+from database.answer_events import ensure_event_tables
+from database.query_metrics import query_scope
+from handlers.tracing import trace_update, trace_methods, arrival_time
+from handlers.async_runtime import AsyncRuntime
+from handlers.webhook import WebhookRuntime
+from handlers.outbound import OutboundBot, create_sender, install_http_pool, OUTBOUND_ENABLED
+from handlers.chat_dispatcher import ChatDispatcher
+
+# Runtime del bot: 'async' (python-telegram-bot + pool de hilos), 'webhook' (POST de Telegram
+# a la app Flask + cola acotada) o 'polling' (telebot clásico)
+BOT_RUNTIME = getattr(config, "BOT_RUNTIME", "async")
+BOT_WORKERS = getattr(config, "BOT_WORKERS", 8)
+
+# Las actualizaciones de cada chat se procesan en orden en un mismo hilo
+dispatcher = ChatDispatcher(BOT_WORKERS)
+
+# Los manejadores no esperan a la Bot API: sus llamadas se encolan y se envían en
+# segundo plano respetando los límites de Telegram (ver handlers/outbound.py)
+if OUTBOUND_ENABLED:
+    install_http_pool()
+    sender = create_sender(bot)
+    telegram = OutboundBot(bot, sender)
+else:
+    sender = None
+    telegram = bot
+
+# Cada llamada a la Bot API es un tramo de la traza de la actualización
+trace_methods(telegram, ["send_message", "edit_message_text", "edit_message_reply_markup",
+                         "answer_callback_query", "delete_message"], "telegram")
 
 # Importar la aplicación Flask del dashboard
 from dashboard.app import app
@@ -29,57 +62,78 @@ def run_dashboard():
 
 # ========== MANEJADORES DE COMANDOS DE TELEBOT ==========
 
+def per_chat(handler):
+    """Ejecuta el manejador en el hilo del chat (serializado y en orden por chat_id)"""
+    def scoped(update, chat_id, received):
+        # Traza de la actualización; las sentencias SQL del comando cuentan juntas para detectar N+1
+        with trace_update(handler.__name__, chat_id, received), query_scope(f"bot.{handler.__name__}"):
+            return handler(update)
+
+    @functools.wraps(handler)
+    def wrapper(update):
+        received = arrival_time()
+        message = update.message if hasattr(update, "data") else update  # CallbackQuery o Message
+        return dispatcher.call(message.chat.id, scoped, update, message.chat.id, received)
+    return wrapper
+
+
 @bot.message_handler(commands=['jugar'])
+@per_chat
 def jugar_command(message):
     """Manejador del comando /jugar"""
     db = db_connection()
     try:
-        handle_jugar(bot, message, db)
+        handle_jugar(telegram, message, db)
     finally:
         db.close()
 
 
 @bot.message_handler(commands=['clasificacion'])
+@per_chat
 def clasificacion_command(message):
     """Manejador del comando /clasificacion"""
     db = db_connection()
     try:
-        handle_posicion(bot, message, db)
+        handle_posicion(telegram, message, db)
     finally:
         db.close()
 
 
 @bot.message_handler(commands=['registro'])
+@per_chat
 def registro_command(message):
     """Manejador del comando /registro"""
     db = db_connection()
     try:
-        handle_registro(bot, message, db)
+        handle_registro(telegram, message, db)
     finally:
         db.close()
 
 
 @bot.message_handler(commands=['misnumeros'])
+@per_chat
 def visionado_command(message):
     """Manejador del comando /misnumeros"""
     db = db_connection()
     try:
-        handle_visionado(bot, message, db)
+        handle_visionado(telegram, message, db)
     finally:
         db.close()
 
 
 @bot.message_handler(commands=['promocion'])
+@per_chat
 def promocion_command(message):
     """Manejador del comando /promocion"""
     db = db_connection()
     try:
-        handle_promocion(bot, message, db)
+        handle_promocion(telegram, message, db)
     finally:
         db.close()
 
 
 @bot.message_handler(commands=['start', 'ayuda'])
+@per_chat
 def help_command(message):
     """Manejador de comandos de ayuda e inicio"""
     help_text = """
@@ -99,14 +153,15 @@ o /jugar si ya estás registrado.
 
 ¡Buena suerte! 🍀
     """
-    bot.send_message(message.chat.id, help_text, parse_mode='Markdown')
+    telegram.send_message(message.chat.id, help_text, parse_mode='Markdown')
 
 
 # Manejador de botones inline (callbacks)
 @bot.callback_query_handler(func=lambda call: True)
+@per_chat
 def callback_handler(call):
     """Manejador de todos los callbacks de botones inline"""
-    callback_response(bot, call)
+    callback_response(telegram, call)
 
 
 # ========== FUNCIONES ASÍNCRONAS PARA PYTHON-TELEGRAM-BOT ==========
@@ -158,6 +213,38 @@ async def main_async():
     print("Comandos asíncronos configurados")
 
 
+# Comandos atendidos por los runtimes async y webhook (telebot usa sus decoradores)
+BOT_COMMANDS = {
+    'jugar': jugar_command,
+    'clasificacion': clasificacion_command,
+    'registro': registro_command,
+    'misnumeros': visionado_command,
+    'promocion': promocion_command,
+    'start': help_command,
+    'ayuda': help_command,
+}
+
+
+def build_async_runtime(base_url=None):
+    """
+    Crea el runtime asíncrono que atiende todos los comandos y callbacks
+    
+    Los manejadores son los mismos que usa telebot; se ejecutan en un pool
+    de BOT_WORKERS hilos para que las actualizaciones se sirvan en paralelo.
+    """
+    return AsyncRuntime(TELEGRAM_TOKEN, BOT_COMMANDS, callback_handler,
+                        workers=BOT_WORKERS, base_url=base_url, dispatcher=dispatcher)
+
+
+def build_webhook_runtime(**kwargs):
+    """
+    Crea el runtime de webhook y añade su ruta a la app Flask del dashboard
+
+    Hay que llamarlo antes de arrancar el servidor Flask (run_dashboard).
+    """
+    return WebhookRuntime(bot, BOT_COMMANDS, callback_handler, dispatcher, **kwargs).install(app)
+
+
 # ========== FUNCIÓN PRINCIPAL ==========
 
 if __name__ == '__main__':
@@ -167,9 +254,29 @@ if __name__ == '__main__':
     
     # Conectar a la base de datos para verificar conexión
     print('\n[1/3] Conectando a la base de datos...')
+    try:
+        check_pool_size(BOT_WORKERS)
+    except ValueError as e:
+        print(f'✗ {e}')
+        exit(1)
     db = db_connection()
-    if db and db.is_connected():
+    if db != -1 and db.is_connected():
         print('✓ Conexión a la base de datos exitosa')
+        try:
+            applied = ensure_schema(db)
+            if applied:
+                print(f'✓ Migraciones del esquema aplicadas: {", ".join(map(str, applied))}')
+        except MigrationError as e:
+            if e.applied:
+                print(f'✓ Migraciones del esquema aplicadas: {", ".join(map(str, e.applied))}')
+            print('⚠️ ' + '=' * 56)
+            print('⚠️ El esquema NO está al día; el bot arranca con estas migraciones pendientes:')
+            for version, name, error in e.failed or [(None, None, e)]:
+                print(f'⚠️   {version}: {name}: {error}' if version else f'⚠️   {error}')
+            print('⚠️ Corrígelo y aplica: python -m database.migrations migrate')
+            print('⚠️ ' + '=' * 56)
+        ensure_event_tables(db)
+        start_answer_buffer(db)
         db.close()
     else:
         print('✗ Error al conectar a la base de datos')
@@ -183,6 +290,15 @@ if __name__ == '__main__':
     except Exception as e:
         print(f'⚠️ Advertencia al configurar comandos: {e}')
     
+    # El webhook se sirve desde la misma app Flask: su ruta se añade antes de arrancarla
+    webhook = None
+    if BOT_RUNTIME == 'webhook':
+        try:
+            webhook = build_webhook_runtime()
+        except ValueError as e:
+            print(f'✗ {e}')
+            exit(1)
+
     # Iniciar el servidor Flask del dashboard en un hilo separado
     print('\n[3/3] Iniciando dashboard web...')
     dashboard_thread = threading.Thread(target=run_dashboard, daemon=True)
@@ -198,9 +314,23 @@ if __name__ == '__main__':
     print('\nPresiona Ctrl+C para detener el sistema\n')
     
     try:
-        bot.infinity_polling(timeout=60, long_polling_timeout=60)
+        if BOT_RUNTIME == 'async':
+            print(f'Runtime asíncrono con {BOT_WORKERS} hilos de trabajo')
+            build_async_runtime().run(poll_timeout=60)
+        elif BOT_RUNTIME == 'webhook':
+            webhook.set_webhook()
+            print(f'Webhook con {BOT_WORKERS} hilos de trabajo y política {webhook.policy} al saturarse')
+            dashboard_thread.join()
+        else:
+            bot.infinity_polling(timeout=60, long_polling_timeout=60)
     except KeyboardInterrupt:
         print('\n\nDeteniendo el sistema...')
+        try:
+            flush_answers()
+        except AnswerFlushError as e:
+            print(f'⚠️ Respuestas sin volcar (quedan en el diario): {e}')
+        if sender is not None:
+            sender.stop(timeout=10)
         print('¡Hasta luego!')
     except Exception as e:
         print(f'\n\n✗ Error en el bot: {e}')
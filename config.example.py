@@ -2,4 +2,96 @@ TELEGRAM_TOKEN = "YOUR_TELEGRAM_TOKEN_HERE"
 HOST = "localhost"
 USER = "db_user"
 PASSWORD = "db_password"
-DATABASE = "play_telegram_bot"
\ No newline at end of file
+DATABASE = "play_telegram_bot"
+
+# Pool de conexiones compartido por el bot y el dashboard
+POOL_SIZE = 10                  # Conexiones físicas máximas (>= BOT_WORKERS + 2)
+POOL_TIMEOUT = 5.0              # Segundos de espera máxima para obtener una conexión
+POOL_HEALTH_CHECK_IDLE = 30.0   # Ping a las conexiones que lleven más de N segundos ociosas
+
+# Runtime del bot: 'async' (python-telegram-bot + pool de hilos) o 'polling' (telebot)
+BOT_RUNTIME = "async"
+BOT_WORKERS = 8                 # Actualizaciones atendidas en paralelo (<= POOL_SIZE - 2)
+
+# Buffer de escritura diferida de respuestas (requiere índice único
+# (id_student, id_question) en student_question; si no existe se desactiva solo)
+ANSWER_BUFFER_ENABLED = True
+ANSWER_FLUSH_INTERVAL = 1.0     # Segundos máximos antes de volcar a la BD
+ANSWER_FLUSH_SIZE = 200         # Respuestas que disparan un volcado inmediato
+ANSWER_JOURNAL_PATH = "answer_journal.log"
+ANSWER_JOURNAL_FSYNC = True     # fsync del diario antes de confirmar cada respuesta (agrupado entre hilos)
+ANSWER_FLUSH_RETRIES = 3        # Reintentos de un lote ante errores transitorios (conexión, deadlock)
+ANSWER_FLUSH_RETRY_DELAY = 0.2  # Segundos antes del primer reintento (se duplican)
+ANSWER_DEAD_LETTER_PATH = "answer_dead_letter.log"  # Respuestas que la BD rechaza (revisar a mano)
+
+# Registro de eventos de respuesta (tablas mensuales answer_events_AAAAMM)
+ANSWER_EVENTS_ENABLED = True
+ANSWER_EVENTS_RETENTION_MONTHS = 3  # Meses sin compactar (python -m database.answer_events compact)
+ANSWER_EVENTS_CHUNK = 5000          # Filas por bloque al recorrer eventos
+
+# Caché de perfiles de estudiante (id, nombre, estado, nivel) por chat_id
+STUDENT_CACHE_TTL = 300         # Segundos de validez de cada perfil
+STUDENT_CACHE_SIZE = 50000      # Número máximo de perfiles en memoria
+
+# Banco de preguntas en memoria (se recarga tras cada cambio desde el dashboard)
+QUESTION_BANK_TTL = 300         # Segundos antes de recargar aunque no haya cambios
+
+# Sesiones de juego: 'sqlite' (sobreviven a un reinicio) o 'memory'
+SESSION_BACKEND = "sqlite"
+SESSION_DB_PATH = "quiz_sessions.db"
+SESSION_TTL = 24 * 3600         # Segundos sin actividad antes de descartar una partida
+SESSION_MAX_SIZE = 100000       # Partidas máximas guardadas
+SESSION_CACHE_SIZE = 10000      # Partidas en memoria delante de SQLite
+
+# Caché de resultados de las consultas del dashboard
+QUERY_CACHE_ENABLED = True
+QUERY_CACHE_SIZE = 256          # Resultados máximos en memoria (LRU)
+QUERY_CACHE_TTLS = {            # Segundos de validez por familia de consultas
+    "general": 300,
+    "actividad": 300,
+    "participantes": 120,
+    "preguntas": 120,
+    "estudiantes": 30,
+    "crud": 30,
+}
+QUERY_CACHE_ANSWERS_DEBOUNCE = 10   # Segundos mínimos entre invalidaciones por respuestas nuevas
+
+# Exportación columnar (requiere pyarrow): python -m database.export o /dashboard/export/<conjunto>
+EXPORT_DIR = "exports"
+EXPORT_FORMAT = "parquet"       # "parquet" o "arrow"
+EXPORT_CHUNK_SIZE = 10000       # Filas por bloque leído de MySQL (row group)
+DASHBOARD_EXPORT_DIR = "exports/_dashboard"   # Ficheros y marcas de agua propios de las descargas del dashboard
+
+# Instrumentación de consultas SQL (panel de Rendimiento y endpoint /metrics)
+QUERY_METRICS_ENABLED = True
+SLOW_QUERY_MS = 200             # Consultas más lentas se anotan en el registro de lentas
+SLOW_QUERY_LOG_SIZE = 100       # Consultas lentas que se guardan
+QUERY_N_PLUS_ONE_THRESHOLD = 4  # Repeticiones de una sentencia en un comando para avisar de N+1
+METRICS_TOKEN = None            # /metrics exige "Authorization: Bearer <token>"; sin token no se sirve
+
+# Trazas por actualización del bot (dashboard: Configuración > Trazas del bot)
+TRACING_ENABLED = True
+TRACE_SAMPLE_RATE = 0.05        # Fracción de actualizaciones normales que se guardan enteras
+TRACE_SLOW_MS = 1000            # Actualizaciones más lentas se guardan siempre
+TRACE_LOG_SIZE = 50             # Trazas guardadas en cada registro (lentas y muestra)
+
+# Runtime por webhook (BOT_RUNTIME = 'webhook'): Telegram envía las actualizaciones a la app Flask
+WEBHOOK_URL = None              # URL pública HTTPS que llega al puerto 5000, p. ej. "https://trivial.example.org"
+WEBHOOK_PATH = "/telegram/webhook"
+WEBHOOK_SECRET = None           # Token que Telegram envía en cada petición (obligatorio con webhook)
+WEBHOOK_QUEUE_SIZE = 1000       # Actualizaciones pendientes en total
+WEBHOOK_SHARD_QUEUE_SIZE = 200  # Pendientes por hilo de chats
+WEBHOOK_OVERLOAD_POLICY = "defer"  # 'defer' (503, Telegram reintenta) o 'drop' (se descarta)
+WEBHOOK_RETRY_AFTER = 5
+WEBHOOK_MAX_CONNECTIONS = 40
+
+# Envíos a Telegram en segundo plano (cola por chat, límites y reintentos tras 429)
+OUTBOUND_ENABLED = True
+OUTBOUND_WORKERS = 8            # Hilos de envío y conexiones HTTP persistentes
+OUTBOUND_GLOBAL_RATE = 30       # Mensajes/s del bot en total (límite de Telegram)
+OUTBOUND_CHAT_RATE = 1          # Mensajes/s sostenidos por chat
+OUTBOUND_CHAT_BURST = 5         # Ráfaga permitida por chat
+OUTBOUND_MAX_RETRIES = 3
+
+# Caché de preguntas ya renderizadas (texto Markdown y teclado) para enviarlas sin reconstruirlas
+QUESTION_RENDER_CACHE_SIZE = 5000
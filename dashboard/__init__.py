@@ -77,6 +77,10 @@ def create_dash_app(flask_app):
 
         # Importar callbacks específicos de componentes
         from dashboard.components import nivel_actividad
+
+        # Tablas con paginación en el servidor
+        from dashboard.components import participantes
+        from dashboard.components import preguntas
         
         print("Dashboard configurado correctamente con autenticación")
         
@@ -1,5 +1,26 @@
-from flask import Flask, render_template
+import hmac
+import os
+import tempfile
+import zipfile
+
+from flask import Flask, Response, render_template, request, send_file, abort
+import config
 from dashboard.__init__ import create_dash_app
+from database.export import export_dataset, ExportError, DATASETS, EXPORT_DIR
+from database.db_connection import get_pool_stats
+from database.db_sql import get_answer_buffer_stats
+from database.query_cache import query_cache
+from database.query_metrics import query_metrics, gauge_lines
+from handlers.outbound import get_outbound_stats
+
+
+# Token de /metrics (cabecera "Authorization: Bearer <token>"); sin token el endpoint no se sirve,
+# porque la app escucha en 0.0.0.0 y las métricas incluyen SQL, llamantes y estado del pool
+METRICS_TOKEN = getattr(config, "METRICS_TOKEN", None)
+
+# Directorio de las descargas del dashboard: su propia marca de agua, distinta de la de
+# las exportaciones programadas (python -m database.export), que así no se saltan filas
+DASHBOARD_EXPORT_DIR = getattr(config, "DASHBOARD_EXPORT_DIR", os.path.join(EXPORT_DIR, "_dashboard"))
 
 
 # Inicializar Flask
@@ -14,6 +35,73 @@ def home():
 
     return render_template("index.html")
 
+
+# Descarga de exportaciones columnares (protegida por el login del dashboard)
+@app.route("/dashboard/export/<dataset>")
+def descargar_exportacion(dataset):
+    if dataset not in DATASETS:
+        abort(404)
+    incremental = request.args.get("modo") == "incremental"
+    formato = request.args.get("formato", "parquet")
+    try:
+        resultado = export_dataset(dataset, incremental=incremental, export_dir=DASHBOARD_EXPORT_DIR,
+                                   export_format=formato)
+    except ExportError as e:
+        return str(e), 400
+
+    # El zip se escribe en un temporal en disco: la memoria no depende del tamaño
+    archivo = tempfile.TemporaryFile()
+    with zipfile.ZipFile(archivo, "w", zipfile.ZIP_STORED) as zf:
+        for ruta in resultado["ficheros"]:
+            zf.write(ruta, os.path.relpath(ruta, DASHBOARD_EXPORT_DIR))
+    archivo.seek(0)
+    return send_file(archivo, mimetype="application/zip", as_attachment=True,
+                     download_name=f"{dataset}-{resultado['modo']}.zip")
+
+
+# Ámbito de instrumentación SQL por petición (detección de patrones N+1)
+@app.before_request
+def abrir_ambito_sql():
+    if request.path.startswith("/dashboard/_dash-update-component"):
+        peticion = request.get_json(silent=True) or {}
+        query_metrics.begin_scope(f"dashboard.{peticion.get('output', '?')}")
+    elif not request.path.startswith(("/dashboard/_dash-", "/dashboard/assets/", "/assets/", "/metrics")):
+        query_metrics.begin_scope(f"flask.{request.endpoint}")
+
+
+@app.teardown_request
+def cerrar_ambito_sql(exc):
+    query_metrics.end_scope()
+
+
+# Métricas en formato de texto de Prometheus
+@app.route("/metrics")
+def metricas():
+    if not METRICS_TOKEN:
+        abort(404)
+    # Solo en la cabecera: un token en la URL acabaría en los registros de acceso
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(),
+                               f"Bearer {METRICS_TOKEN}".encode()):
+        abort(403)
+
+    lineas = [query_metrics.render_prometheus().rstrip("\n")]
+    pool = get_pool_stats()
+    lineas += gauge_lines("trivial_db_pool_in_use", "Conexiones del pool en uso", pool["in_use"])
+    lineas += gauge_lines("trivial_db_pool_open", "Conexiones físicas abiertas", pool["open"])
+    lineas += gauge_lines("trivial_db_pool_wait_seconds", "Tiempo total de espera por una conexión", pool["wait_time"])
+    lineas += gauge_lines("trivial_db_pool_timeouts", "Esperas del pool que agotaron el tiempo", pool["timeouts"])
+    cache = query_cache.stats()
+    lineas += gauge_lines("trivial_query_cache_hits", "Aciertos de la caché de consultas",
+                          {f'family="{f}"': d["hits"] for f, d in cache["families"].items()})
+    lineas += gauge_lines("trivial_query_cache_misses", "Fallos de la caché de consultas",
+                          {f'family="{f}"': d["misses"] for f, d in cache["families"].items()})
+    lineas += gauge_lines("trivial_answer_buffer_queue_depth", "Respuestas pendientes de volcar",
+                          get_answer_buffer_stats()["queue_depth"])
+    lineas += gauge_lines("trivial_telegram_outbound_queue", "Llamadas a la Bot API pendientes de enviar",
+                          get_outbound_stats()["en_cola"])
+    return Response("\n".join(lineas) + "\n", mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
 
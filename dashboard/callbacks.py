@@ -189,6 +189,14 @@ def register_callbacks(app):
             from dashboard.components.crud_estudiantes import create_crud_estudiantes_content
             return create_crud_estudiantes_content(), navbar, sidebar
         
+        elif pathname == "/dashboard/settings/rendimiento":
+            from dashboard.components.rendimiento import create_rendimiento_content
+            return create_rendimiento_content(), navbar, sidebar
+
+        elif pathname == "/dashboard/settings/trazas":
+            from dashboard.components.trazas import create_trazas_content
+            return create_trazas_content(), navbar, sidebar
+        
         # Página 404
         else:
             return html.Div([
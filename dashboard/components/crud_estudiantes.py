@@ -1,11 +1,15 @@
 from dash import html, dcc, dash_table, Input, Output, State, callback, no_update, ALL
 import dash_bootstrap_components as dbc
 from dashboard.data.estudiantes_queries import (
-    get_estudiantes_pendientes,
-    get_estudiantes_activos,
+    get_pagina_estudiantes_pendientes,
+    get_pagina_estudiantes_activos,
     aprobar_estudiante,
     cambiar_estado_estudiante
 )
+from dashboard.utils.server_table import page_count
+
+# Filas por página de las tablas del CRUD (se piden al servidor página a página)
+ESTUDIANTES_POR_PAGINA = 25
 
 def create_crud_estudiantes_content():
     """Crea el contenido del CRUD de estudiantes"""
@@ -35,7 +39,10 @@ def create_crud_estudiantes_content():
                         html.P("Estudiantes que han solicitado ingresar al juego", className="text-muted mb-0 small")
                     ], className="bg-warning text-dark"),
                     dbc.CardBody([
-                        html.Div(id="tabla-pendientes-container")
+                        html.Div(id="tabla-pendientes-container"),
+                        dbc.Pagination(id="paginacion-pendientes", max_value=1, active_page=1,
+                                       fully_expanded=False, first_last=True, previous_next=True,
+                                       size="sm", className="justify-content-center mb-0")
                     ])
                 ], className="mb-4"),
                 
@@ -46,7 +53,12 @@ def create_crud_estudiantes_content():
                         html.P("Gestión de estudiantes activos y dados de baja", className="text-muted mb-0 small")
                     ], className="bg-info text-white"),
                     dbc.CardBody([
-                        html.Div(id="tabla-activos-container")
+                        dbc.Input(id="buscar-estudiantes", type="search", debounce=True, size="sm",
+                                  placeholder="Buscar por nombre o email", className="mb-3"),
+                        html.Div(id="tabla-activos-container"),
+                        dbc.Pagination(id="paginacion-activos", max_value=1, active_page=1,
+                                       fully_expanded=False, first_last=True, previous_next=True,
+                                       size="sm", className="justify-content-center mb-0")
                     ])
                 ])
             ])
@@ -78,17 +90,30 @@ def create_crud_estudiantes_content():
 @callback(
     [Output('tabla-pendientes-container', 'children'),
      Output('tabla-activos-container', 'children'),
-     Output('student-states-store', 'data')],  
+     Output('student-states-store', 'data'),
+     Output('paginacion-pendientes', 'max_value'),
+     Output('paginacion-pendientes', 'active_page'),
+     Output('paginacion-activos', 'max_value'),
+     Output('paginacion-activos', 'active_page')],
     Input('refresh-estudiantes-btn', 'n_clicks'),
-    Input('notification-estudiantes', 'children')
+    Input('notification-estudiantes', 'children'),
+    Input('paginacion-pendientes', 'active_page'),
+    Input('paginacion-activos', 'active_page'),
+    Input('buscar-estudiantes', 'value')
 )     
-def refresh_tables(n_clicks, notification):
-    """Actualiza las tablas de estudiantes"""
+def refresh_tables(n_clicks, notification, pagina_pendientes, pagina_activos, busqueda):
+    """Actualiza las tablas de estudiantes (solo la página visible de cada una)"""
+    from dash import callback_context
+    
+    # Una búsqueda nueva vuelve a la primera página
+    if any(t['prop_id'].startswith('buscar-estudiantes') for t in callback_context.triggered):
+        pagina_activos = 1
     
     # Obtener datos
-    df_pendientes = get_estudiantes_pendientes()
-    print("DF Pendientes:", df_pendientes)
-    df_activos = get_estudiantes_activos()
+    pendientes = _pagina_valida(get_pagina_estudiantes_pendientes, pagina_pendientes)
+    activos = _pagina_valida(get_pagina_estudiantes_activos, pagina_activos, busqueda or "")
+    df_pendientes = pendientes['datos']
+    df_activos = activos['datos']
     
     # Crear diccionario con estados actuales
     states_dict = {}
@@ -109,7 +134,23 @@ def refresh_tables(n_clicks, notification):
     else:
         tabla_activos = create_tabla_activos(df_activos)
     
-    return tabla_pendientes, tabla_activos, states_dict  # ← RETORNAR ESTADOS
+    return (tabla_pendientes, tabla_activos, states_dict,  # ← RETORNAR ESTADOS
+            pendientes['paginas'], pendientes['pagina'], activos['paginas'], activos['pagina'])
+
+
+def _pagina_valida(get_pagina, pagina, *args):
+    """
+    Pide una página (numerada desde 1) y, si ya no existe porque la tabla ha
+    encogido, la última
+    """
+    pagina = max(1, pagina or 1)
+    datos = get_pagina(pagina - 1, ESTUDIANTES_POR_PAGINA, *args)
+    paginas = page_count(datos['total'], ESTUDIANTES_POR_PAGINA)
+    if pagina > paginas:
+        pagina = paginas
+        datos = get_pagina(pagina - 1, ESTUDIANTES_POR_PAGINA, *args)
+    datos.update({'pagina': pagina, 'paginas': paginas})
+    return datos
 
 
 def create_tabla_pendientes(df):
@@ -141,6 +141,8 @@ def create_sidebar():
                     html.Hr(),
                     dbc.NavLink("C.R.U.D. Preguntas", href="/dashboard/settings/preguntas", active="exact"),
                     dbc.NavLink("C.R.U.D Estudiantes", href="/dashboard/settings/estudiantes", active="exact"),
+                    dbc.NavLink("Rendimiento", href="/dashboard/settings/rendimiento", active="exact"),
+                    dbc.NavLink("Trazas del bot", href="/dashboard/settings/trazas", active="exact"),
                 ],
                 vertical=True,
                 pills=True,
@@ -5,13 +5,8 @@ import plotly.graph_objects as go
 from datetime import datetime
 import pandas as pd
 
-from dashboard.data.actividad_queries import (
-    get_actividad_por_periodo,
-    get_distribucion_actividad_periodo,
-    get_evolucion_diaria_mes,
-    get_comparacion_meses,
-    get_estadisticas_detalladas_periodo
-)
+from dashboard.data.actividad_queries import get_comparacion_meses
+from dashboard.data.periodo_analytics import analizar_periodo
 from dashboard.utils.date_utils import get_last_n_months, get_month_names
 
 
@@ -81,6 +76,18 @@ def create_nivel_actividad_content():
                     ], md=12)
                 ], className="mb-4"),
                 
+                # Actividad por hora del día (registro de eventos)
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("Actividad por Hora del Día"),
+                            dbc.CardBody([
+                                dcc.Graph(id='grafico-actividad-hora')
+                            ])
+                        ])
+                    ], md=12)
+                ], className="mb-4"),
+                
                 # Comparación histórica
                 dbc.Row([
                     dbc.Col([
@@ -107,6 +114,7 @@ def create_nivel_actividad_content():
      Output('grafico-distribucion-actividad', 'figure'),
      Output('tabla-distribucion-actividad', 'children'),
      Output('grafico-evolucion-diaria', 'figure'),
+     Output('grafico-actividad-hora', 'figure'),
      Output('grafico-comparacion-meses', 'figure'),
      Output('estadisticas-adicionales', 'children')],
     Input('selector-mes', 'value')
@@ -118,12 +126,14 @@ def update_nivel_actividad(periodo_seleccionado):
     año, mes = map(int, periodo_seleccionado.split('-'))
     nombre_mes = get_month_names()[mes]
     
-    # Obtener datos
-    actividad_periodo = get_actividad_por_periodo(mes, año)
-    distribucion, df_detalle = get_distribucion_actividad_periodo(mes, año)
-    evolucion_diaria = get_evolucion_diaria_mes(mes, año)
+    # Obtener datos (todos los paneles del mes salen de una única lectura)
+    periodo = analizar_periodo(mes, año)
+    actividad_periodo = periodo['actividad']
+    distribucion, df_detalle = periodo['distribucion'], periodo['detalle']
+    evolucion_diaria = periodo['evolucion_diaria']
+    actividad_hora = periodo['por_hora']
     comparacion_meses = get_comparacion_meses()
-    stats_detalladas = get_estadisticas_detalladas_periodo(mes, año)
+    stats_detalladas = periodo['estadisticas']
     
     # 1. Crear métricas principales
     metricas = dbc.Row([
@@ -259,6 +269,43 @@ def update_nivel_actividad(periodo_seleccionado):
             x=0.5, y=0.5, showarrow=False
         )
     
+    # Gráfico de actividad por hora
+    fig_hora = go.Figure()
+    if not actividad_hora.empty:
+        fig_hora.add_trace(go.Bar(
+            x=actividad_hora['hora'],
+            y=actividad_hora['respuestas'],
+            name='Respuestas',
+            marker_color='#6f42c1'
+        ))
+        fig_hora.add_trace(go.Scatter(
+            x=actividad_hora['hora'],
+            y=actividad_hora['porcentaje_acierto'],
+            mode='lines+markers',
+            name='% Acierto',
+            yaxis='y2',
+            line=dict(color='#28a745', width=2)
+        ))
+        fig_hora.update_layout(
+            title=f"Respuestas por Hora - {nombre_mes} {año}",
+            xaxis=dict(title="Hora", dtick=1),
+            yaxis_title="Respuestas",
+            yaxis2=dict(
+                title="% Acierto",
+                overlaying='y',
+                side='right',
+                range=[0, 100]
+            ),
+            hovermode='x unified',
+            height=350
+        )
+    else:
+        fig_hora.add_annotation(
+            text="Sin eventos de respuesta registrados para el período",
+            xref="paper", yref="paper",
+            x=0.5, y=0.5, showarrow=False
+        )
+    
     # 5. Gráfico de comparación de meses
     if not comparacion_meses.empty:
         fig_comparacion = go.Figure()
@@ -356,7 +403,7 @@ def update_nivel_actividad(periodo_seleccionado):
     ])
     
     return (metricas, fig_distribucion, tabla_distribucion, 
-            fig_evolucion, fig_comparacion, estadisticas_adicionales)
+            fig_evolucion, fig_hora, fig_comparacion, estadisticas_adicionales)
 
 
 def get_color_by_percentage(percentage):
@@ -1,16 +1,18 @@
-from dash import html, dcc, dash_table
+from dash import html, dcc, dash_table, Input, Output, callback
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 from dashboard.data.participantes_queries import (
     get_datos_participantes,
+    get_pagina_participantes,
     get_resumen_participantes,
     get_distribucion_actividad,
     get_top_participantes
 )
 
 from dashboard.components.tables import create_metric_card
+from dashboard.utils.server_table import FiltroNoSoportado, normalizar_orden, page_count
 
 
 def create_participantes_content():
@@ -217,10 +219,14 @@ def create_participantes_content():
                 dash_table.DataTable(
                     id='tabla-participantes',
                     columns=tabla_columns,
-                    data=df_participantes.to_dict('records'),
-                    sort_action="native",
-                    filter_action="native",
-                    page_action="native",
+                    # Paginación, orden y filtro en el servidor (actualizar_tabla_participantes)
+                    data=[],
+                    sort_action="custom",
+                    sort_mode="single",
+                    filter_action="custom",
+                    filter_query="",
+                    page_action="custom",
+                    page_current=0,
                     page_size=15,
                     style_table={'overflowX': 'auto'},
                     style_cell={
@@ -287,7 +293,8 @@ def create_participantes_content():
                     export_headers='display'
                 ),
                 html.Div([
-                    html.Small("Nota: Puede exportar los datos usando el botón 'Export' en la esquina superior derecha de la tabla", 
+                    html.Small("Nota: El botón 'Export' descarga la página visible; la exportación completa "
+                               "está en Configuración > Rendimiento",
                               className="text-muted mt-2")
                 ])
             ])
@@ -297,6 +304,25 @@ def create_participantes_content():
     return content
 
 
+@callback(
+    [Output('tabla-participantes', 'data'),
+     Output('tabla-participantes', 'page_count')],
+    [Input('tabla-participantes', 'page_current'),
+     Input('tabla-participantes', 'page_size'),
+     Input('tabla-participantes', 'sort_by'),
+     Input('tabla-participantes', 'filter_query')]
+)
+def actualizar_tabla_participantes(page_current, page_size, sort_by, filter_query):
+    """Devuelve la página visible de la tabla de participantes"""
+    try:
+        pagina = get_pagina_participantes(page_current or 0, page_size, normalizar_orden(sort_by), filter_query or "")
+    except FiltroNoSoportado as e:
+        print(f"[TABLAS] Filtro no soportado en participantes: {e}")
+        return [], 1
+    
+    return pagina['datos'].to_dict('records'), page_count(pagina['total'], page_size)
+
+
 def crear_tabla_ranking(df, tipo):
     """Crea una tabla simple para mostrar rankings"""
     if df.empty:
@@ -1,13 +1,15 @@
-from dash import html, dcc, dash_table
+from dash import html, dcc, dash_table, Input, Output, callback
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
 from dashboard.data.preguntas_queries import (
     get_estadisticas_preguntas, 
+    get_pagina_preguntas,
     get_resumen_preguntas,
     get_preguntas_por_asignatura,
     get_top_preguntas_faciles_dificiles
 )
+from dashboard.utils.server_table import FiltroNoSoportado, normalizar_orden, page_count
 
 
 def create_preguntas_content():
@@ -195,10 +197,14 @@ def create_preguntas_content():
                 dash_table.DataTable(
                     id='tabla-preguntas',
                     columns=tabla_columns,
-                    data=df_preguntas.to_dict('records'),
-                    sort_action="native",
-                    filter_action="native",
-                    page_action="native",
+                    # Paginación, orden y filtro en el servidor (actualizar_tabla_preguntas)
+                    data=[],
+                    sort_action="custom",
+                    sort_mode="single",
+                    filter_action="custom",
+                    filter_query="",
+                    page_action="custom",
+                    page_current=0,
                     page_size=20,
                     style_table={'overflowX': 'auto'},
                     style_cell={
@@ -249,6 +255,25 @@ def create_preguntas_content():
     return content
 
 
+@callback(
+    [Output('tabla-preguntas', 'data'),
+     Output('tabla-preguntas', 'page_count')],
+    [Input('tabla-preguntas', 'page_current'),
+     Input('tabla-preguntas', 'page_size'),
+     Input('tabla-preguntas', 'sort_by'),
+     Input('tabla-preguntas', 'filter_query')]
+)
+def actualizar_tabla_preguntas(page_current, page_size, sort_by, filter_query):
+    """Devuelve la página visible de la tabla de preguntas"""
+    try:
+        pagina = get_pagina_preguntas(page_current or 0, page_size, normalizar_orden(sort_by), filter_query or "")
+    except FiltroNoSoportado as e:
+        print(f"[TABLAS] Filtro no soportado en preguntas: {e}")
+        return [], 1
+    
+    return pagina['datos'].to_dict('records'), page_count(pagina['total'], page_size)
+
+
 def crear_tabla_top_preguntas(df, tipo):
     """Crea una tabla simple para mostrar top preguntas"""
     if df.empty:
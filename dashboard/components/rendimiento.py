@@ -0,0 +1,185 @@
+from dash import html
+import dash_bootstrap_components as dbc
+from dashboard.utils.db_utils import query_cache
+from dashboard.components.tables import create_metric_card, create_summary_table
+from database.db_connection import get_pool_stats
+from database.db_sql import get_answer_buffer_stats
+from database.student_cache import student_cache
+from database.question_bank import question_bank
+from database.export import DATASETS, load_state
+from database.query_metrics import query_metrics
+from handlers.outbound import get_outbound_stats
+from handlers.question_render import question_renders
+
+
+def create_rendimiento_content():
+    """Crea la vista de Rendimiento: caché de consultas, pool de conexiones y buffers"""
+
+    stats = query_cache.stats()
+
+    # Tabla de aciertos/fallos por familia de consultas
+    filas_familias = [
+        html.Tr([
+            html.Td(familia, className="fw-bold"),
+            html.Td(datos["hits"], className="text-end"),
+            html.Td(datos["misses"], className="text-end"),
+            html.Td(
+                f"{datos['hits'] / (datos['hits'] + datos['misses']) * 100:.1f}%"
+                if datos["hits"] + datos["misses"] else "-",
+                className="text-end"
+            ),
+            html.Td(f"{datos['ttl']} s", className="text-end")
+        ])
+        for familia, datos in stats["families"].items()
+    ]
+
+    tabla_familias = dbc.Card([
+        dbc.CardHeader("Caché de consultas por familia"),
+        dbc.CardBody([
+            dbc.Table([
+                html.Thead(html.Tr([
+                    html.Th("Familia"), html.Th("Aciertos", className="text-end"),
+                    html.Th("Fallos", className="text-end"), html.Th("% Acierto", className="text-end"),
+                    html.Th("TTL", className="text-end")
+                ])),
+                html.Tbody(filas_familias or [html.Tr(html.Td("Sin consultas todavía", colSpan=5))])
+            ], striped=True, hover=True, responsive=True, size="sm")
+        ])
+    ])
+
+    # Exportaciones columnares: última exportación y enlaces de descarga
+    estado_export = load_state()
+    filas_export = []
+    for conjunto, definicion in DATASETS.items():
+        ultima = estado_export.get(conjunto, {})
+        enlaces = [html.A("Completa", href=f"/dashboard/export/{conjunto}", className="me-2")]
+        if definicion["incremental"]:
+            enlaces.append(html.A("Incremental", href=f"/dashboard/export/{conjunto}?modo=incremental"))
+        filas_export.append(html.Tr([
+            html.Td(conjunto, className="fw-bold"),
+            html.Td(ultima.get("ultima_exportacion", "-")),
+            html.Td(ultima.get("filas", "-"), className="text-end"),
+            html.Td(ultima.get("marca_agua") or "-"),
+            html.Td(enlaces)
+        ]))
+
+    tabla_export = dbc.Card([
+        dbc.CardHeader("Exportación Parquet / Arrow"),
+        dbc.CardBody([
+            dbc.Table([
+                html.Thead(html.Tr([
+                    html.Th("Conjunto"), html.Th("Última exportación"), html.Th("Filas", className="text-end"),
+                    html.Th("Marca de agua"), html.Th("Descargar")
+                ])),
+                html.Tbody(filas_export)
+            ], striped=True, hover=True, responsive=True, size="sm")
+        ])
+    ])
+
+    # Instrumentación SQL: sentencias por llamante, consultas lentas y patrones N+1
+    sql = query_metrics.snapshot()
+    filas_sql = [
+        html.Tr([
+            html.Td(s["llamante"], className="fw-bold"),
+            html.Td(s["operacion"]),
+            html.Td(s["n"], className="text-end"),
+            html.Td(f"{s['total_ms']:.0f}", className="text-end"),
+            html.Td(f"{s['media_ms']:.2f}", className="text-end"),
+            html.Td(f"≤ {s['p95_ms']:.0f}", className="text-end"),
+            html.Td(s["filas_media"], className="text-end"),
+            html.Td(s["errores"], className="text-end text-danger" if s["errores"] else "text-end")
+        ])
+        for s in sql["statements"][:15]
+    ]
+
+    tabla_sql = dbc.Card([
+        dbc.CardHeader("Consultas SQL por función (ordenadas por tiempo total)"),
+        dbc.CardBody([
+            dbc.Table([
+                html.Thead(html.Tr([
+                    html.Th("Llamante"), html.Th("Tipo"), html.Th("Ejecuciones", className="text-end"),
+                    html.Th("Total ms", className="text-end"), html.Th("Media ms", className="text-end"),
+                    html.Th("p95 ms", className="text-end"), html.Th("Filas media", className="text-end"),
+                    html.Th("Errores", className="text-end")
+                ])),
+                html.Tbody(filas_sql or [html.Tr(html.Td("Sin consultas todavía", colSpan=8))])
+            ], striped=True, hover=True, responsive=True, size="sm"),
+            html.Small("Métricas completas en formato Prometheus en /metrics", className="text-muted")
+        ])
+    ])
+
+    tabla_lentas = dbc.Card([
+        dbc.CardHeader(f"Consultas lentas (≥ {query_metrics.slow_ms} ms)"),
+        dbc.CardBody([
+            dbc.Table([
+                html.Thead(html.Tr([html.Th("Cuándo"), html.Th("ms", className="text-end"),
+                                    html.Th("Llamante"), html.Th("Sentencia")])),
+                html.Tbody([
+                    html.Tr([html.Td(c["cuando"]), html.Td(c["ms"], className="text-end"),
+                             html.Td(c["llamante"]), html.Td(html.Code(c["sentencia"][:200]))])
+                    for c in sql["slow"][:20]
+                ] or [html.Tr(html.Td("Ninguna", colSpan=4))])
+            ], striped=True, responsive=True, size="sm")
+        ])
+    ])
+
+    tabla_n_plus_one = dbc.Card([
+        dbc.CardHeader(f"Posibles N+1 (misma sentencia ≥ {query_metrics.n_plus_one_threshold} veces por comando o petición)"),
+        dbc.CardBody([
+            dbc.Table([
+                html.Thead(html.Tr([html.Th("Ámbito"), html.Th("Veces", className="text-end"),
+                                    html.Th("Máx. repeticiones", className="text-end"), html.Th("Sentencia")])),
+                html.Tbody([
+                    html.Tr([html.Td(e["ambito"]), html.Td(e["veces"], className="text-end"),
+                             html.Td(e["max"], className="text-end"), html.Td(html.Code(e["sentencia"][:200]))])
+                    for e in sql["n_plus_one"][:20]
+                ] or [html.Tr(html.Td("Ninguno detectado", colSpan=4))])
+            ], striped=True, responsive=True, size="sm")
+        ])
+    ])
+
+    pool = get_pool_stats()
+    buffer = get_answer_buffer_stats()
+    perfiles = student_cache.stats()
+
+    return html.Div([
+        html.H2("Rendimiento", className="mb-4"),
+
+        # Métricas principales de la caché de consultas
+        dbc.Row([
+            dbc.Col(create_metric_card(f"{stats['hit_ratio'] * 100:.1f}%", "Acierto de caché", "success"), md=3),
+            dbc.Col(create_metric_card(stats["hits"], "Aciertos", "primary"), md=3),
+            dbc.Col(create_metric_card(stats["misses"], "Fallos", "warning"), md=3),
+            dbc.Col(create_metric_card(f"{stats['entries']}/{stats['max_entries']}", "Entradas", "info",
+                                       footer=f"{stats['evictions']} expulsadas · "
+                                              f"{stats['invalidations']} invalidaciones"), md=3),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(tabla_familias, md=12),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(create_summary_table(pool, "Pool de conexiones MySQL"), md=3),
+            dbc.Col(create_summary_table(buffer, "Buffer de respuestas"), md=3),
+            dbc.Col(create_summary_table(get_outbound_stats(), "Envíos a Telegram"), md=3),
+            dbc.Col(create_summary_table({
+                **{f"Perfiles: {k}": v for k, v in perfiles.items()},
+                "Versión del banco de preguntas": question_bank.version,
+                **{f"Preguntas renderizadas: {k}": v for k, v in question_renders.stats().items()}
+            }, "Cachés del bot"), md=3),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(tabla_sql, md=12),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(tabla_lentas, md=6),
+            dbc.Col(tabla_n_plus_one, md=6),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(tabla_export, md=12),
+        ])
+    ])
@@ -1,30 +1,38 @@
-from dash import dash_table
+from dash import dash_table, Input, Output, callback
 import dash_bootstrap_components as dbc
 from dash import html
 
+from dashboard.utils.server_table import FiltroNoSoportado, normalizar_orden, page_count
 
-def create_styled_datatable(df, columns, table_id, page_size=20, row_selectable=False):
+
+def create_styled_datatable(df, columns, table_id, page_size=20, row_selectable=False, server_side=False):
     """
     Crea una DataTable estilizada y consistente
     
     Args:
-        df: DataFrame con los datos
+        df: DataFrame con los datos (se ignora con server_side=True)
         columns: Lista de diccionarios con la configuración de columnas
         table_id: ID único para la tabla
         page_size: Número de filas por página
         row_selectable: Si las filas son seleccionables ('single', 'multi', False)
+        server_side: Si es True la tabla se crea vacía y con paginación, orden y
+                     filtro en el servidor; las páginas las envía el callback de
+                     register_server_datatable
     
     Returns:
         dash_table.DataTable configurada
     """
     
+    accion = "custom" if server_side else "native"
     return dash_table.DataTable(
         id=table_id,
         columns=columns,
-        data=df.to_dict('records'),
-        sort_action="native",
-        filter_action="native",
-        page_action="native",
+        data=[] if server_side else df.to_dict('records'),
+        sort_action=accion,
+        filter_action=accion,
+        page_action=accion,
+        filter_query="",
+        page_current=0,
         page_size=page_size,
         row_selectable=row_selectable,
         style_table={
@@ -60,6 +68,36 @@ def create_styled_datatable(df, columns, table_id, page_size=20, row_selectable=
     )
 
 
+def register_server_datatable(table_id, get_pagina):
+    """
+    Registra el callback que envía cada página a una tabla con server_side=True
+    
+    Args:
+        table_id: ID de la tabla
+        get_pagina: Función (page_current, page_size, sort_by, filter_query) que
+                    devuelve (DataFrame de la página, total de filas que cumplen el
+                    filtro), por ejemplo con consultar_pagina o paginar_dataframe
+    """
+    
+    @callback(
+        [Output(table_id, 'data'),
+         Output(table_id, 'page_count')],
+        [Input(table_id, 'page_current'),
+         Input(table_id, 'page_size'),
+         Input(table_id, 'sort_by'),
+         Input(table_id, 'filter_query')]
+    )
+    def actualizar_pagina(page_current, page_size, sort_by, filter_query):
+        try:
+            df, total = get_pagina(page_current or 0, page_size, normalizar_orden(sort_by), filter_query or "")
+        except FiltroNoSoportado as e:
+            print(f"[TABLAS] Filtro no soportado en {table_id}: {e}")
+            return [], 1
+        return df.to_dict('records'), page_count(total, page_size)
+    
+    return actualizar_pagina
+
+
 def create_summary_table(data_dict, title="Resumen"):
     """
     Crea una tabla de resumen con pares clave-valor
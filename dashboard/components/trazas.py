@@ -0,0 +1,139 @@
+from dash import html
+import dash_bootstrap_components as dbc
+from handlers.tracing import tracer, CATEGORIES
+
+
+# Color de cada tipo de tramo en el desglose y en la cascada
+COLORES = {
+    "recepcion": "#adb5bd",
+    "sesion": "#6f42c1",
+    "sql": "#0d6efd",
+    "telegram": "#fd7e14",
+    "propio": "#20c997",
+}
+
+NOMBRES = {
+    "recepcion": "Recepción",
+    "sesion": "Sesión",
+    "sql": "SQL",
+    "telegram": "Telegram",
+    "propio": "Propio",
+}
+
+
+def barra_desglose(porcentajes):
+    """Barra apilada con el porcentaje de tiempo de cada tipo de tramo"""
+    return html.Div([
+        html.Div(title=f"{NOMBRES[c]}: {porcentajes.get(c, 0):.1f}%",
+                 style={"width": f"{porcentajes.get(c, 0)}%", "backgroundColor": COLORES[c]})
+        for c in CATEGORIES
+    ], style={"display": "flex", "height": "14px", "minWidth": "160px", "borderRadius": "3px", "overflow": "hidden"})
+
+
+def cascada(traza):
+    """Tabla de tramos de una traza con su posición en el tiempo"""
+    total = traza["total_ms"] or 1
+    filas = []
+    for nombre, inicio, duracion, detalle in sorted(traza["tramos"], key=lambda t: t[1]):
+        categoria = nombre.split(".", 1)[0].split(" ", 1)[0]
+        filas.append(html.Tr([
+            html.Td(nombre, style={"whiteSpace": "nowrap"}),
+            html.Td(f"{duracion:.1f}", className="text-end"),
+            html.Td(html.Div(html.Div(style={
+                "marginLeft": f"{min(100, inicio / total * 100):.1f}%",
+                "width": f"{max(0.5, min(100, duracion / total * 100)):.1f}%",
+                "height": "10px",
+                "backgroundColor": COLORES.get(categoria, "#6c757d"),
+            }), style={"minWidth": "200px"})),
+            html.Td(html.Small(detalle or "", className="text-muted"))
+        ]))
+    if traza["descartados"]:
+        filas.append(html.Tr(html.Td(f"... {traza['descartados']} tramos más sin guardar", colSpan=4)))
+
+    return dbc.Table([
+        html.Thead(html.Tr([html.Th("Tramo"), html.Th("ms", className="text-end"),
+                            html.Th("Cascada"), html.Th("Detalle")])),
+        html.Tbody(filas)
+    ], size="sm", responsive=True, className="mb-0")
+
+
+def lista_trazas(trazas, vacio):
+    """Acordeón con una entrada por traza"""
+    if not trazas:
+        return html.P(vacio, className="text-muted")
+    return dbc.Accordion([
+        dbc.AccordionItem(
+            [
+                html.Div([barra_desglose({c: ms / (t["total_ms"] or 1) * 100 for c, ms in t["desglose"].items()}),
+                          html.Small(" · ".join(f"{NOMBRES[c]} {ms:.0f} ms" for c, ms in t["desglose"].items() if ms),
+                                     className="text-muted")],
+                         className="mb-2"),
+                html.P(t["error"], className="text-danger") if t["error"] else None,
+                cascada(t)
+            ],
+            title=f"{t['cuando']} · {t['manejador']} · chat {t['chat_id']} · {t['total_ms']:.0f} ms"
+        )
+        for t in trazas
+    ], start_collapsed=True, always_open=True)
+
+
+def create_trazas_content():
+    """Crea la vista de trazas del bot: tiempo por manejador y trazas lentas y muestreadas"""
+
+    datos = tracer.snapshot()
+
+    leyenda = html.Div([
+        html.Span([html.Span(style={"display": "inline-block", "width": "10px", "height": "10px",
+                                    "backgroundColor": COLORES[c], "marginRight": "4px"}),
+                   NOMBRES[c]], className="me-3")
+        for c in CATEGORIES
+    ], className="small mb-2")
+
+    filas = [
+        html.Tr([
+            html.Td(h["manejador"], className="fw-bold"),
+            html.Td(h["n"], className="text-end"),
+            html.Td(f"{h['media_ms']:.0f}", className="text-end"),
+            html.Td(f"{h['max_ms']:.0f}", className="text-end"),
+            html.Td(h["errores"], className="text-end text-danger" if h["errores"] else "text-end"),
+            html.Td(barra_desglose({c: h[f"{c}_pct"] for c in CATEGORIES}))
+        ])
+        for h in datos["handlers"]
+    ]
+
+    tabla_manejadores = dbc.Card([
+        dbc.CardHeader("Tiempo por manejador (todas las actualizaciones desde el arranque)"),
+        dbc.CardBody([
+            leyenda,
+            dbc.Table([
+                html.Thead(html.Tr([
+                    html.Th("Manejador"), html.Th("Actualizaciones", className="text-end"),
+                    html.Th("Media ms", className="text-end"), html.Th("Máx. ms", className="text-end"),
+                    html.Th("Errores", className="text-end"), html.Th("Dónde se va el tiempo")
+                ])),
+                html.Tbody(filas or [html.Tr(html.Td("Sin actualizaciones todavía", colSpan=6))])
+            ], striped=True, hover=True, responsive=True, size="sm")
+        ])
+    ])
+
+    return html.Div([
+        html.H2("Trazas del bot", className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(tabla_manejadores, md=12),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(dbc.Card([
+                dbc.CardHeader(f"Actualizaciones lentas (≥ {tracer.slow_ms} ms)"),
+                dbc.CardBody(lista_trazas(datos["slow"], "Ninguna actualización lenta"))
+            ]), md=12),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(dbc.Card([
+                dbc.CardHeader(f"Muestra de actualizaciones normales ({tracer.sample_rate:.0%})"),
+                dbc.CardBody(lista_trazas(datos["sampled"], "Sin muestras todavía"))
+            ]), md=12),
+        ])
+    ])
@@ -1,7 +1,11 @@
-from dashboard.utils.db_utils import execute_query_df, execute_scalar, execute_query, get_db_cursor
+from dashboard.utils.db_utils import execute_query_df, execute_scalar, execute_query, get_db_cursor, cached_query, query_cache
 import pandas as pd
+from database.question_bank import question_bank
+from database.answer_buffer import has_answer_unique_key
+from handlers.question_render import question_renders
 
 
+@cached_query("crud", tags=("answers", "questions"))
 def get_all_subjects():
     """Obtiene todas las asignaturas con sus datos"""
     query = """
@@ -20,9 +24,42 @@ def get_all_subjects():
     return execute_query_df(query)
 
 
+# Estadísticas por pregunta desde la tabla resumen (una fila de student_question por alumno y pregunta)
+_STATS_RESUMEN = """
+    SELECT
+        id_question,
+        participantes,
+        total_intentos,
+        total_intentos / NULLIF(participantes, 0) as media_intentos
+    FROM question_stats
+"""
+
+# Mismo agregado desde student_question (sin índice único puede haber filas repetidas)
+_STATS_AGREGADO = """
+    SELECT 
+        id_question,
+        COUNT(DISTINCT id_student) as participantes,
+        SUM(num_attempts) as total_intentos,
+        AVG(num_attempts) as media_intentos
+    FROM student_question
+    GROUP BY id_question
+"""
+
+
+def _question_stats_fiable():
+    """
+    question_stats solo reproduce AVG(num_attempts) si student_question tiene el
+    índice único (id_student, id_question), igual que exige el buffer de respuestas
+    """
+    with get_db_cursor() as cursor:
+        return has_answer_unique_key(cursor._connection)
+
+
+@cached_query("crud", tags=("answers", "questions"))
 def get_questions_by_subject(subject_id):
     """Obtiene las preguntas de una asignatura específica con estadísticas"""
-    query = """
+    stats = _STATS_RESUMEN if _question_stats_fiable() else _STATS_AGREGADO
+    query = f"""
     SELECT 
         q.id,
         q.id_subject,
@@ -42,15 +79,7 @@ def get_questions_by_subject(subject_id):
         COALESCE(stats.media_intentos, 0) as media_intentos
     FROM questions q
     JOIN subject s ON q.id_subject = s.id
-    LEFT JOIN (
-        SELECT 
-            id_question,
-            COUNT(DISTINCT id_student) as participantes,
-            SUM(num_attempts) as total_intentos,
-            AVG(num_attempts) as media_intentos
-        FROM student_question
-        GROUP BY id_question
-    ) stats ON q.id = stats.id_question
+    LEFT JOIN ({stats}) stats ON q.id = stats.id_question
     WHERE q.id_subject = %s
     ORDER BY q.id
     """
@@ -63,6 +92,7 @@ def update_subject_status(subject_id, status):
         query = "UPDATE subject SET status = %s WHERE id = %s"
         cursor.execute(query, (status, subject_id))
         cursor._connection.commit()
+        query_cache.invalidate("questions")
         return cursor.rowcount > 0
 
 
@@ -98,6 +128,8 @@ def create_question(data):
         )
         cursor.execute(query, params)
         cursor._connection.commit()
+        question_bank.invalidate()
+        query_cache.invalidate("questions")
         return cursor.rowcount > 0
 
 
@@ -125,6 +157,9 @@ def update_question(question_id, subject_id, data):
         )
         cursor.execute(query, params)
         cursor._connection.commit()
+        question_bank.invalidate()
+        question_renders.invalidate(subject_id, question_id)
+        query_cache.invalidate("questions")
         return cursor.rowcount > 0
 
 
@@ -150,9 +185,13 @@ def delete_question(question_id, subject_id):
             cursor.execute(query, (question_id, subject_id))
         
         cursor._connection.commit()
+        question_bank.invalidate()
+        question_renders.invalidate(subject_id, question_id)
+        query_cache.invalidate("questions")
         return cursor.rowcount > 0, count > 0
 
 
+@cached_query("crud", tags=("answers", "questions"))
 def get_question_details(question_id, subject_id):
     """Obtiene los detalles de una pregunta específica"""
     query = """
@@ -188,8 +227,12 @@ def delete_question(question_id):
             cursor.execute(query, (question_id, subject_id))
 
         cursor._connection.commit()
+        question_bank.invalidate()
+        question_renders.invalidate(subject_id, question_id)
+        query_cache.invalidate("questions")
         return cursor.rowcount > 0
     
+@cached_query("crud", tags=("answers", "questions"))
 def get_question_by_id(question_id, subject_id):
     """Obtiene los datos de una pregunta por ID"""
     query = """
@@ -238,6 +281,9 @@ def update_question(data):
         cursor.execute(query, params)
         affected = cursor.rowcount
         db.commit()
+        question_bank.invalidate()
+        question_renders.invalidate(question_id=data.get("id"))
+        query_cache.invalidate("questions")
         print(f"DEBUG update_question -> filas afectadas: {affected}")
         return affected > 0
     except Exception as e:
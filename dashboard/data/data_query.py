@@ -1,20 +1,23 @@
 from config import *
-from dashboard.utils.db_utils import execute_query, execute_query_df, execute_scalar
+from dashboard.utils.db_utils import execute_query, execute_query_df, execute_scalar, cached_query
 import pandas as pd
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_total_estudiantes():
     """Obtiene el número total de estudiantes"""
     query = "SELECT COUNT(*) FROM students"
     return execute_scalar(query) or 0
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_total_preguntas():
     """Obtiene el número total de preguntas"""
     query = "SELECT COUNT(*) FROM questions"
     return execute_scalar(query) or 0
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_estadisticas_intentos():
     """Obtiene estadísticas de intentos y aciertos"""
     query = """
@@ -65,6 +68,7 @@ def get_estadisticas_intentos():
     }
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_progreso_estudiantes():
     """Obtiene el progreso de los estudiantes"""
     total_preguntas = get_total_preguntas()
@@ -106,18 +110,19 @@ def get_progreso_estudiantes():
     })
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_actividad_por_mes():
     """Obtiene la actividad de estudiantes por mes"""
     query = """
     SELECT 
-        YEAR(last_attempt_date) as año,
-        MONTH(last_attempt_date) as mes,
+        YEAR(fecha) as año,
+        MONTH(fecha) as mes,
         COUNT(DISTINCT id_student) as estudiantes_activos,
-        COUNT(*) as preguntas_respondidas,
-        SUM(num_attempts) as total_intentos
-    FROM student_question
-    WHERE last_attempt_date IS NOT NULL
-    GROUP BY YEAR(last_attempt_date), MONTH(last_attempt_date)
+        SUM(respuestas) as preguntas_respondidas,
+        SUM(intentos) as total_intentos
+    FROM daily_activity
+    WHERE respuestas > 0
+    GROUP BY YEAR(fecha), MONTH(fecha)
     ORDER BY año DESC, mes DESC
     """
     
@@ -136,6 +141,7 @@ def get_actividad_por_mes():
     return df
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def progreso_estudiantes():
     """Función principal que retorna todos los datos necesarios para el dashboard general"""
     try:
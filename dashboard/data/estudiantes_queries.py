@@ -1,28 +1,58 @@
-from dashboard.utils.db_utils import execute_query_df, execute_query, get_db_cursor
+from dashboard.utils.db_utils import execute_query_df, execute_query, get_db_cursor, cached_query, query_cache
+from dashboard.utils.server_table import condicion_busqueda, consultar_pagina
+from database.student_cache import student_cache
 import pandas as pd
 from datetime import datetime
 
 
-def get_estudiantes_pendientes():
-    """
-    Obtiene todos los estudiantes con estado pendiente
-    """
-    query = """
-    SELECT DISTINCT
+_SELECT_PENDIENTES = """
         s.id,
         s.cid,
         s.name,
         s.email,
         MIN(ss.id) as fecha_registro
-    FROM students s
+"""
+
+_FROM_PENDIENTES = """
+    students s
     INNER JOIN student_subject ss ON s.id = ss.id_student
+"""
+
+_GROUP_BY_PENDIENTES = "s.id, s.cid, s.name, s.email"
+
+
+@cached_query("estudiantes", tags=("answers", "students"))
+def get_estudiantes_pendientes():
+    """
+    Obtiene todos los estudiantes con estado pendiente
+    """
+    query = f"""
+    SELECT DISTINCT {_SELECT_PENDIENTES}
+    FROM {_FROM_PENDIENTES}
     WHERE ss.state = 'P'
-    GROUP BY s.id, s.cid, s.name, s.email
+    GROUP BY {_GROUP_BY_PENDIENTES}
     ORDER BY MIN(ss.id) DESC
     """
     
-    df = execute_query_df(query)
+    return _fecha_registro(execute_query_df(query))
+
+
+@cached_query("estudiantes", tags=("answers", "students"))
+def get_pagina_estudiantes_pendientes(page_current, page_size):
+    """
+    Obtiene una página de estudiantes pendientes (paginación en el servidor)
     
+    Returns:
+        dict: {'datos': DataFrame de la página, 'total': estudiantes pendientes}
+    """
+    df, total = consultar_pagina(
+        _SELECT_PENDIENTES, _FROM_PENDIENTES, {}, page_current, page_size,
+        where="ss.state = 'P'", group_by=_GROUP_BY_PENDIENTES, clave="MIN(ss.id) DESC, s.id"
+    )
+    return {'datos': _fecha_registro(df), 'total': total}
+
+
+def _fecha_registro(df):
     # Simular fecha de registro basada en el ID (temporal)
     if not df.empty:
     #    df['fecha_registro'] = pd.to_datetime('2024-01-01') + pd.to_timedelta(df['fecha_registro'], unit='D')
@@ -31,35 +61,71 @@ def get_estudiantes_pendientes():
     return df
 
 
-def get_estudiantes_activos():
-    """
-    Obtiene todos los estudiantes activos o dados de baja con sus estadísticas
-    """
-    query = """
-    SELECT 
+_SELECT_ACTIVOS = """
         s.id,
         s.cid,
         s.name,
         s.email,
         ss.state,
-        COUNT(DISTINCT sq.id_question) as preguntas_respondidas,
+        COALESCE(MAX(st.preguntas_respondidas), 0) as preguntas_respondidas,
         CASE 
-            WHEN COUNT(sq.id) > 0 
-            THEN (SUM(CASE WHEN sq.first_attempt = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(sq.id))
+            WHEN MAX(st.preguntas_respondidas) > 0 
+            THEN (MAX(st.aciertos_primer_intento) * 100.0 / MAX(st.preguntas_respondidas))
             ELSE 0 
         END as porcentaje_acierto,
-        MAX(sq.last_attempt_date) as ultima_actividad
-    FROM students s
+        MAX(st.ultima_actividad) as ultima_actividad
+"""
+
+_FROM_ACTIVOS = """
+    students s
     INNER JOIN student_subject ss ON s.id = ss.id_student
-    LEFT JOIN student_question sq ON s.id = sq.id_student
+    LEFT JOIN student_stats st ON s.id = st.id_student
+"""
+
+_GROUP_BY_ACTIVOS = "s.id, s.cid, s.name, s.email, ss.state"
+
+# Columnas en las que busca el CRUD de estudiantes
+_BUSQUEDA_ESTUDIANTES = ('s.name', 's.email')
+
+
+@cached_query("estudiantes", tags=("answers", "students"))
+def get_estudiantes_activos():
+    """
+    Obtiene todos los estudiantes activos o dados de baja con sus estadísticas
+    """
+    query = f"""
+    SELECT {_SELECT_ACTIVOS}
+    FROM {_FROM_ACTIVOS}
     WHERE ss.state IN ('A', 'B')
-    GROUP BY s.id, s.cid, s.name, s.email, ss.state
+    GROUP BY {_GROUP_BY_ACTIVOS}
     ORDER BY s.name
     """
     
     return execute_query_df(query)
 
 
+@cached_query("estudiantes", tags=("answers", "students"))
+def get_pagina_estudiantes_activos(page_current, page_size, busqueda=""):
+    """
+    Obtiene una página de estudiantes activos o dados de baja (paginación en el servidor)
+    
+    Args:
+        page_current: Página (empezando en 0)
+        page_size: Filas por página
+        busqueda: Texto a buscar en nombre o email
+    
+    Returns:
+        dict: {'datos': DataFrame de la página, 'total': filas que cumplen la búsqueda}
+    """
+    condicion, params = condicion_busqueda(_BUSQUEDA_ESTUDIANTES, busqueda)
+    where = "ss.state IN ('A', 'B')" + (f" AND ({condicion})" if condicion else "")
+    df, total = consultar_pagina(
+        _SELECT_ACTIVOS, _FROM_ACTIVOS, {}, page_current, page_size,
+        where=where, params=params, group_by=_GROUP_BY_ACTIVOS, clave="s.name, s.id"
+    )
+    return {'datos': df, 'total': total}
+
+
 def aprobar_estudiante(student_id):
     """
     Aprueba un estudiante cambiando su estado de 'P' a 'A'
@@ -73,6 +139,8 @@ def aprobar_estudiante(student_id):
             """
             cursor.execute(query, (student_id,))
             cursor._connection.commit()
+            student_cache.invalidate(student_id=student_id)
+            query_cache.invalidate("students")
             return cursor.rowcount > 0
         except Exception as e:
             print(f"Error al aprobar estudiante: {e}")
@@ -93,6 +161,8 @@ def cambiar_estado_estudiante(student_id, nuevo_estado):
             """
             cursor.execute(query, (nuevo_estado, student_id))
             cursor._connection.commit()
+            student_cache.invalidate(student_id=student_id)
+            query_cache.invalidate("students")
             return cursor.rowcount > 0
         except Exception as e:
             print(f"Error al cambiar estado del estudiante: {e}")
@@ -100,6 +170,7 @@ def cambiar_estado_estudiante(student_id, nuevo_estado):
             return False
 
 
+@cached_query("estudiantes", tags=("answers", "students"))
 def get_estadisticas_estudiantes():
     """
     Obtiene estadísticas generales de estudiantes
@@ -127,6 +198,7 @@ def get_estadisticas_estudiantes():
     }
 
 
+@cached_query("estudiantes", tags=("answers", "students"))
 def get_historial_estudiante(student_id):
     """
     Obtiene el historial completo de un estudiante
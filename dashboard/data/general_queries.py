@@ -1,8 +1,9 @@
-from dashboard.utils.db_utils import execute_query_df, execute_scalar
+from dashboard.utils.db_utils import execute_query_df, execute_scalar, cached_query
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, date
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_actividad_mensual_anual():
     """
     Obtiene la actividad mensual para el año actual
@@ -13,23 +14,24 @@ def get_actividad_mensual_anual():
     query = """
     SELECT 
         m.mes,
-        COALESCE(COUNT(DISTINCT student_question.id_student), 0) as estudiantes_activos,
-        COALESCE(COUNT(student_question.id), 0) as preguntas_respondidas,
-        COALESCE(SUM(student_question.num_attempts), 0) as total_intentos
+        COALESCE(COUNT(DISTINCT da.id_student), 0) as estudiantes_activos,
+        COALESCE(SUM(da.respuestas), 0) as preguntas_respondidas,
+        COALESCE(SUM(da.intentos), 0) as total_intentos
     FROM (
         SELECT 1 as mes UNION SELECT 2 UNION SELECT 3 UNION 
         SELECT 4 UNION SELECT 5 UNION SELECT 6 UNION 
         SELECT 7 UNION SELECT 8 UNION SELECT 9 UNION 
         SELECT 10 UNION SELECT 11 UNION SELECT 12
     ) m
-    LEFT JOIN student_question ON 
-        MONTH(student_question.last_attempt_date) = m.mes 
-        AND YEAR(student_question.last_attempt_date) = %s
+    LEFT JOIN daily_activity da ON 
+        MONTH(da.fecha) = m.mes 
+        AND da.fecha BETWEEN %s AND %s
+        AND da.respuestas > 0
     GROUP BY m.mes
     ORDER BY m.mes
     """
     
-    df = execute_query_df(query, (año_actual,))
+    df = execute_query_df(query, (date(año_actual, 1, 1), date(año_actual, 12, 31)))
     
     # Nombres de meses
     meses = {
@@ -43,6 +45,7 @@ def get_actividad_mensual_anual():
     return df
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_resumen_general():
 
     """
@@ -77,6 +80,7 @@ def get_resumen_general():
     }
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_top_asignaturas():
     """
     Obtiene las top 5 asignaturas con más actividad
@@ -100,19 +104,21 @@ def get_top_asignaturas():
     return execute_query_df(query)
 
 
+@cached_query("general", tags=("answers", "students", "questions"))
 def get_evolucion_diaria_ultima_semana():
     """
     Obtiene la evolución diaria de actividad en la última semana
     """
     query = """
     SELECT 
-        DATE(last_attempt_date) as fecha,
-        COUNT(DISTINCT id_student) as estudiantes_activos,
-        COUNT(*) as preguntas_respondidas,
-        SUM(num_attempts) as intentos_totales
-    FROM student_question
-    WHERE last_attempt_date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-    GROUP BY DATE(last_attempt_date)
+        fecha,
+        COUNT(*) as estudiantes_activos,
+        SUM(respuestas) as preguntas_respondidas,
+        SUM(intentos) as intentos_totales
+    FROM daily_activity
+    WHERE fecha >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+        AND respuestas > 0
+    GROUP BY fecha
     ORDER BY fecha DESC
     """
     
@@ -1,17 +1,11 @@
-from dashboard.utils.db_utils import execute_query_df, execute_scalar
+from dashboard.utils.db_utils import execute_query_df, execute_scalar, cached_query
+from dashboard.utils.server_table import FiltroNoSoportado, consultar_pagina, paginar_dataframe
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
 
-def get_datos_participantes():
-    """
-    Obtiene datos detallados de todos los participantes
-    """
-    # Primero obtenemos el total de preguntas
-    total_preguntas = execute_scalar("SELECT COUNT(*) FROM questions WHERE state = 'A'")
-    
-    query = """
-    SELECT 
+_SELECT_PARTICIPANTES = """
         s.id,
         s.name as nombre,
         s.email,
@@ -19,74 +13,158 @@ def get_datos_participantes():
         COALESCE(stats.preguntas_retiradas, 0) as preguntas_retiradas,
         COALESCE(stats.total_intentos, 0) as total_intentos,
         COALESCE(stats.aciertos_primer_intento, 0) as aciertos_primer_intento,
-        COALESCE(stats.total_primer_intento, 0) as total_primer_intento,
+        COALESCE(stats.preguntas_respondidas, 0) as total_primer_intento,
         COALESCE(stats.aciertos_segundo_intento, 0) as aciertos_segundo_intento,
         COALESCE(stats.total_segundo_intento, 0) as total_segundo_intento,
         stats.ultima_actividad,
         stats.primera_actividad,
         DATEDIFF(CURDATE(), stats.ultima_actividad) as dias_inactivo
-    FROM students s
-    LEFT JOIN (
-        SELECT 
-            id_student,
-            COUNT(DISTINCT id_question) as preguntas_respondidas,
-            COUNT(DISTINCT CASE WHEN (num_attempts - mistake_number >= 2) THEN id_question END) as preguntas_retiradas,
-            SUM(num_attempts) as total_intentos,
-            SUM(CASE WHEN first_attempt = 1 THEN 1 ELSE 0 END) as aciertos_primer_intento,
-            COUNT(CASE WHEN num_attempts >= 1 THEN 1 END) as total_primer_intento,
-            SUM(CASE WHEN second_attempt = 1 THEN 1 ELSE 0 END) as aciertos_segundo_intento,
-            COUNT(CASE WHEN num_attempts >= 2 THEN 1 END) as total_segundo_intento,
-            MAX(last_attempt_date) as ultima_actividad,
-            MIN(first_attempt_date) as primera_actividad
-        FROM student_question
-        GROUP BY id_student
-    ) stats ON s.id = stats.id_student
+"""
+
+_FROM_PARTICIPANTES = """
+    students s
+    LEFT JOIN student_stats stats ON s.id = stats.id_student
+"""
+
+# Columnas de la tabla que se pueden filtrar y ordenar en SQL (el resto se calcula en pandas)
+_COLUMNAS_SQL_PARTICIPANTES = {
+    'nombre': 's.name',
+    'email': 's.email',
+    'preguntas_respondidas': 'COALESCE(stats.preguntas_respondidas, 0)',
+    'preguntas_retiradas': 'COALESCE(stats.preguntas_retiradas, 0)',
+    'dias_inactivo': 'DATEDIFF(CURDATE(), stats.ultima_actividad)',
+}
+
+
+@cached_query("participantes", tags=("answers", "students", "questions"))
+def get_datos_participantes():
+    """
+    Obtiene datos detallados de todos los participantes
+    """
+    # Primero obtenemos el total de preguntas
+    total_preguntas = execute_scalar("SELECT COUNT(*) FROM questions WHERE state = 'A'")
+    
+    query = f"""
+    SELECT {_SELECT_PARTICIPANTES}
+    FROM {_FROM_PARTICIPANTES}
     ORDER BY s.name
     """
     
     df = execute_query_df(query)
     
     if not df.empty:
-        # Calcular progreso
-        df['progreso'] = df.apply(lambda row: calcular_progreso(
-            row['preguntas_respondidas'], 
-            total_preguntas, 
-            row['dias_inactivo']
-        ), axis=1)
-        
-        # Calcular nivel de actividad
-        df['actividad'] = df.apply(lambda row: calcular_nivel_actividad(
-            row['preguntas_respondidas'],
-            total_preguntas,
-            row['primera_actividad'],
-            row['ultima_actividad']
-        ), axis=1)
-        
-        # Calcular porcentajes de acierto
-        df['porcentaje_primer_intento'] = df.apply(
-            lambda x: round((x['aciertos_primer_intento'] / x['total_primer_intento']) * 100, 1) 
-            if x['total_primer_intento'] > 0 else 0, 
-            axis=1
-        )
-        
-        df['porcentaje_segundo_intento'] = df.apply(
-            lambda x: round((x['aciertos_segundo_intento'] / x['total_segundo_intento']) * 100, 1) 
-            if x['total_segundo_intento'] > 0 else 0, 
-            axis=1
+        df = calcular_metricas_participantes(df, total_preguntas)
+    
+    return df
+
+
+@cached_query("participantes", tags=("answers", "students", "questions"))
+def get_pagina_participantes(page_current, page_size, sort_by=(), filter_query=""):
+    """
+    Obtiene una página de la tabla de participantes (paginación en el servidor)
+    
+    Si el filtro y el orden solo usan columnas de _COLUMNAS_SQL_PARTICIPANTES la
+    página se pide con LIMIT/OFFSET y las métricas se calculan solo para sus filas;
+    si usan columnas derivadas (progreso, porcentajes...) se corta el DataFrame
+    cacheado de get_datos_participantes.
+    
+    Args:
+        page_current: Página (empezando en 0)
+        page_size: Filas por página
+        sort_by: Tupla de (columna, 'asc'|'desc') (ver normalizar_orden)
+        filter_query: filter_query de la DataTable
+    
+    Returns:
+        dict: {'datos': DataFrame de la página, 'total': filas que cumplen el filtro}
+    """
+    try:
+        df, total = consultar_pagina(
+            _SELECT_PARTICIPANTES, _FROM_PARTICIPANTES, _COLUMNAS_SQL_PARTICIPANTES,
+            page_current, page_size, sort_by, filter_query, clave="s.name, s.id"
         )
-        
-        df['diferencia_porcentajes'] = df['porcentaje_segundo_intento'] - df['porcentaje_primer_intento']
-        
-        # Porcentaje de preguntas completadas
-        df['porcentaje_completado'] = (df['preguntas_respondidas'] / total_preguntas * 100).round(1)
-        df['porcentaje_retiradas'] = (df['preguntas_retiradas'] / total_preguntas * 100).round(1)
-        
-        # Total de preguntas para el desempeño
-        df['total_preguntas'] = total_preguntas
+        if not df.empty:
+            total_preguntas = execute_scalar("SELECT COUNT(*) FROM questions WHERE state = 'A'")
+            df = calcular_metricas_participantes(df, total_preguntas)
+    except FiltroNoSoportado:
+        df, total = paginar_dataframe(get_datos_participantes(), page_current, page_size, sort_by, filter_query)
+    
+    return {'datos': df, 'total': total}
+
+
+def calcular_metricas_participantes(df, total_preguntas):
+    """
+    Añade las métricas derivadas de cada participante operando por columnas
+    
+    Equivale a aplicar calcular_progreso, calcular_nivel_actividad y los
+    porcentajes de acierto fila a fila, pero sin recorrer el DataFrame.
+    
+    Args:
+        df: DataFrame con las columnas de get_datos_participantes
+        total_preguntas: Número de preguntas activas
+    
+    Returns:
+        pd.DataFrame: El mismo DataFrame con las columnas nuevas
+    """
+    respondidas = df['preguntas_respondidas'].astype(float)
+    dias_inactivo = pd.to_numeric(df['dias_inactivo'], errors='coerce')
+    
+    # Calcular progreso (mismo orden de condiciones que calcular_progreso)
+    df['progreso'] = _select([
+        respondidas == 0,
+        respondidas >= total_preguntas,
+        dias_inactivo > 7
+    ], ["No ha comenzado", "Completado", "Riesgo de abandono"], "Progresando", df.index)
+    
+    # Calcular nivel de actividad (ver calcular_nivel_actividad)
+    primera = pd.to_datetime(df['primera_actividad'])
+    ultima = pd.to_datetime(df['ultima_actividad'])
+    con_fechas = primera.notna() & ultima.notna()
+    dias_activo = ((ultima - primera).dt.days + 1).fillna(1)
+    dias_activo = dias_activo.mask(dias_activo == 0, 1)
+    preguntas_esperadas = np.minimum(dias_activo, total_preguntas)
+    ratio_actividad = respondidas / preguntas_esperadas * 100
+    df['actividad'] = _select([
+        respondidas == 0,
+        con_fechas & (ratio_actividad >= 70),
+        con_fechas & (ratio_actividad >= 50)
+    ], ["Inactivo", "Muy activo", "Activo"], "Poco activo", df.index)
+    
+    # Calcular porcentajes de acierto
+    df['porcentaje_primer_intento'] = _porcentaje(df['aciertos_primer_intento'], df['total_primer_intento'])
+    df['porcentaje_segundo_intento'] = _porcentaje(df['aciertos_segundo_intento'], df['total_segundo_intento'])
+    
+    df['diferencia_porcentajes'] = df['porcentaje_segundo_intento'] - df['porcentaje_primer_intento']
+    
+    # Porcentaje de preguntas completadas
+    df['porcentaje_completado'] = (df['preguntas_respondidas'] / total_preguntas * 100).round(1)
+    df['porcentaje_retiradas'] = (df['preguntas_retiradas'] / total_preguntas * 100).round(1)
+    
+    # Total de preguntas para el desempeño
+    df['total_preguntas'] = total_preguntas
     
     return df
 
 
+def _select(condiciones, valores, por_defecto, index):
+    """np.select que devuelve una Serie de texto (la primera condición que se cumple gana)"""
+    condiciones = [np.asarray(c.fillna(False) if hasattr(c, 'fillna') else c, dtype=bool) for c in condiciones]
+    return pd.Series(np.select(condiciones, valores, default=por_defecto), index=index, dtype=object)
+
+
+def _porcentaje(aciertos, total):
+    """round(aciertos / total * 100, 1) donde total > 0, y 0 en el resto"""
+    aciertos = aciertos.astype(float).to_numpy()
+    total = total.astype(float).to_numpy()
+    cociente = np.divide(aciertos, total, out=np.zeros(len(total)), where=total > 0) * 100
+    # round() de Python redondea según la representación decimal exacta; np.round
+    # puede diferir en casos límite, así que solo se corrigen esos valores
+    redondeado = np.round(cociente, 1)
+    dudosos = np.abs(cociente * 10 - np.floor(cociente * 10) - 0.5) < 1e-6
+    if dudosos.any():
+        redondeado[dudosos] = [round(v, 1) for v in cociente[dudosos]]
+    return redondeado
+
+
 def calcular_progreso(preguntas_respondidas, total_preguntas, dias_inactivo):
     """
     Calcula el estado de progreso de un participante
@@ -130,6 +208,7 @@ def calcular_nivel_actividad(preguntas_respondidas, total_preguntas, primera_act
     return "Poco activo"
 
 
+@cached_query("participantes", tags=("answers", "students", "questions"))
 def get_resumen_participantes():
     """
     Obtiene un resumen general de los participantes
@@ -155,12 +234,10 @@ def get_resumen_participantes():
     LEFT JOIN (
         SELECT 
             id_student,
-            COUNT(DISTINCT id_question) as preguntas_respondidas,
-            MAX(last_attempt_date) as ultima_actividad,
-            (SUM(CASE WHEN first_attempt = 1 THEN 1 ELSE 0 END) * 100.0 / 
-             NULLIF(COUNT(CASE WHEN num_attempts >= 1 THEN 1 END), 0)) as porcentaje_acierto_primero
-        FROM student_question
-        GROUP BY id_student
+            preguntas_respondidas,
+            ultima_actividad,
+            (aciertos_primer_intento * 100.0 / NULLIF(preguntas_respondidas, 0)) as porcentaje_acierto_primero
+        FROM student_stats
     ) sq ON s.id = sq.id_student
     """
     
@@ -186,6 +263,7 @@ def get_resumen_participantes():
     }
 
 
+@cached_query("participantes", tags=("answers", "students", "questions"))
 def get_distribucion_actividad():
     """
     Obtiene la distribución de participantes por nivel de actividad
@@ -219,6 +297,7 @@ def get_distribucion_actividad():
     })
 
 
+@cached_query("participantes", tags=("answers", "students", "questions"))
 def get_top_participantes(limite=10):
     """
     Obtiene los top participantes por diferentes métricas
@@ -0,0 +1,298 @@
+"""
+Analítica de un período (mes) para la página de Nivel de Actividad
+
+Antes cada panel lanzaba su propia consulta sobre student_question para el
+mismo rango de fechas y volvía a contar las preguntas activas. Aquí se leen
+una sola vez las filas del mes de las tablas diarias (daily_activity y
+daily_question_activity, ver database/daily_activity.py), los estudiantes y
+las preguntas, y todos los paneles se calculan con pandas sobre ese resultado.
+Los días activos reales y la actividad por hora salen del registro de eventos
+(database/answer_events.py) cuando el mes lo tiene:
+
+    cargar_datos_periodo(mes, año)  -> DatosPeriodo
+    analizar_periodo(mes, año)      -> dict con todos los paneles (cacheado)
+
+Las funciones de actividad_queries mantienen su firma y leen de aquí.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from dashboard.utils.db_utils import execute_query_df, cached_query, get_db_cursor
+from database import answer_events
+from dashboard.utils.date_utils import get_month_date_range, get_days_in_month
+
+
+NIVELES_ACTIVIDAD = ['Muy activo', 'Activo', 'Poco activo', 'Inactivo']
+
+# Actividad del mes por estudiante y por pregunta (una fila por día)
+QUERY_ACTIVIDAD_PERIODO = """
+SELECT fecha, id_student, respuestas, intentos, aciertos_primer_intento,
+       aciertos_segundo_intento, nuevas
+FROM daily_activity
+WHERE fecha BETWEEN %s AND %s AND respuestas > 0
+"""
+
+QUERY_ACTIVIDAD_PREGUNTAS_PERIODO = """
+SELECT fecha, id_question, respuestas, aciertos_primer_intento
+FROM daily_question_activity
+WHERE fecha BETWEEN %s AND %s AND respuestas > 0
+"""
+
+# Estudiantes marcando los que ya habían participado al final del mes
+QUERY_ESTUDIANTES_PERIODO = """
+SELECT
+    s.id,
+    s.name,
+    p.id_student IS NOT NULL as participante
+FROM students s
+LEFT JOIN (
+    SELECT DISTINCT id_student
+    FROM student_question
+    WHERE first_attempt_date <= %s
+) p ON p.id_student = s.id
+"""
+
+QUERY_PREGUNTAS = "SELECT id, id_subject, state FROM questions"
+
+DatosPeriodo = namedtuple(
+    "DatosPeriodo",
+    "mes año fecha_inicio fecha_fin actividad actividad_preguntas estudiantes preguntas dias_eventos por_hora"
+)
+
+
+def cargar_datos_periodo(mes, año):
+    """
+    Lee de una vez todo lo que necesitan los paneles del período
+
+    Returns:
+        DatosPeriodo con la actividad diaria del mes, los estudiantes y las preguntas
+    """
+    fecha_inicio, fecha_fin = get_month_date_range(mes, año)
+    rango = (fecha_inicio.date(), fecha_fin.date())
+
+    actividad = _numerico(execute_query_df(QUERY_ACTIVIDAD_PERIODO, rango))
+    actividad_preguntas = _numerico(execute_query_df(QUERY_ACTIVIDAD_PREGUNTAS_PERIODO, rango))
+
+    estudiantes = execute_query_df(QUERY_ESTUDIANTES_PERIODO, (fecha_fin.date(),))
+    if not estudiantes.empty:
+        estudiantes['participante'] = estudiantes['participante'].astype(bool)
+
+    preguntas = execute_query_df(QUERY_PREGUNTAS)
+
+    # Eventos del mes (vacíos si el mes es anterior al registro de eventos)
+    fin_exclusivo = fecha_fin.date() + timedelta(days=1)
+    with get_db_cursor() as cursor:
+        dias_eventos = answer_events.active_days(cursor, fecha_inicio.date(), fin_exclusivo)
+        por_hora = answer_events.hourly_activity(cursor, fecha_inicio.date(), fin_exclusivo)
+
+    return DatosPeriodo(mes, año, fecha_inicio, fecha_fin, actividad, actividad_preguntas,
+                        estudiantes, preguntas, dias_eventos, por_hora)
+
+
+def _numerico(df):
+    """Fechas a datetime y contadores (SUM de MySQL devuelve Decimal) a enteros"""
+    if df.empty:
+        return df
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    for columna in df.columns.drop(['fecha']):
+        df[columna] = pd.to_numeric(df[columna]).fillna(0).astype(int)
+    return df
+
+
+@cached_query("actividad", tags=("answers", "students", "questions"))
+def analizar_periodo(mes, año):
+    """
+    Calcula todos los paneles del período a partir de una única lectura
+
+    Returns:
+        dict con 'actividad', 'distribucion', 'detalle', 'evolucion_diaria',
+        'por_hora' y 'estadisticas'
+    """
+    datos = cargar_datos_periodo(mes, año)
+    distribucion, detalle = calcular_distribucion(datos)
+    return {
+        'actividad': calcular_actividad(datos),
+        'distribucion': distribucion,
+        'detalle': detalle,
+        'evolucion_diaria': calcular_evolucion_diaria(datos),
+        'por_hora': calcular_actividad_por_hora(datos),
+        'estadisticas': calcular_estadisticas_detalladas(datos)
+    }
+
+
+def _total_preguntas_activas(datos):
+    if datos.preguntas.empty:
+        return 0
+    return int((datos.preguntas['state'] == 'A').sum())
+
+
+def _total_participantes(datos):
+    """
+    Estudiantes registrados hasta el último que había participado al final del período
+    (mismo criterio que la consulta original: id <= MAX(id) de los participantes)
+    """
+    if datos.estudiantes.empty or not datos.estudiantes['participante'].any():
+        return 0
+    ultimo = datos.estudiantes.loc[datos.estudiantes['participante'], 'id'].max()
+    return int((datos.estudiantes['id'] <= ultimo).sum())
+
+
+def calcular_actividad(datos):
+    """Indicador global de actividad del período (panel de métricas principales)"""
+    total_participantes = _total_participantes(datos)
+    total_preguntas = _total_preguntas_activas(datos)
+    dias_periodo = get_days_in_month(datos.mes, datos.año)
+
+    # Preguntas esperadas (suponiendo 1 pregunta por día por participante como ideal)
+    preguntas_esperadas = min(total_participantes * dias_periodo, total_participantes * total_preguntas)
+    preguntas_respondidas = int(datos.actividad['respuestas'].sum()) if not datos.actividad.empty else 0
+
+    indicador_actividad = (preguntas_respondidas / preguntas_esperadas * 100) if preguntas_esperadas > 0 else 0
+
+    return {
+        'mes': datos.mes,
+        'año': datos.año,
+        'total_participantes': total_participantes,
+        'total_preguntas': total_preguntas,
+        'dias_periodo': dias_periodo,
+        'preguntas_esperadas': preguntas_esperadas,
+        'preguntas_respondidas': preguntas_respondidas,
+        'indicador_actividad': round(indicador_actividad, 2)
+    }
+
+
+def clasificar_nivel_actividad_serie(porcentajes):
+    """Versión por columnas de clasificar_nivel_actividad"""
+    return pd.Series(np.select(
+        [porcentajes >= 70, porcentajes >= 50, porcentajes > 0],
+        NIVELES_ACTIVIDAD[:3],
+        default=NIVELES_ACTIVIDAD[3]
+    ), index=porcentajes.index)
+
+
+def calcular_distribucion(datos):
+    """
+    Distribución de participantes por nivel de actividad
+
+    Returns:
+        tuple: (resumen por nivel, detalle por participante)
+    """
+    participantes = datos.estudiantes[datos.estudiantes['participante']] if not datos.estudiantes.empty else datos.estudiantes
+    if participantes.empty:
+        return pd.DataFrame({
+            'nivel': NIVELES_ACTIVIDAD,
+            'cantidad': [0, 0, 0, 0],
+            'porcentaje': [0, 0, 0, 0]
+        }), pd.DataFrame()
+
+    # Preguntas esperadas por participante en el período
+    dias_periodo = get_days_in_month(datos.mes, datos.año)
+    preguntas_esperadas_por_participante = min(dias_periodo, _total_preguntas_activas(datos))
+
+    if datos.actividad.empty:
+        actividad = pd.DataFrame(columns=['preguntas_periodo', 'dias_activo'])
+    else:
+        # Cada fila de student_question está en un único día, así que sumar da las preguntas distintas
+        actividad = datos.actividad.groupby('id_student').agg(
+            preguntas_periodo=('respuestas', 'sum'),
+            dias_activo=('fecha', 'nunique')
+        )
+
+    df = participantes[['id', 'name']].reset_index(drop=True)
+    df['preguntas_periodo'] = df['id'].map(actividad['preguntas_periodo']).fillna(0).astype(int)
+    df['dias_activo'] = df['id'].map(actividad['dias_activo']).fillna(0).astype(int)
+    if datos.dias_eventos:
+        # Los eventos cuentan todos los días con respuestas, no solo los del último intento
+        # (si el registro empezó a mitad de mes, nos quedamos con el mayor de los dos)
+        dias_eventos = df['id'].map(datos.dias_eventos).fillna(0).astype(int)
+        df['dias_activo'] = np.maximum(df['dias_activo'], dias_eventos)
+
+    if preguntas_esperadas_por_participante > 0:
+        df['porcentaje_actividad'] = (df['preguntas_periodo'] / preguntas_esperadas_por_participante * 100).round(2)
+    else:
+        df['porcentaje_actividad'] = 0.0
+    df['nivel_actividad'] = clasificar_nivel_actividad_serie(df['porcentaje_actividad'])
+
+    cantidades = df['nivel_actividad'].value_counts().reindex(NIVELES_ACTIVIDAD, fill_value=0)
+    resumen = pd.DataFrame({'nivel': NIVELES_ACTIVIDAD, 'cantidad': cantidades.values})
+    total = resumen['cantidad'].sum()
+    resumen['porcentaje'] = (resumen['cantidad'] / total * 100).round(1) if total > 0 else 0
+
+    return resumen, df
+
+
+def calcular_evolucion_diaria(datos):
+    """Actividad de cada día del mes (los días sin respuestas quedan a 0)"""
+    actividad = datos.actividad
+    if actividad.empty:
+        return pd.DataFrame()
+
+    por_dia = actividad.groupby(actividad['fecha'].dt.day).agg(
+        participantes_activos=('id_student', 'size'),
+        total_respuestas=('respuestas', 'sum'),
+        aciertos_primer_intento=('aciertos_primer_intento', 'sum')
+    )
+    preguntas = datos.actividad_preguntas
+    por_dia['preguntas_diferentes'] = preguntas.groupby(preguntas['fecha'].dt.day).size()
+    por_dia['porcentaje_acierto'] = (por_dia['aciertos_primer_intento'] / por_dia['total_respuestas'] * 100).round(1)
+
+    # DataFrame completo con todos los días del mes
+    dias_mes = pd.date_range(start=datos.fecha_inicio, end=datos.fecha_fin, freq='D')
+    df_final = pd.DataFrame({'fecha': dias_mes, 'dia': dias_mes.day})
+    df_final = df_final.merge(por_dia, left_on='dia', right_index=True, how='left')
+    df_final['dia_semana'] = df_final['fecha'].dt.day_name()
+    df_final.fillna(0, inplace=True)
+
+    return df_final
+
+
+def calcular_actividad_por_hora(datos):
+    """Respuestas y acierto por hora del día (vacío si el mes no tiene eventos)"""
+    if not datos.por_hora:
+        return pd.DataFrame()
+    df = pd.DataFrame(datos.por_hora, columns=['hora', 'respuestas', 'aciertos', 'estudiantes'])
+    df = pd.DataFrame({'hora': range(24)}).merge(df, on='hora', how='left').fillna(0)
+    for columna in ('respuestas', 'aciertos', 'estudiantes'):
+        df[columna] = df[columna].astype(int)
+    df['porcentaje_acierto'] = (df['aciertos'] / df['respuestas'].where(df['respuestas'] > 0) * 100).round(1).fillna(0)
+    return df
+
+
+def calcular_estadisticas_detalladas(datos):
+    """Estadísticas adicionales del período"""
+    actividad = datos.actividad
+    if actividad.empty:
+        return {
+            'participantes_activos': 0,
+            'preguntas_unicas': 0,
+            'total_respuestas': 0,
+            'promedio_intentos': 0,
+            'porcentaje_acierto_primero': 0,
+            'porcentaje_acierto_segundo': 0,
+            'nuevos_participantes': 0,
+            'asignaturas_activas': 0
+        }
+
+    total_respuestas = int(actividad['respuestas'].sum())
+    aciertos_primero = int(actividad['aciertos_primer_intento'].sum())
+    aciertos_segundo = int(actividad['aciertos_segundo_intento'].sum())
+    preguntas_respondidas = datos.actividad_preguntas['id_question'].unique() if not datos.actividad_preguntas.empty else []
+
+    # Asignaturas con alguna pregunta respondida (student_question solo guarda id_question)
+    preguntas = datos.preguntas
+    asignaturas = preguntas.loc[preguntas['id'].isin(preguntas_respondidas), 'id_subject'] if not preguntas.empty else []
+
+    return {
+        'participantes_activos': int(actividad['id_student'].nunique()),
+        'preguntas_unicas': len(preguntas_respondidas),
+        'total_respuestas': total_respuestas,
+        'promedio_intentos': round(int(actividad['intentos'].sum()) / total_respuestas, 2),
+        'porcentaje_acierto_primero': round(aciertos_primero / total_respuestas * 100, 1),
+        'porcentaje_acierto_segundo': round(aciertos_segundo / total_respuestas * 100, 1) if aciertos_segundo else 0,
+        'nuevos_participantes': int(actividad.loc[actividad['nuevas'] > 0, 'id_student'].nunique()),
+        'asignaturas_activas': int(pd.Series(asignaturas).nunique())
+    }
@@ -1,13 +1,10 @@
-from dashboard.utils.db_utils import execute_query_df, execute_scalar
+from dashboard.utils.db_utils import execute_query_df, execute_scalar, cached_query
+from dashboard.utils.server_table import FiltroNoSoportado, consultar_pagina, paginar_dataframe
+import numpy as np
 import pandas as pd
 
 
-def get_estadisticas_preguntas():
-    """
-    Obtiene estadísticas detalladas de cada pregunta
-    """
-    query = """
-    SELECT 
+_SELECT_PREGUNTAS = """
         q.id as id_pregunta,
         q.question as pregunta,
         s.name as asignatura,
@@ -19,21 +16,45 @@ def get_estadisticas_preguntas():
         COALESCE(stats.total_primer_intento, 0) as total_primer_intento,
         COALESCE(stats.aciertos_segundo_intento, 0) as aciertos_segundo_intento,
         COALESCE(stats.total_segundo_intento, 0) as total_segundo_intento
-    FROM questions q
+"""
+
+_FROM_PREGUNTAS = """
+    questions q
     LEFT JOIN subject s ON q.id_subject = s.id
     LEFT JOIN (
         SELECT 
             id_question,
-            COUNT(DISTINCT id_student) as participantes_respondieron,
-            SUM(num_attempts) as total_intentos,
-            SUM(CASE WHEN num_attempts >= 2 AND mistake_number = 0 THEN 1 ELSE 0 END) as veces_retirada,
-            SUM(CASE WHEN first_attempt = 1 THEN 1 ELSE 0 END) as aciertos_primer_intento,
-            COUNT(CASE WHEN num_attempts >= 1 THEN 1 END) as total_primer_intento,
-            SUM(CASE WHEN second_attempt = 1 THEN 1 ELSE 0 END) as aciertos_segundo_intento,
-            COUNT(CASE WHEN num_attempts >= 2 THEN 1 END) as total_segundo_intento
-        FROM student_question
-        GROUP BY id_question
+            participantes as participantes_respondieron,
+            total_intentos,
+            veces_retirada,
+            aciertos_primer_intento,
+            participantes as total_primer_intento,
+            aciertos_segundo_intento,
+            total_segundo_intento
+        FROM question_stats
     ) stats ON q.id = stats.id_question
+"""
+
+# Columnas de la tabla que se pueden filtrar y ordenar en SQL (el resto se calcula en pandas)
+_COLUMNAS_SQL_PREGUNTAS = {
+    'id_pregunta': 'q.id',
+    'pregunta': 'q.question',
+    'asignatura': 's.name',
+    'nivel': 'q.level',
+    'participantes_respondieron': 'COALESCE(stats.participantes_respondieron, 0)',
+    'total_intentos': 'COALESCE(stats.total_intentos, 0)',
+    'veces_retirada': 'COALESCE(stats.veces_retirada, 0)',
+}
+
+
+@cached_query("preguntas", tags=("answers", "questions"))
+def get_estadisticas_preguntas():
+    """
+    Obtiene estadísticas detalladas de cada pregunta
+    """
+    query = f"""
+    SELECT {_SELECT_PREGUNTAS}
+    FROM {_FROM_PREGUNTAS}
     WHERE q.state = 'A'
     ORDER BY q.id
     """
@@ -41,29 +62,47 @@ def get_estadisticas_preguntas():
     df = execute_query_df(query)
     
     if not df.empty:
-        # Calcular métricas derivadas
-        df['media_intentos'] = df.apply(
-            lambda x: round(x['total_intentos'] / x['participantes_respondieron'], 2) 
-            if x['participantes_respondieron'] > 0 else 0, 
-            axis=1
-        )
-        
-        df['porcentaje_acierto_primero'] = df.apply(
-            lambda x: round((x['aciertos_primer_intento'] / x['total_primer_intento']) * 100, 2) 
-            if x['total_primer_intento'] > 0 else 0, 
-            axis=1
-        )
-        
-        df['porcentaje_acierto_segundo'] = df.apply(
-            lambda x: round((x['aciertos_segundo_intento'] / x['total_segundo_intento']) * 100, 2) 
-            if x['total_segundo_intento'] > 0 else 0, 
-            axis=1
+        df = calcular_metricas_preguntas(df)
+    
+    return df
+
+
+@cached_query("preguntas", tags=("answers", "questions"))
+def get_pagina_preguntas(page_current, page_size, sort_by=(), filter_query=""):
+    """
+    Obtiene una página de la tabla de preguntas (paginación en el servidor)
+    
+    Igual que get_pagina_participantes: LIMIT/OFFSET en SQL si el filtro y el orden
+    solo usan columnas de _COLUMNAS_SQL_PREGUNTAS, o el DataFrame cacheado de
+    get_estadisticas_preguntas para las columnas derivadas.
+    
+    Returns:
+        dict: {'datos': DataFrame de la página, 'total': filas que cumplen el filtro}
+    """
+    try:
+        df, total = consultar_pagina(
+            _SELECT_PREGUNTAS, _FROM_PREGUNTAS, _COLUMNAS_SQL_PREGUNTAS,
+            page_current, page_size, sort_by, filter_query,
+            where="q.state = 'A'", clave="q.id, q.id_subject"
         )
-        
-        df['diferencia_porcentajes'] = df['porcentaje_acierto_segundo'] - df['porcentaje_acierto_primero']
-        
-        # Clasificar dificultad
-        df['dificultad'] = df['porcentaje_acierto_primero'].apply(clasificar_dificultad)
+        if not df.empty:
+            df = calcular_metricas_preguntas(df)
+    except FiltroNoSoportado:
+        df, total = paginar_dataframe(get_estadisticas_preguntas(), page_current, page_size, sort_by, filter_query)
+    
+    return {'datos': df, 'total': total}
+
+
+def calcular_metricas_preguntas(df):
+    """Añade las métricas derivadas de cada pregunta (por columnas, sin recorrer filas)"""
+    df['media_intentos'] = _ratio(df['total_intentos'], df['participantes_respondieron'])
+    df['porcentaje_acierto_primero'] = _ratio(df['aciertos_primer_intento'] * 100, df['total_primer_intento'])
+    df['porcentaje_acierto_segundo'] = _ratio(df['aciertos_segundo_intento'] * 100, df['total_segundo_intento'])
+    
+    df['diferencia_porcentajes'] = df['porcentaje_acierto_segundo'] - df['porcentaje_acierto_primero']
+    
+    # Clasificar dificultad
+    df['dificultad'] = clasificar_dificultad_serie(df['porcentaje_acierto_primero'])
     
     return df
 
@@ -78,6 +117,23 @@ def clasificar_dificultad(porcentaje_acierto):
         return 'Difícil'
 
 
+def _ratio(numerador, denominador, decimales=2):
+    """Cociente redondeado por columnas (0 donde el denominador es 0)"""
+    numerador = numerador.astype(float)
+    denominador = denominador.astype(float)
+    resultado = np.divide(numerador, denominador, out=np.zeros(len(numerador)), where=denominador > 0)
+    return pd.Series(resultado, index=numerador.index).round(decimales)
+
+
+def clasificar_dificultad_serie(porcentajes):
+    """Versión por columnas de clasificar_dificultad"""
+    return pd.Series(
+        np.select([porcentajes >= 70, porcentajes >= 40], ['Fácil', 'Media'], default='Difícil'),
+        index=porcentajes.index
+    )
+
+
+@cached_query("preguntas", tags=("answers", "questions"))
 def get_resumen_preguntas():
     """
     Obtiene un resumen general de las preguntas
@@ -93,12 +149,10 @@ def get_resumen_preguntas():
     LEFT JOIN (
         SELECT 
             id_question,
-            COUNT(DISTINCT id_student) as participantes,
-            AVG(num_attempts) as media_intentos,
-            (SUM(CASE WHEN first_attempt = 1 THEN 1 ELSE 0 END) * 100.0 / 
-             NULLIF(COUNT(CASE WHEN num_attempts >= 1 THEN 1 END), 0)) as porcentaje_primero
-        FROM student_question
-        GROUP BY id_question
+            participantes,
+            total_intentos / NULLIF(participantes, 0) as media_intentos,
+            (aciertos_primer_intento * 100.0 / NULLIF(participantes, 0)) as porcentaje_primero
+        FROM question_stats
     ) stats ON q.id = stats.id_question
     WHERE q.state = 'A'
     """
@@ -123,6 +177,7 @@ def get_resumen_preguntas():
     }
 
 
+@cached_query("preguntas", tags=("answers", "questions"))
 def get_preguntas_por_asignatura():
     """
     Obtiene estadísticas agrupadas por asignatura
@@ -134,23 +189,13 @@ def get_preguntas_por_asignatura():
         COUNT(DISTINCT sq.id_question) as preguntas_respondidas,
         AVG(CASE 
             WHEN sq.total_intentos > 0 
-            THEN (sq.aciertos_primero * 100.0 / sq.total_primero)
+            THEN (sq.aciertos_primer_intento * 100.0 / sq.participantes)
             ELSE NULL 
         END) as promedio_acierto_primero,
         SUM(sq.total_intentos) as intentos_totales
     FROM subject s
     LEFT JOIN questions q ON s.id = q.id_subject AND q.state = 'A'
-    LEFT JOIN (
-        SELECT 
-            q2.id_subject,
-            sq2.id_question,
-            SUM(sq2.num_attempts) as total_intentos,
-            SUM(CASE WHEN sq2.first_attempt = 1 THEN 1 ELSE 0 END) as aciertos_primero,
-            COUNT(CASE WHEN sq2.num_attempts >= 1 THEN 1 END) as total_primero
-        FROM student_question sq2
-        JOIN questions q2 ON sq2.id_question = q2.id
-        GROUP BY q2.id_subject, sq2.id_question
-    ) sq ON q.id = sq.id_question
+    LEFT JOIN question_stats sq ON q.id = sq.id_question AND sq.participantes > 0
     WHERE s.status = 'A'
     GROUP BY s.id, s.name
     HAVING COUNT(DISTINCT q.id) > 0
@@ -160,6 +205,7 @@ def get_preguntas_por_asignatura():
     return execute_query_df(query)
 
 
+@cached_query("preguntas", tags=("answers", "questions"))
 def get_top_preguntas_faciles_dificiles(limite=5):
     """
     Obtiene las preguntas más fáciles y más difíciles
@@ -170,15 +216,13 @@ def get_top_preguntas_faciles_dificiles(limite=5):
         q.id,
         q.question as pregunta,
         s.name as asignatura,
-        (SUM(CASE WHEN sq.first_attempt = 1 THEN 1 ELSE 0 END) * 100.0 / 
-         NULLIF(COUNT(CASE WHEN sq.num_attempts >= 1 THEN 1 END), 0)) as porcentaje_acierto,
-        COUNT(DISTINCT sq.id_student) as participantes
+        (st.aciertos_primer_intento * 100.0 / NULLIF(st.participantes, 0)) as porcentaje_acierto,
+        st.participantes
     FROM questions q
     JOIN subject s ON q.id_subject = s.id
-    JOIN student_question sq ON q.id = sq.id_question
+    JOIN question_stats st ON q.id = st.id_question
     WHERE q.state = 'A'
-    GROUP BY q.id, q.question, s.name
-    HAVING participantes >= 5  -- Solo preguntas con al menos 5 respuestas
+      AND st.participantes >= 5  -- Solo preguntas con al menos 5 respuestas
     ORDER BY porcentaje_acierto DESC
     LIMIT %s
     """
@@ -189,15 +233,13 @@ def get_top_preguntas_faciles_dificiles(limite=5):
         q.id,
         q.question as pregunta,
         s.name as asignatura,
-        (SUM(CASE WHEN sq.first_attempt = 1 THEN 1 ELSE 0 END) * 100.0 / 
-         NULLIF(COUNT(CASE WHEN sq.num_attempts >= 1 THEN 1 END), 0)) as porcentaje_acierto,
-        COUNT(DISTINCT sq.id_student) as participantes
+        (st.aciertos_primer_intento * 100.0 / NULLIF(st.participantes, 0)) as porcentaje_acierto,
+        st.participantes
     FROM questions q
     JOIN subject s ON q.id_subject = s.id
-    JOIN student_question sq ON q.id = sq.id_question
+    JOIN question_stats st ON q.id = st.id_question
     WHERE q.state = 'A'
-    GROUP BY q.id, q.question, s.name
-    HAVING participantes >= 5  -- Solo preguntas con al menos 5 respuestas
+      AND st.participantes >= 5  -- Solo preguntas con al menos 5 respuestas
     ORDER BY porcentaje_acierto ASC
     LIMIT %s
     """
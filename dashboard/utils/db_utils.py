@@ -1,5 +1,6 @@
 from contextlib import contextmanager
 from database.db_connection import db_connection
+from database.query_cache import cached_query, query_cache, invalidate_answers
 import pandas as pd
 
 
@@ -0,0 +1,255 @@
+"""
+Paginación, orden y filtrado en el servidor para las DataTable del dashboard
+
+Con page_action/sort_action/filter_action='custom' la tabla solo recibe la
+página visible. Un callback recibe page_current, page_size, sort_by y
+filter_query y los traduce aquí a:
+
+    - SQL parametrizado (WHERE ... ORDER BY ... LIMIT/OFFSET) cuando todas las
+      columnas filtradas u ordenadas tienen expresión SQL (consultar_pagina)
+    - operaciones de pandas sobre un DataFrame ya calculado (y cacheado) para
+      las columnas derivadas que solo existen en pandas (paginar_dataframe)
+
+Las columnas se pasan como {id de la columna: expresión SQL}; solo se aceptan
+esas claves, así que el texto del filtro nunca llega a la consulta.
+"""
+
+import math
+import re
+
+import pandas as pd
+
+from dashboard.utils.db_utils import execute_query_df, execute_scalar
+
+
+class FiltroNoSoportado(Exception):
+    """El filtro u orden usa una columna u operador que la consulta SQL no puede resolver"""
+
+
+# Términos que genera la DataTable: {columna} operador valor (con prefijo i/s de mayúsculas opcional)
+_TERMINO = re.compile(
+    r"^\{(?P<columna>[^}]+)\}\s*"
+    r"(?P<operador>[is]?(?:contains|datestartswith|eq|ne|le|lt|ge|gt|<=|>=|!=|=|<|>))\s*"
+    r"(?P<valor>.*)$"
+)
+
+_OPERADORES_SQL = {
+    "=": "=", "eq": "=",
+    "!=": "<>", "ne": "<>",
+    "<": "<", "lt": "<",
+    "<=": "<=", "le": "<=",
+    ">": ">", "gt": ">",
+    ">=": ">=", "ge": ">=",
+}
+
+
+def parse_filter_query(filter_query):
+    """
+    Descompone el filter_query de la DataTable
+
+    Returns:
+        list: [(columna, operador, valor)] con el operador normalizado
+              ('=', '<>', '<', '<=', '>', '>=', 'contains', 'datestartswith')
+    """
+    filtros = []
+    for parte in (filter_query or "").split(" && "):
+        parte = parte.strip()
+        if not parte:
+            continue
+        match = _TERMINO.match(parte)
+        if match is None:
+            raise FiltroNoSoportado(f"Filtro no soportado: {parte}")
+        operador = match.group("operador")
+        if operador[0] in "is" and len(operador) > 1 and operador[1:] in (
+                "contains", "datestartswith", "eq", "ne", "le", "lt", "ge", "gt", "=", "!=", "<", "<=", ">", ">="):
+            operador = operador[1:]
+        operador = _OPERADORES_SQL.get(operador, operador)
+        filtros.append((match.group("columna"), operador, _valor(match.group("valor"))))
+    return filtros
+
+
+def _valor(texto):
+    """Quita comillas o convierte a número el valor de un término"""
+    texto = texto.strip()
+    if len(texto) >= 2 and texto[0] == texto[-1] and texto[0] in "\"'`":
+        return texto[1:-1].replace("\\" + texto[0], texto[0])
+    try:
+        return int(texto)
+    except ValueError:
+        pass
+    try:
+        return float(texto)
+    except ValueError:
+        return texto
+
+
+def normalizar_orden(sort_by):
+    """sort_by de la DataTable (lista de dicts) como tupla hashable [(columna, 'asc'|'desc')]"""
+    orden = []
+    for item in sort_by or ():
+        if isinstance(item, dict):
+            orden.append((item["column_id"], item.get("direction", "asc")))
+        else:
+            orden.append((item[0], item[1]))
+    return tuple(orden)
+
+
+def _like(valor):
+    texto = str(valor).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return texto
+
+
+def condicion_busqueda(expresiones, texto):
+    """
+    Condición que busca un texto libre en varias columnas (para el where de consultar_pagina)
+
+    Args:
+        expresiones: Expresiones SQL donde buscar
+        texto: Texto introducido por el usuario
+
+    Returns:
+        tuple: (condición SQL o None si no hay texto, parámetros)
+    """
+    texto = (texto or "").strip()
+    if not texto:
+        return None, ()
+    patron = f"%{_like(texto)}%"
+    return " OR ".join(f"{e} LIKE %s" for e in expresiones), (patron,) * len(expresiones)
+
+
+# ---------- SQL ----------
+
+def construir_consulta(select, desde, columnas, filtros=(), orden=(), where=None, params=(),
+                       group_by=None, clave=None):
+    """
+    Construye la consulta de una página
+
+    Args:
+        select: Lista de columnas del SELECT (sin la palabra SELECT)
+        desde: FROM y JOINs
+        columnas: {id de columna: expresión SQL} admitidas en filtros y orden
+        filtros: Resultado de parse_filter_query
+        orden: Resultado de normalizar_orden
+        where: Condición fija opcional
+        params: Parámetros de la condición fija
+        group_by: GROUP BY opcional (los filtros van en WHERE, antes de agrupar)
+        clave: Expresión única que desempata el orden para que las páginas sean estables
+
+    Returns:
+        tuple: (sql_sin_limit, params, sql_count)
+    """
+    condiciones = [where] if where else []
+    valores = list(params)
+    for columna, operador, valor in filtros:
+        if columna not in columnas:
+            raise FiltroNoSoportado(columna)
+        expresion = columnas[columna]
+        if operador == "contains":
+            condiciones.append(f"{expresion} LIKE %s")
+            valores.append(f"%{_like(valor)}%")
+        elif operador == "datestartswith":
+            condiciones.append(f"CAST({expresion} AS CHAR) LIKE %s")
+            valores.append(f"{_like(valor)}%")
+        elif operador in _OPERADORES_SQL.values():
+            condiciones.append(f"{expresion} {operador} %s")
+            valores.append(valor)
+        else:
+            raise FiltroNoSoportado(operador)
+
+    ordenes = []
+    for columna, direccion in orden:
+        if columna not in columnas:
+            raise FiltroNoSoportado(columna)
+        ordenes.append(f"{columnas[columna]} {'DESC' if direccion == 'desc' else 'ASC'}")
+    if clave:
+        ordenes.append(clave)
+
+    cuerpo = f"FROM {desde}"
+    if condiciones:
+        cuerpo += " WHERE " + " AND ".join(f"({c})" for c in condiciones)
+    if group_by:
+        cuerpo += f" GROUP BY {group_by}"
+
+    sql = f"SELECT {select} {cuerpo}"
+    if ordenes:
+        sql += " ORDER BY " + ", ".join(ordenes)
+    if group_by:
+        sql_count = f"SELECT COUNT(*) FROM (SELECT 1 {cuerpo}) t"
+    else:
+        sql_count = f"SELECT COUNT(*) {cuerpo}"
+    return sql, valores, sql_count
+
+
+def consultar_pagina(select, desde, columnas, page_current=0, page_size=20, sort_by=(), filter_query="",
+                     where=None, params=(), group_by=None, clave=None):
+    """
+    Ejecuta la consulta de una página con LIMIT/OFFSET
+
+    Returns:
+        tuple: (DataFrame de la página, total de filas que cumplen el filtro)
+
+    Raises:
+        FiltroNoSoportado: si el filtro u orden usa columnas sin expresión SQL
+    """
+    sql, valores, sql_count = construir_consulta(
+        select, desde, columnas, parse_filter_query(filter_query), normalizar_orden(sort_by),
+        where, params, group_by, clave
+    )
+    total = execute_scalar(sql_count, tuple(valores)) or 0
+    pagina = execute_query_df(f"{sql} LIMIT %s OFFSET %s", tuple(valores) + (page_size, page_current * page_size))
+    return pagina, int(total)
+
+
+# ---------- pandas ----------
+
+def filtrar_dataframe(df, filtros):
+    """Aplica los filtros de parse_filter_query a un DataFrame"""
+    for columna, operador, valor in filtros:
+        if columna not in df.columns:
+            raise FiltroNoSoportado(columna)
+        serie = df[columna]
+        if operador == "contains":
+            mascara = serie.astype(str).str.contains(str(valor), case=False, regex=False, na=False)
+        elif operador == "datestartswith":
+            mascara = serie.astype(str).str.startswith(str(valor), na=False)
+        else:
+            if isinstance(valor, (int, float)):
+                serie = pd.to_numeric(serie, errors="coerce")
+            elif operador not in ("=", "<>") and pd.api.types.is_numeric_dtype(serie):
+                # {edad} > abc: un texto no se puede comparar por orden con números
+                raise FiltroNoSoportado(f"{columna} {operador} {valor}")
+            try:
+                mascara = {
+                    "=": lambda: serie == valor, "<>": lambda: serie != valor,
+                    "<": lambda: serie < valor, "<=": lambda: serie <= valor,
+                    ">": lambda: serie > valor, ">=": lambda: serie >= valor,
+                }[operador]()
+            except TypeError:
+                # Columnas de texto con valores de tipos mezclados (None, números...)
+                raise FiltroNoSoportado(f"{columna} {operador} {valor}")
+        df = df.loc[mascara.fillna(False)]
+    return df
+
+
+def paginar_dataframe(df, page_current=0, page_size=20, sort_by=(), filter_query=""):
+    """
+    Filtra, ordena y corta un DataFrame (para columnas que solo existen en pandas)
+
+    Returns:
+        tuple: (DataFrame de la página, total de filas que cumplen el filtro)
+    """
+    df = filtrar_dataframe(df, parse_filter_query(filter_query))
+    orden = normalizar_orden(sort_by)
+    if orden:
+        df = df.sort_values(
+            [columna for columna, _ in orden],
+            ascending=[direccion != "desc" for _, direccion in orden],
+            kind="mergesort"
+        )
+    inicio = page_current * page_size
+    return df.iloc[inicio:inicio + page_size], len(df)
+
+
+def page_count(total, page_size):
+    """Número de páginas para la propiedad page_count de la DataTable"""
+    return max(1, math.ceil(total / page_size)) if page_size else 1
@@ -0,0 +1,537 @@
+"""
+Registro de respuestas de solo-anexado (answer_events)
+
+student_question solo guarda contadores y las fechas del primer y último
+intento de cada (estudiante, pregunta), así que no permite saber qué días ni a
+qué horas se respondió. Cada respuesta se anota además como un evento en una
+tabla mensual:
+
+    answer_events_202503 (id, answered_at, id_student, id_subject, id_question, is_correct)
+
+Los eventos se escriben en la misma transacción que student_question (directa
+o en el volcado del buffer). Las tablas mensuales se crean al vuelo desde otra
+conexión, porque en MySQL un CREATE TABLE confirma la transacción en curso.
+
+Los contadores de student_question se derivan de los eventos (derive_counters).
+La compactación primero reconcilia: corrige con los eventos las filas de
+student_question cuya historia está entera en el log y recalcula las filas de
+student_stats, question_stats y actividad diaria de los estudiantes, preguntas
+y días afectados. Se puede hacer con el bot en marcha: una fila que cambie
+mientras tanto no se toca.
+Después pasa los meses que superan ANSWER_EVENTS_RETENTION_MONTHS a
+answer_events_hourly (respuestas y aciertos por día, hora, estudiante y
+asignatura) y borra sus tablas. Cada mes compactado se anota en
+answer_events_compacted en la misma transacción que su agregado horario, así
+que un mes no se suma dos veces aunque el DROP falle o el proceso se caiga.
+
+Uso desde la raíz del repositorio:
+    python -m database.answer_events ensure     # crea las tablas del mes actual y el siguiente
+    python -m database.answer_events compact    # reconcilia los contadores y compacta los meses fuera de la retención
+    python -m database.answer_events compact --sin-reconciliar   # solo compacta (p. ej. si el log tuvo huecos)
+    python -m database.answer_events verify     # compara los contadores derivados con student_question
+"""
+
+import re
+import sys
+import threading
+from datetime import date, datetime, time, timedelta
+
+import config
+from database import student_stats, question_stats, daily_activity
+from database.db_connection import db_connection
+
+
+ANSWER_EVENTS_ENABLED = getattr(config, "ANSWER_EVENTS_ENABLED", True)
+ANSWER_EVENTS_RETENTION_MONTHS = getattr(config, "ANSWER_EVENTS_RETENTION_MONTHS", 3)  # Meses con eventos sin compactar
+ANSWER_EVENTS_CHUNK = getattr(config, "ANSWER_EVENTS_CHUNK", 5000)                      # Filas por lectura en iter_events
+
+TABLE_PREFIX = "answer_events_"
+TABLE_PATTERN = re.compile(r"^answer_events_(\d{4})(\d{2})$")
+
+EVENTS_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    answered_at DATETIME NOT NULL,
+    id_student INT NOT NULL,
+    id_subject INT NULL,
+    id_question INT NOT NULL,
+    is_correct TINYINT NOT NULL,
+    KEY idx_answered_at (answered_at),
+    KEY idx_student_answered_at (id_student, answered_at)
+)
+"""
+
+HOURLY_DDL = """
+CREATE TABLE IF NOT EXISTS answer_events_hourly (
+    fecha DATE NOT NULL,
+    hora TINYINT NOT NULL,
+    id_student INT NOT NULL,
+    id_subject INT NOT NULL DEFAULT 0,
+    respuestas INT NOT NULL DEFAULT 0,
+    aciertos INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, hora, id_student, id_subject)
+)
+"""
+
+COMPACTED_DDL = """
+CREATE TABLE IF NOT EXISTS answer_events_compacted (
+    tabla VARCHAR(64) NOT NULL PRIMARY KEY,
+    filas INT NOT NULL,
+    compacted_at DATETIME NOT NULL
+)
+"""
+
+INSERT_EVENTS_QUERY = """
+INSERT INTO {table} (answered_at, id_student, id_subject, id_question, is_correct)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+_known_tables = set()
+_known_lock = threading.Lock()
+
+
+def table_for(day):
+    """Nombre de la tabla mensual de una fecha"""
+    return f"{TABLE_PREFIX}{day.year:04d}{day.month:02d}"
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def ensure_month_table(day, db=None):
+    """
+    Crea la tabla del mes si no existe
+
+    Sin db se usa una conexión propia para no confirmar la transacción del llamante.
+    """
+    table = table_for(day)
+    with _known_lock:
+        if table in _known_tables:
+            return table
+    own = db is None
+    db = db or db_connection()
+    try:
+        cursor = db.cursor()
+        cursor.execute(EVENTS_DDL.format(table=table))
+        cursor.close()
+        db.commit()
+    finally:
+        if own:
+            db.close()
+    with _known_lock:
+        _known_tables.add(table)
+    print(f"[EVENTOS] Tabla {table} lista")
+    return table
+
+
+def ensure_event_tables(db, today=None):
+    """Crea las tablas del mes actual y del siguiente (se llama al arrancar)"""
+    today = today or date.today()
+    ensure_month_table(today, db)
+    ensure_month_table(_next_month(today), db)
+
+
+def append_events(cursor, events):
+    """
+    Anota eventos de respuesta (dentro de la transacción del llamante)
+
+    Args:
+        events: Iterable de (answered_at, id_student, id_subject, id_question, is_correct)
+    """
+    if not ANSWER_EVENTS_ENABLED:
+        return
+    by_table = {}
+    for answered_at, student_id, subject_id, question_id, is_correct in events:
+        by_table.setdefault(table_for(answered_at), []).append(
+            (answered_at, student_id, subject_id, question_id, 1 if is_correct else 0)
+        )
+    for table, rows in sorted(by_table.items()):
+        ensure_month_table(rows[0][0])
+        cursor.executemany(INSERT_EVENTS_QUERY.format(table=table), rows)
+
+
+# ---------- Lectura por rangos ----------
+
+def event_tables(cursor):
+    """
+    Tablas mensuales existentes
+
+    Returns:
+        list: [(primer día del mes, tabla)] en orden cronológico
+    """
+    cursor.execute(f"SHOW TABLES LIKE '{TABLE_PREFIX}%'")
+    tables = []
+    for (name,) in cursor.fetchall():
+        match = TABLE_PATTERN.match(name)
+        if match:
+            tables.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(tables)
+
+
+def _has_hourly_table(cursor):
+    cursor.execute("SHOW TABLES LIKE 'answer_events_hourly'")
+    return cursor.fetchone() is not None
+
+
+def compacted_tables(cursor):
+    """Tablas mensuales ya sumadas a answer_events_hourly (aunque aún no se hayan borrado)"""
+    cursor.execute("SHOW TABLES LIKE 'answer_events_compacted'")
+    if cursor.fetchone() is None:
+        return set()
+    cursor.execute("SELECT tabla FROM answer_events_compacted")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _tables_in_range(cursor, desde, hasta):
+    """Tablas mensuales que se solapan con [desde, hasta)"""
+    return [
+        (month, table) for month, table in event_tables(cursor)
+        if month < hasta and _next_month(month) > desde
+    ]
+
+
+def iter_events(cursor, desde, hasta, chunk_size=ANSWER_EVENTS_CHUNK):
+    """
+    Recorre los eventos de [desde, hasta) en orden, leyendo por bloques
+
+    Cada tabla mensual se lee con paginación por clave (id > último id), así
+    que la memoria no depende del tamaño del rango.
+
+    Yields:
+        (id, answered_at, id_student, id_subject, id_question, is_correct)
+    """
+    desde, hasta = _as_datetime(desde), _as_datetime(hasta)
+    for _, table in _tables_in_range(cursor, desde.date(), _end_day(hasta)):
+        last_id = 0
+        while True:
+            cursor.execute(f"""
+                SELECT id, answered_at, id_student, id_subject, id_question, is_correct
+                FROM {table}
+                WHERE id > %s AND answered_at >= %s AND answered_at < %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, desde, hasta, chunk_size))
+            rows = cursor.fetchall()
+            yield from rows
+            if len(rows) < chunk_size:
+                break
+            last_id = rows[-1][0]
+
+
+def events_union(cursor, desde, hasta):
+    """
+    Subconsulta con la actividad por (fecha, hora, estudiante) de [desde, hasta)
+
+    Une las tablas mensuales del rango y la parte compactada, para que los
+    agregados no tengan que saber dónde está cada mes.
+
+    Returns:
+        tuple: (sql, params) con columnas fecha, hora, id_student, id_subject,
+               respuestas, aciertos; o (None, None) si no hay eventos en el rango
+    """
+    desde, hasta = _as_datetime(desde), _as_datetime(hasta)
+    parts, params = [], []
+    # Un mes compactado cuyo DROP falló ya está en answer_events_hourly: no se lee dos veces
+    compacted = compacted_tables(cursor)
+    for _, table in _tables_in_range(cursor, desde.date(), _end_day(hasta)):
+        if table in compacted:
+            continue
+        parts.append(f"""
+            SELECT DATE(answered_at) as fecha, HOUR(answered_at) as hora, id_student,
+                   COALESCE(id_subject, 0) as id_subject, 1 as respuestas, is_correct as aciertos
+            FROM {table}
+            WHERE answered_at >= %s AND answered_at < %s
+        """)
+        params += [desde, hasta]
+    if _has_hourly_table(cursor):
+        parts.append("""
+            SELECT fecha, hora, id_student, id_subject, respuestas, aciertos
+            FROM answer_events_hourly
+            WHERE fecha >= %s AND fecha < %s
+        """)
+        params += [desde.date(), hasta.date()]
+    if not parts:
+        return None, None
+    return " UNION ALL ".join(parts), params
+
+
+def active_days(cursor, desde, hasta):
+    """Días distintos con alguna respuesta por estudiante: {id_student: días}"""
+    union, params = events_union(cursor, desde, hasta)
+    if union is None:
+        return {}
+    cursor.execute(f"""
+        SELECT id_student, COUNT(DISTINCT fecha)
+        FROM ({union}) e
+        GROUP BY id_student
+    """, params)
+    return {row[0]: int(row[1]) for row in cursor.fetchall()}
+
+
+def hourly_activity(cursor, desde, hasta):
+    """
+    Actividad por hora del día en [desde, hasta)
+
+    Returns:
+        list: [(hora, respuestas, aciertos, estudiantes)] solo con las horas con actividad
+    """
+    union, params = events_union(cursor, desde, hasta)
+    if union is None:
+        return []
+    cursor.execute(f"""
+        SELECT hora, SUM(respuestas), SUM(aciertos), COUNT(DISTINCT id_student)
+        FROM ({union}) e
+        GROUP BY hora
+        ORDER BY hora
+    """, params)
+    return [(int(h), int(r), int(a), int(e)) for h, r, a, e in cursor.fetchall()]
+
+
+def _end_day(hasta):
+    """Primer día que ya no hace falta leer para un límite exclusivo"""
+    return hasta.date() + timedelta(days=1) if hasta.time() != time.min else hasta.date()
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min)
+
+
+# ---------- Compactación y contadores derivados ----------
+
+def compact_events(db, retention_months=ANSWER_EVENTS_RETENTION_MONTHS, today=None, reconcile=True):
+    """
+    Compacta en answer_events_hourly los meses fuera de la retención y borra sus tablas
+
+    Antes se reconcilian los contadores con los eventos (reconcile_counters):
+    al borrar un mes su historia ya no se puede derivar.
+
+    Cada mes se anota en answer_events_compacted en la misma transacción que su
+    agregado horario. Si el DROP falla o el proceso se cae antes, la siguiente
+    ejecución solo reintenta el DROP.
+
+    Returns:
+        list: Tablas compactadas
+    """
+    today = today or date.today()
+    limit = _month_start(today)
+    for _ in range(retention_months):
+        limit = _month_start(limit - timedelta(days=1))
+
+    cursor = db.cursor()
+    cursor.execute(HOURLY_DDL)
+    cursor.execute(COMPACTED_DDL)
+    pending = [(month, table) for month, table in event_tables(cursor) if month < limit]
+    cursor.close()
+    if pending and reconcile and ANSWER_EVENTS_ENABLED:
+        reconcile_counters(db)
+
+    cursor = db.cursor()
+    done = compacted_tables(cursor)
+    compacted = []
+    for month, table in pending:
+        if table not in done:
+            try:
+                cursor.execute(f"""
+                    INSERT INTO answer_events_hourly (fecha, hora, id_student, id_subject, respuestas, aciertos)
+                    SELECT DATE(answered_at), HOUR(answered_at), id_student, COALESCE(id_subject, 0),
+                           COUNT(*), SUM(is_correct)
+                    FROM {table}
+                    GROUP BY DATE(answered_at), HOUR(answered_at), id_student, COALESCE(id_subject, 0)
+                    ON DUPLICATE KEY UPDATE
+                        respuestas = respuestas + VALUES(respuestas),
+                        aciertos = aciertos + VALUES(aciertos)
+                """)
+                rows = cursor.rowcount
+                # Clave primaria: si otro proceso compacta el mismo mes a la vez, esta transacción falla entera
+                cursor.execute(
+                    "INSERT INTO answer_events_compacted (tabla, filas, compacted_at) VALUES (%s, %s, NOW())",
+                    (table, rows)
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            print(f"[EVENTOS] {table} compactada ({rows} filas horarias)")
+        else:
+            print(f"[EVENTOS] {table} ya estaba compactada; se reintenta el borrado")
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        with _known_lock:
+            _known_tables.discard(table)
+        compacted.append(table)
+    cursor.close()
+    return compacted
+
+
+def reconcile_counters(db):
+    """
+    Corrige student_question con los contadores derivados de los eventos
+
+    Solo se tocan los pares que verify_counters puede derivar (toda su historia
+    está en el log) y que tienen eventos; se supone que el log no se ha
+    desactivado (ANSWER_EVENTS_ENABLED) desde el primer evento.
+
+    Se puede ejecutar con el bot en marcha. Cada UPDATE lleva en el WHERE el
+    num_attempts y la last_attempt_date leídos: si una respuesta ha cambiado la
+    fila desde entonces no se corrige (se revisará en la próxima ejecución). En
+    la misma transacción se bloquean las filas de student_question de los
+    estudiantes y preguntas corregidos y se recalculan solo sus filas de
+    student_stats, question_stats y actividad diaria.
+
+    Returns:
+        int: Pares de student_question corregidos
+    """
+    fixes = [(key, stored, derived) for key, stored, derived in verify_counters(db) if derived is not None]
+    if not fixes:
+        return 0
+
+    cursor = db.cursor()
+    try:
+        fixed = []
+        for key, stored, derived in fixes:
+            cursor.execute("""
+                UPDATE student_question
+                SET num_attempts = %s, mistake_number = %s, first_attempt = %s, second_attempt = %s,
+                    first_attempt_date = %s, last_attempt_date = %s
+                WHERE id_student = %s AND id_question = %s
+                  AND num_attempts = %s AND last_attempt_date <=> %s
+            """, tuple(derived) + key + (stored[0], stored[5]))
+            if cursor.rowcount:
+                fixed.append((key, stored, derived))
+        if not fixed:
+            db.commit()
+            print(f"[EVENTOS] {len(fixes)} diferencias cambiadas por respuestas en curso; no se corrige ninguna")
+            return 0
+
+        # Las filas resumen se recalculan desde student_question con sus filas bloqueadas,
+        # así que los volcados de esos estudiantes y preguntas esperan al commit
+        students = sorted({key[0] for key, _, _ in fixed})
+        questions = sorted({key[1] for key, _, _ in fixed})
+        for column, ids in (("id_student", students), ("id_question", questions)):
+            cursor.execute(
+                f"SELECT 1 FROM student_question WHERE {column} IN ({', '.join(['%s'] * len(ids))}) FOR UPDATE",
+                ids
+            )
+            cursor.fetchall()
+        student_stats.rebuild_students(cursor, students)
+        question_stats.rebuild_questions(cursor, questions)
+        daily_activity.repair_keys(
+            cursor,
+            [(row[5], key[0]) for key, stored, derived in fixed for row in (stored, derived) if row[5] is not None],
+            [(row[5], key[1]) for key, stored, derived in fixed for row in (stored, derived) if row[5] is not None]
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    print(f"[EVENTOS] {len(fixed)} filas de student_question corregidas con los eventos"
+          f" ({len(fixes) - len(fixed)} cambiadas por respuestas en curso)")
+    return len(fixed)
+
+
+def derive_counters(events):
+    """
+    Contadores de student_question que producen unos eventos (en orden)
+
+    Returns:
+        dict: {(id_student, id_question): [num_attempts, mistake_number, first_attempt,
+               second_attempt, first_attempt_date, last_attempt_date]}
+    """
+    counters = {}
+    for _, answered_at, student_id, _, question_id, is_correct in events:
+        ok = 1 if is_correct else 0
+        day = answered_at.date()
+        row = counters.get((student_id, question_id))
+        if row is None:
+            counters[(student_id, question_id)] = [1, 1 - ok, ok, 0, day, day]
+            continue
+        if row[0] == 1:
+            row[3] = ok
+        row[0] += 1
+        row[1] += 1 - ok
+        row[5] = day
+    return counters
+
+
+def verify_counters(db):
+    """
+    Compara student_question con los contadores derivados de los eventos sin compactar
+
+    Solo se comprueban los pares cuyo primer intento es posterior al primer
+    evento registrado (los anteriores tienen historia que no está en el log).
+
+    student_question se lee antes que los eventos: una respuesta que llegue
+    entre las dos lecturas aparece en los eventos y no en la fila leída, así que
+    el UPDATE condicional de reconcile_counters no la deshace.
+
+    Returns:
+        list: ((id_student, id_question), en_tabla, derivado) de cada diferencia
+    """
+    cursor = db.cursor()
+    tables = event_tables(cursor)
+    since = _first_event_day(cursor, tables)
+    if since is None:
+        cursor.close()
+        return []
+    cursor.execute("""
+        SELECT id_student, id_question, num_attempts, mistake_number, first_attempt,
+               second_attempt, first_attempt_date, last_attempt_date
+        FROM student_question
+        WHERE first_attempt_date > %s
+    """, (since,))
+    stored = {(row[0], row[1]): list(row[2:]) for row in cursor.fetchall()}
+    counters = derive_counters(iter_events(cursor, tables[0][0], _next_month(tables[-1][0])))
+    cursor.close()
+
+    differences = []
+    for key in sorted(stored):
+        derived = counters.get(key)
+        if derived is None or [int(v) for v in stored[key][:4]] + stored[key][4:] != derived:
+            differences.append((key, stored[key], derived))
+    return differences
+
+
+def _first_event_day(cursor, tables):
+    """Día del primer evento registrado (None si el log está vacío)"""
+    for _, table in tables:
+        cursor.execute(f"SELECT MIN(answered_at) FROM {table}")
+        first = cursor.fetchone()[0]
+        if first is not None:
+            return first.date()
+    return None
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "verify"
+    if command not in ("ensure", "compact", "verify"):
+        print(__doc__)
+        return 2
+
+    db = db_connection()
+    try:
+        if command == "ensure":
+            ensure_event_tables(db)
+        elif command == "compact":
+            compacted = compact_events(db, reconcile="--sin-reconciliar" not in argv)
+            print(f"{len(compacted)} meses compactados")
+        else:
+            differences = verify_counters(db)
+            for key, stored, derived in differences[:50]:
+                print(f"{key}: student_question = {stored} (derivado {derived})")
+            print(f"{len(differences)} diferencias")
+            return 1 if differences else 0
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
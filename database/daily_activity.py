@@ -0,0 +1,353 @@
+"""
+Tablas de actividad diaria (daily_activity y daily_question_activity)
+
+Las series temporales del dashboard agrupaban student_question por
+DATE(last_attempt_date), lo que obliga a recorrer la tabla entera. Estas tablas
+guardan el mismo agregado ya calculado por día:
+
+    daily_activity           (fecha, id_student)  -> filas de student_question cuya
+                                                     última respuesta fue ese día
+    daily_question_activity  (fecha, id_question) -> lo mismo por pregunta (la
+                                                     asignatura se obtiene con questions)
+
+Cuando un estudiante vuelve a responder una pregunta, su fila de
+student_question cambia de last_attempt_date: la respuesta resta la fila del
+día anterior y la suma al nuevo, así que las tablas cuadran siempre con
+student_question. Se actualizan en la misma transacción que las respuestas,
+igual que student_stats y question_stats. Pueden quedar filas con respuestas = 0
+(estudiantes que ese día ya no tienen ninguna fila); las consultas las filtran.
+
+Uso desde la raíz del repositorio:
+    python -m database.daily_activity ensure                  # crea las tablas (y las rellena si son nuevas)
+    python -m database.daily_activity rebuild                 # las recalcula mes a mes desde student_question
+    python -m database.daily_activity repair 2025-03-01 2025-03-31   # recalcula solo ese rango de días
+    python -m database.daily_activity verify                  # compara las tablas con student_question
+"""
+
+import sys
+from datetime import date, timedelta
+
+
+DAILY_ACTIVITY_DDL = """
+CREATE TABLE IF NOT EXISTS daily_activity (
+    fecha DATE NOT NULL,
+    id_student INT NOT NULL,
+    respuestas INT NOT NULL DEFAULT 0,
+    intentos INT NOT NULL DEFAULT 0,
+    aciertos_primer_intento INT NOT NULL DEFAULT 0,
+    aciertos_segundo_intento INT NOT NULL DEFAULT 0,
+    nuevas INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_student),
+    KEY idx_daily_activity_student (id_student)
+)
+"""
+
+DAILY_QUESTION_ACTIVITY_DDL = """
+CREATE TABLE IF NOT EXISTS daily_question_activity (
+    fecha DATE NOT NULL,
+    id_question INT NOT NULL,
+    respuestas INT NOT NULL DEFAULT 0,
+    aciertos_primer_intento INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_question)
+)
+"""
+
+# Columnas de contadores en el orden de answer_deltas
+STUDENT_COLUMNS = ["respuestas", "intentos", "aciertos_primer_intento", "aciertos_segundo_intento", "nuevas"]
+QUESTION_COLUMNS = ["respuestas", "aciertos_primer_intento"]
+
+# Agregados de referencia sobre student_question (el rango de fechas es opcional)
+STUDENT_AGGREGATE_QUERY = """
+SELECT
+    last_attempt_date as fecha,
+    id_student,
+    COUNT(*) as respuestas,
+    COALESCE(SUM(num_attempts), 0) as intentos,
+    SUM(CASE WHEN first_attempt = 1 THEN 1 ELSE 0 END) as aciertos_primer_intento,
+    SUM(CASE WHEN num_attempts >= 2 AND second_attempt = 1 THEN 1 ELSE 0 END) as aciertos_segundo_intento,
+    SUM(CASE WHEN first_attempt_date = last_attempt_date THEN 1 ELSE 0 END) as nuevas
+FROM student_question
+WHERE last_attempt_date IS NOT NULL {rango}
+GROUP BY last_attempt_date, id_student
+"""
+
+QUESTION_AGGREGATE_QUERY = """
+SELECT
+    last_attempt_date as fecha,
+    id_question,
+    COUNT(*) as respuestas,
+    SUM(CASE WHEN first_attempt = 1 THEN 1 ELSE 0 END) as aciertos_primer_intento
+FROM student_question
+WHERE last_attempt_date IS NOT NULL {rango}
+GROUP BY last_attempt_date, id_question
+"""
+
+RANGE_FILTER = "AND last_attempt_date BETWEEN %s AND %s"
+
+UPSERT_STUDENT_DELTAS_QUERY = f"""
+INSERT INTO daily_activity
+(fecha, id_student, {", ".join(STUDENT_COLUMNS)})
+VALUES (%s, %s, {", ".join(["%s"] * len(STUDENT_COLUMNS))})
+ON DUPLICATE KEY UPDATE
+    {", ".join(f"{c} = {c} + VALUES({c})" for c in STUDENT_COLUMNS)}
+"""
+
+UPSERT_QUESTION_DELTAS_QUERY = f"""
+INSERT INTO daily_question_activity
+(fecha, id_question, {", ".join(QUESTION_COLUMNS)})
+VALUES (%s, %s, {", ".join(["%s"] * len(QUESTION_COLUMNS))})
+ON DUPLICATE KEY UPDATE
+    {", ".join(f"{c} = {c} + VALUES({c})" for c in QUESTION_COLUMNS)}
+"""
+
+
+def _contribution(num_attempts, first_attempt, second_attempt, first_date, last_date):
+    """Lo que aporta una fila de student_question a su día: [respuestas, intentos, 1º, 2º, nuevas]"""
+    return [
+        1,
+        num_attempts,
+        int(first_attempt == 1),
+        int(num_attempts >= 2 and second_attempt == 1),
+        int(first_date == last_date)
+    ]
+
+
+def answer_deltas(answers, existing):
+    """
+    Incrementos de daily_activity y daily_question_activity que producen unas respuestas
+
+    Args:
+        answers: Iterable de (id_student, id_question, is_correct, fecha) en orden
+        existing: Diccionario {(id_student, id_question): (num_attempts, mistake_number,
+            first_attempt, second_attempt, first_attempt_date, last_attempt_date)}
+            con el estado previo de student_question
+
+    Returns:
+        tuple: ({(fecha, id_student): [contadores de STUDENT_COLUMNS]},
+                {(fecha, id_question): [contadores de QUESTION_COLUMNS]})
+    """
+    state = dict(existing)
+    students = {}
+    questions = {}
+
+    def add(student_id, question_id, day, contribution, sign):
+        delta = students.setdefault((day, student_id), [0] * len(STUDENT_COLUMNS))
+        for i, value in enumerate(contribution):
+            delta[i] += sign * value
+        delta = questions.setdefault((day, question_id), [0] * len(QUESTION_COLUMNS))
+        delta[0] += sign * contribution[0]
+        delta[1] += sign * contribution[2]
+
+    for student_id, question_id, is_correct, answered_on in answers:
+        ok = 1 if is_correct else 0
+        key = (student_id, question_id)
+        previous = state.get(key)
+        if previous is None:
+            row = (1, 1 - ok, ok, 0, answered_on, answered_on)
+        else:
+            num_attempts, mistake_number, first_attempt, second_attempt, first_date, last_date = previous
+            if last_date is not None:
+                add(student_id, question_id, last_date,
+                    _contribution(num_attempts, first_attempt, second_attempt, first_date, last_date), -1)
+            row = (
+                num_attempts + 1,
+                mistake_number + 1 - ok,
+                first_attempt,
+                ok if num_attempts == 1 else second_attempt,
+                first_date,
+                answered_on
+            )
+        state[key] = row
+        add(student_id, question_id, answered_on, _contribution(row[0], row[2], row[3], row[4], row[5]), 1)
+
+    # Las respuestas del mismo día se anulan entre sí; no hace falta escribirlas
+    students = {k: v for k, v in students.items() if any(v)}
+    questions = {k: v for k, v in questions.items() if any(v)}
+    return students, questions
+
+
+def apply_deltas(cursor, deltas):
+    """Suma los incrementos a las tablas diarias (dentro de la transacción del llamante)"""
+    students, questions = deltas
+    if students:
+        cursor.executemany(
+            UPSERT_STUDENT_DELTAS_QUERY,
+            [(day, student_id, *delta) for (day, student_id), delta in sorted(students.items())]
+        )
+    if questions:
+        cursor.executemany(
+            UPSERT_QUESTION_DELTAS_QUERY,
+            [(day, question_id, *delta) for (day, question_id), delta in sorted(questions.items())]
+        )
+
+
+def ensure_daily_activity_tables(db):
+    """
+    Crea las tablas diarias si no existen y, en ese caso, las rellena
+
+    Returns:
+        bool: True si las tablas se acaban de crear
+    """
+    cursor = db.cursor()
+    cursor.execute("SHOW TABLES LIKE 'daily_question_activity'")
+    exists = cursor.fetchone() is not None
+    cursor.close()
+    if exists:
+        return False
+    rebuild_daily_activity(db)
+    return True
+
+
+def repair_daily_activity(db, desde, hasta):
+    """
+    Recalcula las tablas diarias para los días [desde, hasta] en una transacción
+
+    Returns:
+        int: Filas de daily_activity escritas
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(DAILY_ACTIVITY_DDL)
+        cursor.execute(DAILY_QUESTION_ACTIVITY_DDL)
+        cursor.execute("DELETE FROM daily_activity WHERE fecha BETWEEN %s AND %s", (desde, hasta))
+        cursor.execute("DELETE FROM daily_question_activity WHERE fecha BETWEEN %s AND %s", (desde, hasta))
+        cursor.execute(f"""
+            INSERT INTO daily_activity (fecha, id_student, {", ".join(STUDENT_COLUMNS)})
+            {STUDENT_AGGREGATE_QUERY.format(rango=RANGE_FILTER)}
+        """, (desde, hasta))
+        rows = cursor.rowcount
+        cursor.execute(f"""
+            INSERT INTO daily_question_activity (fecha, id_question, {", ".join(QUESTION_COLUMNS)})
+            {QUESTION_AGGREGATE_QUERY.format(rango=RANGE_FILTER)}
+        """, (desde, hasta))
+        db.commit()
+        return rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def rebuild_daily_activity(db):
+    """
+    Recalcula las tablas diarias completas, un mes por transacción
+
+    Los lotes mensuales evitan bloquear student_question entera mientras se
+    rellena un historial grande; el bot puede seguir escribiendo entre meses.
+    """
+    cursor = db.cursor()
+    cursor.execute(DAILY_ACTIVITY_DDL)
+    cursor.execute(DAILY_QUESTION_ACTIVITY_DDL)
+    cursor.execute("SELECT MIN(last_attempt_date), MAX(last_attempt_date) FROM student_question")
+    first, last = cursor.fetchone()
+    cursor.close()
+    if first is None:
+        print("[STATS] daily_activity: student_question está vacía")
+        return 0
+
+    total = 0
+    for desde, hasta in _month_ranges(first, last):
+        rows = repair_daily_activity(db, desde, hasta)
+        total += rows
+        print(f"[STATS] daily_activity {desde:%Y-%m}: {rows} filas")
+    print(f"[STATS] daily_activity reconstruida ({total} filas)")
+    return total
+
+
+def repair_keys(cursor, student_days, question_days):
+    """
+    Recalcula desde student_question unas filas concretas de las tablas diarias
+    (dentro de la transacción del llamante, que debe tener bloqueadas las filas
+    de student_question de esos estudiantes y preguntas)
+
+    Args:
+        student_days: Iterable de (fecha, id_student)
+        question_days: Iterable de (fecha, id_question)
+    """
+    targets = [
+        ("daily_activity", "id_student", STUDENT_COLUMNS, STUDENT_AGGREGATE_QUERY, student_days),
+        ("daily_question_activity", "id_question", QUESTION_COLUMNS, QUESTION_AGGREGATE_QUERY, question_days),
+    ]
+    for table, key_column, columns, aggregate, keys in targets:
+        keys = sorted(set(keys))
+        if not keys:
+            continue
+        placeholders = ", ".join(["(%s, %s)"] * len(keys))
+        params = [v for key in keys for v in key]
+        cursor.execute(f"DELETE FROM {table} WHERE (fecha, {key_column}) IN ({placeholders})", params)
+        cursor.execute(f"""
+            INSERT INTO {table} (fecha, {key_column}, {", ".join(columns)})
+            {aggregate.format(rango=f"AND (last_attempt_date, {key_column}) IN ({placeholders})")}
+        """, params)
+
+
+def _month_ranges(first, last):
+    """Rangos (primer día, último día) de cada mes entre dos fechas"""
+    start = date(first.year, first.month, 1)
+    while start <= last:
+        following = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        yield start, following - timedelta(days=1)
+        start = following
+
+
+def verify_daily_activity(db):
+    """
+    Compara las tablas diarias con el agregado de student_question
+
+    Returns:
+        list: (tabla, clave, valores_en_tabla, valores_esperados) de cada diferencia
+    """
+    checks = [
+        ("daily_activity", "id_student", STUDENT_COLUMNS, STUDENT_AGGREGATE_QUERY),
+        ("daily_question_activity", "id_question", QUESTION_COLUMNS, QUESTION_AGGREGATE_QUERY),
+    ]
+    differences = []
+    cursor = db.cursor()
+    for table, key_column, columns, aggregate in checks:
+        cursor.execute(aggregate.format(rango=""))
+        expected = {(row[0], row[1]): [int(v) for v in row[2:]] for row in cursor.fetchall()}
+        cursor.execute(f"SELECT fecha, {key_column}, {', '.join(columns)} FROM {table} WHERE respuestas <> 0")
+        stored = {(row[0], row[1]): [int(v) for v in row[2:]] for row in cursor.fetchall()}
+
+        empty = [0] * len(columns)
+        for key in sorted(set(expected) | set(stored)):
+            actual, wanted = stored.get(key, empty), expected.get(key, empty)
+            if actual != wanted:
+                differences.append((table, key, actual, wanted))
+    cursor.close()
+    return differences
+
+
+def main(argv):
+    from database.db_connection import db_connection
+
+    command = argv[1] if len(argv) > 1 else "verify"
+    if command not in ("ensure", "rebuild", "repair", "verify") or (command == "repair" and len(argv) < 4):
+        print(__doc__)
+        return 2
+
+    db = db_connection()
+    try:
+        if command == "ensure":
+            created = ensure_daily_activity_tables(db)
+            print("Tablas creadas y rellenadas" if created else "Las tablas ya existían")
+        elif command == "rebuild":
+            rebuild_daily_activity(db)
+        elif command == "repair":
+            desde, hasta = date.fromisoformat(argv[2]), date.fromisoformat(argv[3])
+            rows = repair_daily_activity(db, desde, hasta)
+            print(f"{rows} filas de daily_activity recalculadas entre {desde} y {hasta}")
+        else:
+            differences = verify_daily_activity(db)
+            for table, key, actual, wanted in differences[:50]:
+                print(f"{table} {key}: {actual} (esperado {wanted})")
+            print(f"{len(differences)} diferencias")
+            return 1 if differences else 0
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
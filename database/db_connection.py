@@ -1,20 +1,400 @@
+import threading
+import time
+
 import mysql.connector
+import config
+from database.query_metrics import instrument_cursor
 from config import * # importamos variable de entorno o configuraciones
 
 
-def db_connection():
-# Conexión a la base de datos
-    db = mysql.connector.connect(
+# Parámetros del pool (se pueden sobrescribir en config.py)
+POOL_SIZE = getattr(config, "POOL_SIZE", 10)                          # Conexiones físicas máximas
+POOL_TIMEOUT = getattr(config, "POOL_TIMEOUT", 5.0)                   # Segundos de espera máxima al pedir una conexión
+POOL_HEALTH_CHECK_IDLE = getattr(config, "POOL_HEALTH_CHECK_IDLE", 30.0)  # Ping si lleva más de N segundos ociosa
+
+# Conexiones que hacen falta además de una por hilo del bot: el volcado del buffer
+# de respuestas y al menos una para el dashboard
+POOL_RESERVED = 2
+
+
+class PoolTimeoutError(Exception):
+    """No se ha podido obtener una conexión del pool dentro del tiempo máximo"""
+
+
+def _mysql_factory():
+    """Crea una conexión física a MySQL con los parámetros de config.py"""
+    return mysql.connector.connect(
         host=HOST,
         user=USER,      # Cambia esto si usas otro usuario
         password=PASSWORD,
         database=DATABASE
     )
-    # Verificar la conexión
-    if db.is_connected():
-        print("Conexión a la base de datos exitosa")
-    else:
-        print("Error al conectar a la base de datos")
-        return -1  # Retorna error si no se puede conectar       
-    return db
-  
\ No newline at end of file
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones compartido por el bot y el dashboard.
+
+    - Como máximo `size` conexiones físicas abiertas a la vez.
+    - Si no hay conexiones libres, el hilo espera hasta `timeout` segundos
+      y después lanza PoolTimeoutError.
+    - Las conexiones ociosas más de `health_check_idle` segundos se comprueban
+      con ping antes de entregarse; si fallan se descartan y se crea otra.
+    - Afinidad por hilo: cada hilo recupera preferentemente la última
+      conexión física que devolvió (cachés de sesión y sentencias calientes).
+
+    Args:
+        factory: Función sin argumentos que crea una conexión física
+            (mysql.connector por defecto; cualquier objeto DB-API sirve para pruebas)
+        size: Número máximo de conexiones físicas
+        timeout: Segundos máximos de espera en `acquire`
+        health_check_idle: Segundos de inactividad a partir de los cuales se hace ping
+    """
+
+    def __init__(self, factory=_mysql_factory, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_idle=POOL_HEALTH_CHECK_IDLE):
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.health_check_idle = health_check_idle
+
+        self._cond = threading.Condition()
+        self._idle = []          # Lista de (conexión, instante en que quedó libre)
+        self._total = 0          # Conexiones físicas abiertas (libres + prestadas)
+        self._affinity = threading.local()
+
+        # Estadísticas
+        self._in_use = 0
+        self._created = 0
+        self._discarded = 0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def acquire(self):
+        """
+        Obtiene una conexión física del pool
+
+        Returns:
+            Conexión física lista para usar
+
+        Raises:
+            PoolTimeoutError: Si no hay conexiones disponibles tras `timeout` segundos
+        """
+        deadline = None
+        waited_since = None
+
+        with self._cond:
+            while True:
+                raw, idle_since = self._take_idle()
+                if raw is not None:
+                    break
+
+                if self._total < self.size:
+                    # Reservamos el hueco y creamos la conexión fuera del lock
+                    self._total += 1
+                    idle_since = None
+                    break
+
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout
+                    waited_since = time.monotonic()
+                    self._waits += 1
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += time.monotonic() - waited_since
+                    raise PoolTimeoutError(
+                        f"No hay conexiones libres tras {self.timeout}s "
+                        f"({self._in_use}/{self.size} en uso)"
+                    )
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                self._wait_time += time.monotonic() - waited_since
+            self._in_use += 1
+            self._acquired += 1
+
+        try:
+            if raw is None:
+                raw = self._create()
+            elif time.monotonic() - idle_since > self.health_check_idle and not self._is_healthy(raw):
+                self._close_quietly(raw)
+                with self._cond:
+                    self._discarded += 1
+                raw = self._create()
+        except Exception:
+            # No se pudo abrir la conexión: liberamos el hueco reservado
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return raw
+
+    def release(self, raw):
+        """
+        Devuelve una conexión física al pool
+
+        Se deshace cualquier transacción abierta; si la conexión está rota
+        se descarta y se libera su hueco.
+        """
+        # Deshacer la transacción abierta también libera la instantánea de lectura
+        # (REPEATABLE READ), para que el siguiente usuario vea datos actuales
+        healthy = True
+        try:
+            if getattr(raw, "in_transaction", True):
+                raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, time.monotonic()))
+                self._affinity.conn = raw
+            else:
+                self._total -= 1
+                self._discarded += 1
+            self._cond.notify()
+
+        if not healthy:
+            self._close_quietly(raw)
+
+    def discard(self, raw):
+        """Cierra una conexión prestada sin devolverla al pool"""
+        with self._cond:
+            self._in_use -= 1
+            self._total -= 1
+            self._discarded += 1
+            self._cond.notify()
+        self._close_quietly(raw)
+
+    def close_all(self):
+        """Cierra todas las conexiones libres del pool"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        """
+        Obtiene las estadísticas actuales del pool
+
+        Returns:
+            dict: size, open, in_use, idle, created, discarded, acquired,
+                  waits, wait_time, avg_wait_ms, timeouts
+        """
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._total,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self._created,
+                "discarded": self._discarded,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "wait_time": round(self._wait_time, 4),
+                "avg_wait_ms": round(self._wait_time / self._waits * 1000, 2) if self._waits else 0,
+                "timeouts": self._timeouts
+            }
+
+    def _take_idle(self):
+        """Saca una conexión libre, priorizando la del hilo actual (llamar con el lock)"""
+        if not self._idle:
+            return None, None
+
+        preferred = getattr(self._affinity, "conn", None)
+        if preferred is not None:
+            for i, (raw, idle_since) in enumerate(self._idle):
+                if raw is preferred:
+                    del self._idle[i]
+                    return raw, idle_since
+
+        # La más reciente está más caliente y es la que menos riesgo tiene de haber caducado
+        return self._idle.pop()
+
+    def _create(self):
+        raw = self._factory()
+        with self._cond:
+            self._created += 1
+        print(f"[POOL] Nueva conexión a la base de datos ({self._total}/{self.size})")
+        return raw
+
+    @staticmethod
+    def _is_healthy(raw):
+        try:
+            if hasattr(raw, "ping"):
+                raw.ping(reconnect=True, attempts=1, delay=0)
+                return True
+            if hasattr(raw, "is_connected"):
+                return raw.is_connected()
+            raw.cursor().close()
+            return True
+        except Exception as e:
+            print(f"[POOL] Conexión descartada en health check: {e}")
+            return False
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """
+    Conexión prestada por el pool con la misma interfaz que la de mysql.connector.
+
+    `close()` devuelve la conexión física al pool (y puede llamarse varias veces).
+    `reconnect()` sobre una conexión ya devuelta vuelve a pedir otra al pool,
+    de modo que el código existente que hace `db.close()` y después
+    `db.reconnect()` sigue funcionando.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._raw = None
+        self._raw = pool.acquire()
+
+    @property
+    def raw(self):
+        """Conexión física subyacente (vuelve a pedirla al pool si se había devuelto)"""
+        if self._raw is None:
+            self._raw = self._pool.acquire()
+        return self._raw
+
+    def cursor(self, *args, **kwargs):
+        # Cursor medido (latencia, filas y llamante; ver database/query_metrics.py)
+        return instrument_cursor(self.raw.cursor(*args, **kwargs))
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        if self._raw is not None:
+            self._raw.rollback()
+
+    def is_connected(self):
+        if self._raw is None:
+            return False
+        try:
+            return self._raw.is_connected() if hasattr(self._raw, "is_connected") else True
+        except Exception:
+            return False
+
+    def reconnect(self, *args, **kwargs):
+        if self._raw is None:
+            self._raw = self._pool.acquire()
+        elif hasattr(self._raw, "reconnect"):
+            self._raw.reconnect(*args, **kwargs)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+    def __getattr__(self, name):
+        # Resto de atributos (autocommit, server_info, ...) de la conexión física
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Red de seguridad para conexiones que nunca se cerraron
+        try:
+            if self._raw is not None:
+                self._pool.release(self._raw)
+                self._raw = None
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Obtiene el pool compartido del proceso (se crea en el primer uso)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def configure_pool(factory=_mysql_factory, **kwargs):
+    """
+    Sustituye el pool compartido (p. ej. por uno con otra factoría o tamaño)
+
+    Args:
+        factory: Función que crea conexiones físicas
+        **kwargs: size, timeout, health_check_idle
+
+    Returns:
+        ConnectionPool: El nuevo pool
+    """
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(factory, **kwargs)
+    if old is not None:
+        old.close_all()
+    return _pool
+
+
+def check_pool_size(workers, size=None):
+    """
+    Comprueba que el pool tiene sitio para los hilos del bot y las conexiones reservadas
+
+    Cada hilo de chats usa como mucho una conexión a la vez (las funciones que
+    necesitan la BD reciben la del manejador en lugar de pedir otra). Mientras
+    tanto un manejador puede esperar al volcado del buffer de respuestas, que
+    usa otra, y el dashboard comparte el mismo pool. Con menos de
+    workers + POOL_RESERVED conexiones un pico de carga las agota y los
+    manejadores fallan con PoolTimeoutError.
+
+    Args:
+        workers: Hilos del bot (BOT_WORKERS)
+        size: Tamaño del pool (el del pool compartido por defecto)
+
+    Raises:
+        ValueError: Si el pool es demasiado pequeño
+    """
+    size = get_pool().size if size is None else size
+    required = workers + POOL_RESERVED
+    if size < required:
+        raise ValueError(
+            f"POOL_SIZE={size} es insuficiente para BOT_WORKERS={workers}: "
+            f"hacen falta al menos {required} conexiones"
+        )
+
+
+def get_pool_stats():
+    """Estadísticas del pool compartido (en uso, esperas, tiempo de espera...)"""
+    return get_pool().stats()
+
+
+def db_connection():
+# Conexión a la base de datos (prestada por el pool compartido)
+# No se hace ping: acquire() ya comprueba las conexiones que llevan ociosas más de health_check_idle
+    try:
+        return PooledConnection(get_pool())
+    except PoolTimeoutError as e:
+        print(f"Error al conectar a la base de datos: {e}")
+        raise
+    except mysql.connector.Error as e:
+        print(f"Error al conectar a la base de datos: {e}")
+        return -1  # Retorna error si no se puede abrir una conexión nueva
@@ -1,5 +1,20 @@
 
+import atexit
+import random
+from datetime import date, datetime, time
 from config import * # importamos variable de entorno o configuraciones
+from database.db_connection import db_connection
+from database.ranking import ranking_index
+from database.answer_buffer import (
+    AnswerBuffer, AnswerFlushError, ANSWER_BUFFER_ENABLED, ensure_checkpoint_table, has_answer_unique_key
+)
+from database.student_cache import student_cache, StudentProfile, MISSING
+from database.question_bank import question_bank
+from database import student_stats, question_stats, daily_activity, answer_events
+from database.query_cache import query_cache, invalidate_answers
+
+# Buffer de escritura diferida de respuestas (se arranca con start_answer_buffer)
+answer_buffer = None
 
 #Query de preguntas
 def load_questions(db):
@@ -12,71 +27,91 @@ def load_questions(db):
     cursor.close()
     return questions
 
-# Comprobación de la existencia del estudiante
-def chat_id_result(db, chat_id):
+# Perfil del estudiante (id, nombre, estado, nivel, modo de vista) en una sola consulta, con caché
+def get_student_profile(db, chat_id):
+    profile = student_cache.get(chat_id)
+    if profile is not MISSING:
+        return profile
+
     cursor = db.cursor()
-    query = "SELECT id, name FROM students WHERE cid = %s"
+    # El estado y el nivel son los del último registro en student_subject
+    query = """
+    SELECT s.id, s.name, ss.state, ss.level, s.view_mode
+    FROM students s
+    LEFT JOIN student_subject ss ON ss.id = (
+        SELECT MAX(id) FROM student_subject WHERE id_student = s.id
+    )
+    WHERE s.cid = %s
+    """
     cursor.execute(query, (chat_id,))
     result = cursor.fetchone()
-    print(f"Resultado de la consulta para chat_id {chat_id}: {result}")
     cursor.close()
-    return result if result else None  # Devuelve el ID del estudiante o None si no existe   
+
+    profile = StudentProfile(*result) if result else None
+    student_cache.put(chat_id, profile)
+    return profile
+
+# Comprobación de la existencia del estudiante
+def chat_id_result(db, chat_id):
+    profile = get_student_profile(db, chat_id)
+    result = (profile.id, profile.name) if profile else None
+    print(f"Resultado de la consulta para chat_id {chat_id}: {result}")
+    return result  # Devuelve el ID del estudiante o None si no existe   
 
 # Ranking de estudiantes    
 def query_ranking(db):
     cursor = db.cursor()
     query = """
     SELECT
-        sq.id_student,
+        st.id_student,
         s.name,
-        COUNT(DISTINCT sq.id_question) as preguntas_respondidas,
-        SUM(sq.num_attempts) as total_intentos,
-        SUM(sq.mistake_number) as total_errores,
+        st.preguntas_respondidas,
+        st.total_intentos,
+        st.total_errores,
         CASE
-            WHEN SUM(sq.num_attempts) > 0
-            THEN ROUND((1 - (SUM(sq.mistake_number) / SUM(sq.num_attempts))) * 100, 2)
+            WHEN st.total_intentos > 0
+            THEN ROUND((1 - (st.total_errores / st.total_intentos)) * 100, 2)
             ELSE 0
         END as tasa_acierto
-    FROM student_question sq
-    INNER JOIN students s ON sq.id_student = s.id
-    GROUP BY sq.id_student, s.name
-    HAVING SUM(sq.num_attempts) > 0
+    FROM student_stats st
+    INNER JOIN students s ON st.id_student = s.id
+    WHERE st.total_intentos > 0
     ORDER BY tasa_acierto DESC, preguntas_respondidas DESC
     """
     cursor.execute(query)
     rankings = cursor.fetchall()
     cursor.close()
     return rankings
+
+# Índice de clasificación en memoria (se reconstruye con query_ranking cuando caduca)
+def get_ranking(db):
+    if ranking_index.needs_load():
+        ranking_index.load(query_ranking(db))
+    return ranking_index
+
+# Top n de la clasificación, completando nombres de estudiantes recién incorporados
+def get_ranking_top(db, n=3):
+    ranking = get_ranking(db)
+    top = ranking.top(n)
+    if any(row.name is None for row in top):
+        cursor = db.cursor()
+        for row in top:
+            if row.name is None:
+                cursor.execute("SELECT name FROM students WHERE id = %s", (row.id_student,))
+                result = cursor.fetchone()
+                ranking.set_name(row.id_student, result[0] if result else "")
+        cursor.close()
+        top = ranking.top(n)
+    return top
 # Verificar registro del estudiante
 def check_student_registration(db, chat_id):
-    cursor = db.cursor()
-    # Primero verificar si existe el estudiante
-    query = "SELECT id FROM students WHERE cid = %s"
-    cursor.execute(query, (chat_id,))
-    result = cursor.fetchone()
-    
-    if not result:
-        cursor.close()
+    profile = get_student_profile(db, chat_id)
+    if not profile:
         return None  # No está registrado
     
-    student_id = result[0]
-    
-    # Verificar estado en student_subject
-    query = """
-    SELECT state 
-    FROM student_subject 
-    WHERE id_student = %s 
-    ORDER BY id DESC 
-    LIMIT 1
-    """
-    cursor.execute(query, (student_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    
-    if result:
-        return result[0]  # Retorna 'A', 'P' o 'B'
-    else:
-        return None  # No tiene registro en student_subject
+    # Estado del último registro en student_subject: 'A', 'P' o 'B'
+    # (None si no tiene registro en student_subject)
+    return profile.state
 
 # Registrar nuevo estudiante
 def register_student(db, chat_id, name, email):
@@ -98,6 +133,8 @@ def register_student(db, chat_id, name, email):
         
         db.commit()
         cursor.close()
+        student_cache.invalidate(chat_id=chat_id)
+        query_cache.invalidate("students")
         return True
     except Exception as e:
         print(f"Error en registro: {e}")
@@ -107,15 +144,14 @@ def register_student(db, chat_id, name, email):
 
 # Verificar si el estudiante ya existe
 def student_exists(db, chat_id):
-    cursor = db.cursor()
-    query = "SELECT COUNT(*) FROM students WHERE cid = %s"
-    cursor.execute(query, (chat_id,))
-    count = cursor.fetchone()[0]
-    cursor.close()
-    return count > 0
+    return get_student_profile(db, chat_id) is not None
 
 # Obtener nivel actual del estudiante
 def get_student_level(db, student_id):
+    profile = student_cache.get_by_student(student_id)
+    if profile is not MISSING and profile is not None and profile.level is not None:
+        return profile.level
+
     cursor = db.cursor()
     query = "SELECT level FROM student_subject WHERE id_student = %s LIMIT 1"
     cursor.execute(query, (student_id,))
@@ -123,14 +159,26 @@ def get_student_level(db, student_id):
     cursor.close()
     return result[0] if result else 1  # Por defecto nivel 1
 
+# Intentos del estudiante por pregunta: id_question -> (num_attempts, mistake_number, last_attempt_date)
+def get_student_attempts(db, student_id):
+    cursor = db.cursor()
+    query = """
+    SELECT 
+        id_question,
+        MAX(num_attempts) as num_attempts,
+        MAX(mistake_number) as mistake_number,
+        MAX(last_attempt_date) as last_attempt_date
+    FROM student_question
+    WHERE id_student = %s
+    GROUP BY id_question
+    """
+    cursor.execute(query, (student_id,))
+    attempts = {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+    cursor.close()
+    return attempts
+
 # Cargar preguntas por nivel
 def load_questions_by_level(db, level, student_id):
-#    cursor = db.cursor()
-#    query = "SELECT * FROM questions WHERE level = %s AND state = 'A'"
-#    cursor.execute(query, (level,))
-#    questions = cursor.fetchall()
-#    cursor.close()
-#    return questions
     """
     Carga hasta 5 preguntas del nivel especificado que el estudiante NO haya dominado.
     Una pregunta está dominada cuando ha sido acertada 2 veces (num_attempts - mistake_number >= 2)
@@ -138,73 +186,59 @@ def load_questions_by_level(db, level, student_id):
     1. Preguntas nunca intentadas (nuevas)
     2. Preguntas con errores previos (requieren refuerzo)
     3. Preguntas con aciertos pero no dominadas (repaso)
+    Dentro de cada grupo, primero las respondidas hace más tiempo y luego al azar.
+    Las preguntas salen del banco en memoria; solo se consultan los intentos del estudiante.
     """
-    cursor = db.cursor()
-    query = """
-    SELECT q.*
-    FROM questions q
-    LEFT JOIN (
-        SELECT 
-            id_question,
-            MAX(num_attempts) as num_attempts,
-            MAX(mistake_number) as mistake_number,
-            MAX(last_attempt_date) as last_attempt_date
-        FROM student_question
-        WHERE id_student = %s
-        GROUP BY id_question
-    ) sq ON q.id = sq.id_question
-    WHERE q.level = %s 
-      AND q.state = 'A'
-      AND (
-          sq.id_question IS NULL
-          OR (sq.num_attempts - sq.mistake_number) < 2
-      )
-    ORDER BY 
-        CASE 
-            WHEN sq.id_question IS NULL THEN 0
-            WHEN sq.mistake_number > 0 THEN 1
-            ELSE 2
-        END,
-        sq.last_attempt_date ASC,
-        RAND()
-    LIMIT 5
-    """
-    cursor.execute(query, (student_id, level))
-    questions = cursor.fetchall()
-    cursor.close()
-    
-    return questions
+    question_bank.ensure_loaded(db)
+    attempts = get_student_attempts(db, student_id)
+
+    candidates = []
+    for question in question_bank.questions(level):
+        attempt = attempts.get(question[0])
+        if attempt is None:
+            candidates.append(((0, date.min, random.random()), question))
+            continue
+        num_attempts, mistake_number, last_attempt_date = attempt
+        if num_attempts - mistake_number >= 2:
+            continue  # Dominada
+        priority = 1 if mistake_number > 0 else 2
+        candidates.append(((priority, last_attempt_date or date.min, random.random()), question))
+
+    candidates.sort(key=lambda candidate: candidate[0])
+    return [question for _, question in candidates[:5]]
+
+# Obtener una pregunta del banco por su clave (id_subject, id)
+# Si hay que recargar el banco se usa la conexión del llamante (si la tiene) en lugar de pedir otra al pool
+def get_question(question_key, db=None):
+    if question_bank.needs_load():
+        if db is not None:
+            question_bank.ensure_loaded(db)
+        else:
+            db = db_connection()
+            try:
+                question_bank.ensure_loaded(db)
+            finally:
+                db.close()
+    subject_id, question_id = question_key
+    return question_bank.get(question_id, subject_id)
 
 # Verificar si el estudiante puede promocionar de nivel
 def check_level_completion(db, student_id, level):
-    cursor = db.cursor()
-    
+    question_bank.ensure_loaded(db)
+
     # Total de preguntas del nivel
-    query_total = "SELECT COUNT(*) FROM questions WHERE level = %s AND state = 'A'"
-    cursor.execute(query_total, (level,))
-    total_questions = cursor.fetchone()[0]
+    total_questions = question_bank.count(level)
     
-    # Preguntas respondidas por el estudiante en ese nivel
-    query_answered = """
-    SELECT COUNT(DISTINCT sq.id_question) 
-    FROM student_question sq
-    JOIN questions q ON sq.id_question = q.id
-    WHERE sq.id_student = %s AND q.level = %s
-    """
-    cursor.execute(query_answered, (student_id, level))
-    answered_questions = cursor.fetchone()[0]
+    # Preguntas respondidas por el estudiante en ese nivel (de cualquier estado)
+    level_ids = {question[0] for question in question_bank.questions(level, state=None)}
+    answered_questions = len(level_ids & get_student_attempts(db, student_id).keys())
     
-    cursor.close()
     return total_questions, answered_questions
 
 # Verificar si existe un nivel superior
 def exists_next_level(db, current_level):
-    cursor = db.cursor()
-    query = "SELECT COUNT(*) FROM questions WHERE level = %s AND state = 'A'"
-    cursor.execute(query, (current_level + 1,))
-    count = cursor.fetchone()[0]
-    cursor.close()
-    return count > 0
+    question_bank.ensure_loaded(db)
+    return question_bank.count(current_level + 1) > 0
 
 # Promover estudiante al siguiente nivel
 def promote_student_level(db, student_id):
@@ -214,6 +248,8 @@ def promote_student_level(db, student_id):
         cursor.execute(query, (student_id,))
         db.commit()
         cursor.close()
+        student_cache.invalidate(student_id=student_id)
+        query_cache.invalidate("students")
         return True
     except Exception as e:
         print(f"Error al promover estudiante: {e}")
@@ -223,24 +259,35 @@ def promote_student_level(db, student_id):
 
 # Obtener nivel máximo del juego
 def get_max_level(db):
-    cursor = db.cursor()
-    query = "SELECT MAX(level) FROM questions WHERE state = 'A'"
-    cursor.execute(query)
-    result = cursor.fetchone()
-    cursor.close()
-    return result[0] if result[0] else 1
+    question_bank.ensure_loaded(db)
+    return question_bank.max_level() or 1
     
-def register_answer(db, student_id, question_id, is_correct, attempt_number=1):
+def register_answer(db, student_id, question_id, is_correct, attempt_number=1, subject_id=None):
     """
     Registra la respuesta de un estudiante a una pregunta
+    Con el buffer activo solo se encola (y se anota en el diario); el volcado a
+    student_question se hace por lotes en segundo plano.
+    En ambos casos la respuesta queda también como evento en answer_events.
     """
+    if answer_buffer is not None and answer_buffer.running:
+        answer_buffer.submit(student_id, question_id, is_correct, subject_id=subject_id)
+        return True
+
+    answered_at = datetime.now()
+    # La tabla de eventos del mes se crea antes de abrir la transacción (el DDL la confirmaría)
+    # y con esta misma conexión, para no pedir una segunda al pool
+    if answer_events.ANSWER_EVENTS_ENABLED:
+        answer_events.ensure_month_table(answered_at, db)
+
     cursor = db.cursor()
     try:
         # Verificar si ya existe un registro para esta pregunta
         check_query = """
-        SELECT id, num_attempts, mistake_number, first_attempt, second_attempt 
+        SELECT id, num_attempts, mistake_number, first_attempt, second_attempt,
+               first_attempt_date, last_attempt_date
         FROM student_question 
         WHERE id_student = %s AND id_question = %s
+        FOR UPDATE
         """
         cursor.execute(check_query, (student_id, question_id))
         existing = cursor.fetchone()
@@ -280,8 +327,15 @@ def register_answer(db, student_id, question_id, is_correct, attempt_number=1):
             first_attempt = 1 if is_correct else 0
             cursor.execute(insert_query, (student_id, question_id, mistake_number, 1, first_attempt, 0))
         
+        # Resúmenes por estudiante y por pregunta en la misma transacción
+        previous = {(student_id, question_id): tuple(existing[1:])} if existing else {}
+        _update_summary_tables(cursor, [(student_id, question_id, is_correct, answered_at.date())], previous)
+        answer_events.append_events(cursor, [(answered_at, student_id, subject_id, question_id, is_correct)])
+        
         db.commit()
         cursor.close()
+        ranking_index.record_answer(student_id, is_correct, existing is None)
+        invalidate_answers()
         return True
     except Exception as e:
         print(f"Error al registrar respuesta: {e}")
@@ -297,6 +351,7 @@ def update_view_mode(db, student_id, mode):
         cursor.execute(query, (mode, student_id))
         db.commit()
         cursor.close()
+        student_cache.invalidate(student_id=student_id)
         return True
     except Exception as e:
         print(f"Error al actualizar modo de vista: {e}")
@@ -306,6 +361,10 @@ def update_view_mode(db, student_id, mode):
 
 # Obtener modo de vista del estudiante
 def get_view_mode(db, student_id):
+    profile = student_cache.get_by_student(student_id)
+    if profile is not MISSING and profile is not None and profile.view_mode is not None:
+        return profile.view_mode
+
     cursor = db.cursor()
     query = "SELECT view_mode FROM students WHERE id = %s"
     cursor.execute(query, (student_id,))
@@ -315,32 +374,79 @@ def get_view_mode(db, student_id):
 
 # Mostrar preguntas por nivel y las preguntas que quedan por responder del nivel
 def check_number_question_level(db, student_id):
-    cursor = db.cursor()
+    question_bank.ensure_loaded(db)
     
     level = get_student_level(db, student_id)   
     print(f"[NIVEL] Nivel actual del estudiante {student_id}: {level}")
     # Total de preguntas del nivel
-    query_total = "SELECT COUNT(*) FROM questions WHERE level = %s AND state = 'A'"
-    #cursor.execute(query_total, (level))
-    cursor.execute(query_total, (level,))
-    total_questions = cursor.fetchone()[0]
+    level_questions = question_bank.questions(level)
+    total_questions = len(level_questions)
     
     # Preguntas que quedan por superar correctamente
-    query_answered = """
-    SELECT COUNT(*) 
-    FROM questions q
-    WHERE q.level = %s 
-    AND q.state = 'A'
-    AND NOT EXISTS (
-      SELECT 1 
-      FROM student_question sq 
-      WHERE sq.id_student = %s 
-        AND sq.id_question = q.id 
-        AND (sq.num_attempts - sq.mistake_number) >= 2)
-    """
-    cursor.execute(query_answered, (level, student_id))
-    answered_questions = cursor.fetchone()[0]
+    attempts = get_student_attempts(db, student_id)
+    answered_questions = sum(
+        1 for question in level_questions
+        if question[0] not in attempts
+        or attempts[question[0]][0] - attempts[question[0]][1] < 2
+    )
     
-    cursor.close()
     return total_questions, answered_questions, level
 
+# Arrancar el buffer de respuestas (reproduce el diario si el proceso se cayó)
+def start_answer_buffer(db):
+    global answer_buffer
+    if not ANSWER_BUFFER_ENABLED or (answer_buffer is not None and answer_buffer.running):
+        return answer_buffer
+    if not has_answer_unique_key(db):
+        print("[BUFFER] student_question no tiene índice único (id_student, id_question); "
+              "las respuestas se escribirán una a una")
+        return None
+    ensure_checkpoint_table(db)
+    answer_buffer = AnswerBuffer(db_connection, on_flushed=_on_answers_flushed,
+                                 before_begin=_prepare_batch, before_commit=_update_summaries_for_batch)
+    answer_buffer.start()
+    atexit.register(answer_buffer.stop)
+    return answer_buffer
+
+# Volcar ya las respuestas pendientes (p. ej. antes de evaluar la promoción de nivel)
+# Lanza AnswerFlushError si alguna no llegó a la BD: los datos que se lean después no están al día
+def flush_answers():
+    if answer_buffer is not None:
+        answer_buffer.flush()
+
+# Métricas del buffer de respuestas
+def get_answer_buffer_stats():
+    if answer_buffer is None:
+        return {"enabled": False, "queue_depth": 0}
+    return answer_buffer.stats()
+
+# Actualiza student_stats, question_stats y la actividad diaria con unas respuestas (dentro de la transacción abierta)
+def _update_summary_tables(cursor, answers, existing):
+    student_stats.apply_deltas(cursor, student_stats.answer_deltas(answers, existing))
+    question_stats.apply_deltas(cursor, question_stats.answer_deltas(answers, existing))
+    daily_activity.apply_deltas(cursor, daily_activity.answer_deltas(answers, existing))
+
+# Antes de abrir la transacción del lote se crean con su conexión las tablas de eventos que falten
+def _prepare_batch(db, batch):
+    if not answer_events.ANSWER_EVENTS_ENABLED:
+        return
+    for day in sorted({a["d"][:7] for a in batch}):
+        answer_events.ensure_month_table(date.fromisoformat(day + "-01"), db)
+
+# Cada lote del buffer actualiza las tablas resumen y anota los eventos en su misma transacción
+def _update_summaries_for_batch(cursor, batch, existing):
+    answers = [(a["s"], a["q"], a["ok"] == 1, date.fromisoformat(a["d"])) for a in batch]
+    _update_summary_tables(cursor, answers, existing)
+    answer_events.append_events(cursor, [
+        (datetime.combine(day, time.fromisoformat(a.get("h", "00:00:00"))), a["s"], a.get("j"), a["q"], a["ok"])
+        for a, (_, _, _, day) in zip(batch, answers)
+    ])
+
+# Tras cada volcado se actualizan las estructuras en memoria que dependen de las respuestas
+def _on_answers_flushed(batch, existing):
+    seen = set(existing)
+    for answer in batch:
+        key = (answer["s"], answer["q"])
+        ranking_index.record_answer(answer["s"], answer["ok"] == 1, key not in seen)
+        seen.add(key)
+    invalidate_answers()
@@ -0,0 +1,347 @@
+"""
+Exportación columnar (Parquet / Arrow) para informes fuera de línea
+
+Vuelca students, questions, student_question y las tablas de actividad diaria a
+ficheros por particiones dentro de EXPORT_DIR:
+
+    exports/student_question/mes=2025-03/part-20250401T120000.parquet
+    exports/questions/part-20250401T120000.parquet
+    exports/_estado.json          <- marca de agua de cada conjunto
+
+Las filas se leen con un cursor sin buffer en bloques de EXPORT_CHUNK_SIZE y
+cada bloque se escribe como un row group, así que la memoria no depende del
+tamaño de la tabla. El esquema se obtiene de cursor.description.
+
+Modo incremental: student_question solo exporta las filas con
+last_attempt_date >= la marca de agua anterior (el último día se repite; al leer
+hay que quedarse con la fila del part más reciente por (id_student, id_question)).
+El resto de conjuntos son pequeños o cambian días pasados (las tablas diarias
+restan filas del día anterior), así que siempre se exportan completos.
+
+La marca de agua es del directorio de exportación: cada consumidor incremental
+usa el suyo (--dir en la línea de órdenes; el dashboard usa DASHBOARD_EXPORT_DIR)
+para que uno no se salte las filas que ya descargó otro.
+
+Requiere pyarrow (pip install pyarrow). Uso desde la raíz del repositorio:
+    python -m database.export                          # todos los conjuntos, completos
+    python -m database.export --incremental student_question
+    python -m database.export --formato arrow questions
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+import config
+from database.db_connection import db_connection
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow es opcional: sin él solo falla la exportación
+    pa = pq = ipc = None
+
+try:
+    from mysql.connector import FieldType
+except ImportError:
+    FieldType = None
+
+
+EXPORT_DIR = getattr(config, "EXPORT_DIR", "exports")
+EXPORT_CHUNK_SIZE = getattr(config, "EXPORT_CHUNK_SIZE", 10000)   # Filas por bloque (row group)
+EXPORT_FORMAT = getattr(config, "EXPORT_FORMAT", "parquet")       # "parquet" o "arrow"
+
+STATE_FILE = "_estado.json"
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+class ExportError(Exception):
+    """La exportación no se puede hacer (falta pyarrow, conjunto desconocido...)"""
+
+
+# Conjuntos exportables:
+#   query: consulta completa (ordenada por la columna de partición si la hay)
+#   incremental: consulta con la marca de agua como parámetro (None = siempre completa)
+#   partition: columna de fecha por cuyo mes se particiona (None = un solo directorio)
+#   watermark: columna cuyo máximo se guarda como marca de agua
+DATASETS = {
+    "students": {
+        "query": "SELECT * FROM students ORDER BY id",
+        "incremental": None,
+        "partition": None,
+        "watermark": None,
+    },
+    "questions": {
+        "query": "SELECT * FROM questions ORDER BY id_subject, id",
+        "incremental": None,
+        "partition": None,
+        "watermark": None,
+    },
+    "student_question": {
+        "query": "SELECT * FROM student_question ORDER BY last_attempt_date",
+        "incremental": "SELECT * FROM student_question WHERE last_attempt_date >= %s ORDER BY last_attempt_date",
+        "partition": "last_attempt_date",
+        "watermark": "last_attempt_date",
+    },
+    "daily_activity": {
+        "query": "SELECT * FROM daily_activity WHERE respuestas > 0 ORDER BY fecha",
+        "incremental": None,
+        "partition": "fecha",
+        "watermark": None,
+    },
+    "daily_question_activity": {
+        "query": "SELECT * FROM daily_question_activity WHERE respuestas > 0 ORDER BY fecha",
+        "incremental": None,
+        "partition": "fecha",
+        "watermark": None,
+    },
+}
+
+# Una exportación a la vez (CLI o endpoint del dashboard)
+_export_lock = threading.Lock()
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ExportError("La exportación necesita pyarrow (pip install pyarrow)")
+
+
+# ---------- Esquema ----------
+
+def _arrow_type(type_code):
+    """Tipo Arrow para un tipo de columna de MySQL (cursor.description)"""
+    name = FieldType.get_info(type_code) if FieldType is not None else None
+    if name in ("TINY", "SHORT", "INT24", "LONG", "LONGLONG", "YEAR", "BIT"):
+        return pa.int64()
+    if name in ("FLOAT", "DOUBLE", "DECIMAL", "NEWDECIMAL"):
+        return pa.float64()
+    if name in ("DATE", "NEWDATE"):
+        return pa.date32()
+    if name in ("DATETIME", "TIMESTAMP"):
+        return pa.timestamp("s")
+    return pa.string()
+
+
+def _schema(description):
+    return pa.schema([pa.field(column[0], _arrow_type(column[1])) for column in description])
+
+
+def _to_batch(rows, schema):
+    """Convierte un bloque de filas (tuplas) en un RecordBatch con el esquema fijo"""
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_floating(field.type):
+            values = [float(v) if isinstance(v, Decimal) else v for v in values]
+        elif pa.types.is_string(field.type):
+            values = [v if v is None or isinstance(v, str) else
+                      v.decode() if isinstance(v, (bytes, bytearray)) else str(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+# ---------- Escritura ----------
+
+class _PartitionWriter:
+    """Abre un fichero por partición y escribe los bloques como row groups"""
+
+    def __init__(self, directory, schema, export_format, part_name):
+        self.directory = directory
+        self.schema = schema
+        self.export_format = export_format
+        self.part_name = part_name
+        self.files = []
+        self._writer = None
+        self._sink = None
+        self._partition = object()
+
+    def write(self, partition, batch):
+        if partition != self._partition:
+            self.close()
+            self._open(partition)
+        if self.export_format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+
+    def _open(self, partition):
+        directory = self.directory if partition is None else os.path.join(self.directory, f"mes={partition}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.part_name + EXTENSIONS[self.export_format])
+        if self.export_format == "parquet":
+            self._writer = pq.ParquetWriter(path, self.schema, compression="snappy")
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = ipc.new_file(self._sink, self.schema)
+        self._partition = partition
+        self.files.append(path)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+
+def _partition_of(value):
+    if value is None:
+        return "sin-fecha"
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def _iter_chunks(cursor, chunk_size):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+# ---------- Estado (marcas de agua) ----------
+
+def load_state(export_dir=EXPORT_DIR):
+    path = os.path.join(export_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(state, export_dir):
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+# ---------- Exportación ----------
+
+def export_dataset(name, incremental=False, export_dir=EXPORT_DIR, export_format=EXPORT_FORMAT,
+                   chunk_size=EXPORT_CHUNK_SIZE, connection_factory=db_connection):
+    """
+    Exporta un conjunto a ficheros columnares
+
+    Args:
+        name: Conjunto (clave de DATASETS)
+        incremental: Solo filas cambiadas desde la última exportación (si el conjunto lo admite)
+        export_format: "parquet" o "arrow"
+
+    Returns:
+        dict: dataset, modo, filas, ficheros y marca de agua
+    """
+    _require_pyarrow()
+    if name not in DATASETS:
+        raise ExportError(f"Conjunto desconocido: {name}")
+    if export_format not in EXTENSIONS:
+        raise ExportError(f"Formato desconocido: {export_format}")
+    dataset = DATASETS[name]
+
+    with _export_lock:
+        state = load_state(export_dir)
+        previous = state.get(name, {})
+        use_incremental = bool(incremental and dataset["incremental"] and previous.get("marca_agua"))
+
+        part_name = "part-" + datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        target = os.path.join(export_dir, name)
+        # Las exportaciones completas se escriben aparte y sustituyen al directorio al terminar
+        directory = target if use_incremental else target + ".tmp"
+        if not use_incremental:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        db = connection_factory()
+        cursor = db.cursor(buffered=False)
+        writer = None
+        rows_written = 0
+        watermark = previous.get("marca_agua")
+        try:
+            if use_incremental:
+                cursor.execute(dataset["incremental"], (date.fromisoformat(previous["marca_agua"]),))
+            else:
+                cursor.execute(dataset["query"])
+
+            schema = _schema(cursor.description)
+            writer = _PartitionWriter(directory, schema, export_format, part_name)
+            names = schema.names
+            partition_index = names.index(dataset["partition"]) if dataset["partition"] else None
+            watermark_index = names.index(dataset["watermark"]) if dataset["watermark"] else None
+
+            for rows in _iter_chunks(cursor, chunk_size):
+                if watermark_index is not None:
+                    values = [row[watermark_index] for row in rows if row[watermark_index] is not None]
+                    if values:
+                        watermark = max(watermark or "", max(values).isoformat())
+                if partition_index is None:
+                    writer.write(None, _to_batch(rows, schema))
+                else:
+                    # Filas ordenadas por la columna de partición: se corta el bloque al cambiar de mes
+                    start = 0
+                    for i in range(1, len(rows) + 1):
+                        if i == len(rows) or _partition_of(rows[i][partition_index]) != _partition_of(rows[start][partition_index]):
+                            writer.write(_partition_of(rows[start][partition_index]), _to_batch(rows[start:i], schema))
+                            start = i
+                rows_written += len(rows)
+        except Exception:
+            if not use_incremental:
+                shutil.rmtree(directory, ignore_errors=True)
+            raise
+        finally:
+            if writer is not None:
+                writer.close()
+            cursor.close()
+            db.close()
+
+        if not use_incremental:
+            shutil.rmtree(target, ignore_errors=True)
+            if os.path.isdir(directory):
+                os.replace(directory, target)
+            else:
+                os.makedirs(target, exist_ok=True)
+        files = [f.replace(directory, target, 1) for f in writer.files]
+
+        state[name] = {
+            "ultima_exportacion": datetime.now().isoformat(timespec="seconds"),
+            "modo": "incremental" if use_incremental else "completa",
+            "formato": export_format,
+            "filas": rows_written,
+            "marca_agua": watermark,
+        }
+        _save_state(state, export_dir)
+
+    print(f"[EXPORT] {name}: {rows_written} filas en {len(files)} ficheros "
+          f"({'incremental' if use_incremental else 'completa'})")
+    return {"dataset": name, "modo": state[name]["modo"], "filas": rows_written,
+            "ficheros": files, "marca_agua": watermark}
+
+
+def export_all(incremental=False, datasets=None, **kwargs):
+    """Exporta varios conjuntos (todos por defecto)"""
+    return [export_dataset(name, incremental=incremental, **kwargs) for name in (datasets or DATASETS)]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Exportación columnar de las tablas del Trivial")
+    parser.add_argument("datasets", nargs="*", help=f"Conjuntos ({', '.join(DATASETS)}); todos por defecto")
+    parser.add_argument("--incremental", action="store_true", help="Solo filas nuevas o cambiadas")
+    parser.add_argument("--formato", choices=sorted(EXTENSIONS), default=EXPORT_FORMAT)
+    parser.add_argument("--dir", default=EXPORT_DIR)
+    args = parser.parse_args(argv[1:])
+
+    try:
+        export_all(args.incremental, args.datasets or None, export_dir=args.dir, export_format=args.formato)
+    except ExportError as e:
+        print(e)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
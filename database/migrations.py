@@ -0,0 +1,274 @@
+"""
+Migraciones versionadas del esquema
+
+Cada migración es (versión, nombre, pasos). Un paso es una sentencia SQL o una
+función que recibe la conexión (para crear y rellenar las tablas de resumen con
+sus ensure_*). Las versiones aplicadas se guardan en schema_migrations; al
+arrancar el bot se aplican las pendientes en orden.
+
+MySQL confirma implícitamente cada DDL, así que una migración no es atómica:
+los pasos son idempotentes (CREATE ... IF NOT EXISTS, ensure_*) y los índices
+que ya existen con el mismo nombre se dan por creados. Si una migración falla,
+las anteriores quedan registradas y la siguiente ejecución la reintenta.
+
+Las migraciones son independientes entre sí (ninguna usa lo que crea otra). Al
+arrancar el bot (ensure_schema) una que falla no bloquea las siguientes: se
+aplican todas las que se puede y después se lanza MigrationError con las que
+quedan pendientes. Desde la línea de órdenes se para en la primera que falla.
+
+Los índices cubren las consultas calientes:
+    students.cid                        perfil del estudiante por chat de Telegram
+    student_question (id_student, id_question)   respuesta e intentos (clave única)
+    student_question.last_attempt_date  exportación incremental y reparación de días
+    student_subject (id_student, id)    último registro de asignatura del estudiante
+    questions (level, state), (id_subject, level)   carga del banco y vistas por nivel
+
+tools/explain_check.py comprueba con EXPLAIN que ninguna consulta caliente
+recorre una tabla entera.
+
+Uso desde la raíz del repositorio:
+    python -m database.migrations status     # versión actual y migraciones pendientes
+    python -m database.migrations migrate    # aplica las pendientes
+    python -m database.migrations migrate 5  # aplica hasta la versión 5
+"""
+
+import sys
+
+from database.student_stats import ensure_student_stats_table
+from database.question_stats import ensure_question_stats_table
+from database.daily_activity import ensure_daily_activity_tables
+from database.answer_events import HOURLY_DDL, COMPACTED_DDL
+from database.answer_buffer import ensure_checkpoint_table
+
+
+MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+LOCK_NAME = "trivial_schema_migrations"
+LOCK_TIMEOUT = 60
+
+# Errores de MySQL que indican que el paso ya estaba aplicado
+ER_TABLE_EXISTS = 1050
+ER_DUP_KEYNAME = 1061
+
+
+class MigrationError(Exception):
+    """
+    Una migración no se puede aplicar (datos incompatibles, otra migración en curso...)
+
+    Attributes:
+        applied: Versiones que sí se aplicaron en la misma ejecución
+        failed: [(versión, nombre, error)] de las que fallaron
+    """
+
+    def __init__(self, message, applied=(), failed=()):
+        super().__init__(message)
+        self.applied = list(applied)
+        self.failed = list(failed)
+
+
+def _sin_duplicados_student_question(db):
+    """La clave única no se puede crear si ya hay filas repetidas por (id_student, id_question)"""
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM student_question
+            GROUP BY id_student, id_question
+            HAVING COUNT(*) > 1
+        ) t
+    """)
+    duplicados = cursor.fetchone()[0]
+    cursor.close()
+    if duplicados:
+        raise MigrationError(
+            f"student_question tiene {duplicados} pares (id_student, id_question) repetidos; "
+            "hay que fusionarlos antes de crear la clave única"
+        )
+
+
+MIGRATIONS = [
+    (1, "Tablas de resumen student_stats y question_stats", [
+        ensure_student_stats_table,
+        ensure_question_stats_table,
+    ]),
+    (2, "Tablas de actividad diaria", [
+        ensure_daily_activity_tables,
+    ]),
+    (3, "Agregado horario de eventos de respuesta", [
+        HOURLY_DDL,
+    ]),
+    (4, "Índice de students por chat de Telegram", [
+        "CREATE INDEX idx_students_cid ON students (cid)",
+    ]),
+    (5, "Clave única de student_question", [
+        _sin_duplicados_student_question,
+        "ALTER TABLE student_question ADD UNIQUE KEY uq_student_question (id_student, id_question)",
+    ]),
+    (6, "Índice de student_question por fecha de la última respuesta", [
+        "CREATE INDEX idx_student_question_last_attempt ON student_question (last_attempt_date)",
+    ]),
+    (7, "Índice del último registro de student_subject", [
+        "CREATE INDEX idx_student_subject_student ON student_subject (id_student, id)",
+    ]),
+    (8, "Índices de questions por nivel y asignatura", [
+        "CREATE INDEX idx_questions_level_state ON questions (level, state)",
+        "CREATE INDEX idx_questions_subject_level ON questions (id_subject, level)",
+    ]),
+    (9, "Último seq del diario de respuestas aplicado en la BD", [
+        ensure_checkpoint_table,
+    ]),
+    (10, "Registro de meses de eventos compactados", [
+        COMPACTED_DDL,
+    ]),
+]
+
+
+def ensure_migrations_table(db):
+    cursor = db.cursor()
+    cursor.execute(MIGRATIONS_DDL)
+    cursor.close()
+
+
+def applied_versions(db):
+    """Versiones ya aplicadas"""
+    ensure_migrations_table(db)
+    cursor = db.cursor()
+    cursor.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return versions
+
+
+def current_version(db):
+    versions = applied_versions(db)
+    return max(versions) if versions else 0
+
+
+def pending_migrations(db, target=None):
+    """Migraciones sin aplicar hasta la versión target (todas si es None)"""
+    applied = applied_versions(db)
+    return [
+        migration for migration in MIGRATIONS
+        if migration[0] not in applied and (target is None or migration[0] <= target)
+    ]
+
+
+def _run_step(db, step):
+    if callable(step):
+        step(db)
+        return
+    cursor = db.cursor()
+    try:
+        cursor.execute(step)
+    except Exception as e:
+        if getattr(e, "errno", None) not in (ER_TABLE_EXISTS, ER_DUP_KEYNAME):
+            raise
+        print(f"[MIGRACIONES] Ya aplicado: {step.strip().splitlines()[0]}")
+    finally:
+        cursor.close()
+
+
+def migrate(db, target=None, keep_going=False):
+    """
+    Aplica las migraciones pendientes en orden
+
+    Un bloqueo con nombre de MySQL evita que dos procesos migren a la vez.
+
+    Args:
+        target: Última versión a aplicar (todas si es None)
+        keep_going: Si una migración falla, seguir con las siguientes y lanzar
+            MigrationError al final con todas las que fallaron
+
+    Returns:
+        list: Versiones aplicadas en esta ejecución
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    locked = cursor.fetchone()[0] == 1
+    cursor.close()
+    if not locked:
+        raise MigrationError("Otra migración está en curso")
+
+    applied = []
+    failed = []
+    try:
+        for version, name, steps in pending_migrations(db, target):
+            print(f"[MIGRACIONES] Aplicando {version}: {name}")
+            try:
+                for step in steps:
+                    _run_step(db, step)
+                cursor = db.cursor()
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, NOW())",
+                    (version, name)
+                )
+                db.commit()
+                cursor.close()
+            except Exception as e:
+                if not keep_going:
+                    raise
+                db.rollback()
+                print(f"[MIGRACIONES] ✗ {version} ({name}) no aplicada: {e}")
+                failed.append((version, name, e))
+                continue
+            applied.append(version)
+        if failed:
+            raise MigrationError(
+                "Migraciones sin aplicar: " + "; ".join(f"{v} ({n}): {e}" for v, n, e in failed),
+                applied, failed
+            )
+    finally:
+        cursor = db.cursor()
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchone()
+        cursor.close()
+    return applied
+
+
+def ensure_schema(db):
+    """
+    Aplica las migraciones pendientes al arrancar (una que falla no bloquea las demás)
+
+    Returns:
+        list: Versiones aplicadas (vacía si el esquema estaba al día)
+
+    Raises:
+        MigrationError: Si alguna quedó sin aplicar (e.applied y e.failed lo detallan)
+    """
+    return migrate(db, keep_going=True)
+
+
+def main(argv):
+    from database.db_connection import db_connection
+
+    command = argv[1] if len(argv) > 1 else "status"
+    if command not in ("status", "migrate"):
+        print(__doc__)
+        return 2
+    target = int(argv[2]) if command == "migrate" and len(argv) > 2 else None
+
+    db = db_connection()
+    try:
+        if command == "status":
+            print(f"Versión actual: {current_version(db)}")
+            for version, name, _ in pending_migrations(db):
+                print(f"Pendiente {version}: {name}")
+        else:
+            try:
+                applied = migrate(db, target)
+            except MigrationError as e:
+                print(e)
+                return 1
+            print(f"{len(applied)} migraciones aplicadas; versión actual: {current_version(db)}")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,217 @@
+"""
+Caché de resultados de consultas del dashboard
+
+Las funciones de dashboard/data se decoran con @cached_query(familia, tags).
+Cada familia tiene su TTL (QUERY_CACHE_TTLS) y la caché es LRU con un número
+máximo de entradas. Las escrituras invalidan por etiqueta:
+
+    "questions"  -> CRUD de preguntas y asignaturas
+    "students"   -> altas, aprobaciones y cambios de estado de estudiantes
+    "answers"    -> respuestas registradas por el bot
+
+La invalidación es perezosa: cada etiqueta tiene un contador de generación y
+una entrada deja de valer en cuanto alguna de sus etiquetas cambia de
+generación. Las respuestas llegan continuamente, así que la etiqueta "answers"
+se invalida como mucho una vez cada QUERY_CACHE_ANSWERS_DEBOUNCE segundos: una
+invalidación dentro de ese intervalo queda pendiente y se aplica al acabar, de
+modo que un resultado nunca ignora una respuesta más de esos segundos.
+
+cached_query toma las generaciones antes de ejecutar la consulta: si hay una
+invalidación mientras se ejecuta, el resultado se guarda ya caducado.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+import config
+
+
+QUERY_CACHE_ENABLED = getattr(config, "QUERY_CACHE_ENABLED", True)
+QUERY_CACHE_SIZE = getattr(config, "QUERY_CACHE_SIZE", 256)        # Entradas máximas (LRU)
+QUERY_CACHE_TTLS = {
+    "general": 300,
+    "actividad": 300,
+    "participantes": 120,
+    "preguntas": 120,
+    "estudiantes": 30,
+    "crud": 30,
+    **getattr(config, "QUERY_CACHE_TTLS", {})
+}
+QUERY_CACHE_DEFAULT_TTL = 60
+QUERY_CACHE_ANSWERS_DEBOUNCE = getattr(config, "QUERY_CACHE_ANSWERS_DEBOUNCE", 10)
+
+
+class QueryCache:
+    """
+    Caché LRU con TTL por familia e invalidación por etiquetas
+
+    Args:
+        max_entries: Número máximo de resultados guardados
+        ttls: Diccionario {familia: segundos}
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttls=None):
+        self.max_entries = max_entries
+        self.ttls = dict(QUERY_CACHE_TTLS if ttls is None else ttls)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # clave -> (valor, caduca_en, familia, {tag: generación})
+        self._generations = {}           # tag -> generación actual
+        self._last_invalidation = {}     # tag -> instante de la última invalidación
+        self._pending = {}               # tag -> instante en que aplicar la invalidación aplazada
+        self._families = {}              # familia -> [aciertos, fallos]
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key, family):
+        """Devuelve (encontrado, valor)"""
+        now = time.monotonic()
+        with self._lock:
+            self._apply_pending(now)
+            counters = self._families.setdefault(family, [0, 0])
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, _, tags = entry
+                fresh = expires_at > now and all(
+                    self._generations.get(tag, 0) == generation for tag, generation in tags.items()
+                )
+                if fresh:
+                    self._entries.move_to_end(key)
+                    counters[0] += 1
+                    return True, value
+                del self._entries[key]
+            counters[1] += 1
+            return False, None
+
+    def generations(self, tags):
+        """Generación actual de cada etiqueta (tomarla antes de ejecutar la consulta)"""
+        with self._lock:
+            self._apply_pending(time.monotonic())
+            return {tag: self._generations.get(tag, 0) for tag in tags}
+
+    def set(self, key, value, family, tags=(), generations=None):
+        """
+        Guarda un resultado
+
+        Args:
+            generations: Generaciones de las etiquetas leídas antes de la consulta
+                (generations()); por defecto las actuales
+        """
+        ttl = self.ttls.get(family, QUERY_CACHE_DEFAULT_TTL)
+        with self._lock:
+            if generations is None:
+                self._apply_pending(time.monotonic())
+                generations = {tag: self._generations.get(tag, 0) for tag in tags}
+            self._entries[key] = (value, time.monotonic() + ttl, family, generations)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, tag, debounce=0):
+        """
+        Invalida todas las entradas con la etiqueta
+
+        Args:
+            tag: Etiqueta ("questions", "students", "answers"...)
+            debounce: Si es > 0 y ya se invalidó hace menos de esos segundos, la
+                invalidación se aplaza hasta que pasen
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._apply_pending(now)
+            last = self._last_invalidation.get(tag, float("-inf"))
+            if debounce and now - last < debounce:
+                self._pending.setdefault(tag, last + debounce)
+                return
+            self._bump(tag, now)
+
+    def _apply_pending(self, now):
+        """Aplica las invalidaciones aplazadas cuyo intervalo ya ha pasado (llamar con el lock)"""
+        for tag, due in list(self._pending.items()):
+            if due <= now:
+                del self._pending[tag]
+                self._bump(tag, due)
+
+    def _bump(self, tag, now):
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+        self._last_invalidation[tag] = now
+        self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Métricas de la caché
+
+        Returns:
+            dict: entries, max_entries, hits, misses, hit_ratio, evictions,
+                  invalidations y families {familia: {hits, misses, ttl}}
+        """
+        with self._lock:
+            hits = sum(c[0] for c in self._families.values())
+            misses = sum(c[1] for c in self._families.values())
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "families": {
+                    family: {"hits": c[0], "misses": c[1], "ttl": self.ttls.get(family, QUERY_CACHE_DEFAULT_TTL)}
+                    for family, c in sorted(self._families.items())
+                }
+            }
+
+
+def _copy(value):
+    """Copia superficial de DataFrames (y de los que van dentro de dict/list) para no alterar la caché"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+# Caché compartida por el bot y el dashboard
+query_cache = QueryCache()
+
+
+def cached_query(family, tags=()):
+    """
+    Decorador que cachea el resultado de una función de consulta
+
+    Args:
+        family: Familia de la consulta (determina el TTL)
+        tags: Etiquetas cuyas escrituras invalidan el resultado
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not QUERY_CACHE_ENABLED:
+                return func(*args, **kwargs)
+            key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            found, value = query_cache.get(key, family)
+            if not found:
+                # Generaciones de antes de la consulta: una invalidación durante ella caduca el resultado
+                generations = query_cache.generations(tags)
+                value = func(*args, **kwargs)
+                query_cache.set(key, value, family, tags, generations)
+            return _copy(value)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidate_answers():
+    """Invalidación (con antirrebote) tras registrar respuestas"""
+    query_cache.invalidate("answers", debounce=QUERY_CACHE_ANSWERS_DEBOUNCE)
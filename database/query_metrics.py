@@ -0,0 +1,449 @@
+"""
+Instrumentación de las consultas SQL
+
+Todas las conexiones salen del pool (db_connection), así que PooledConnection
+envuelve cada cursor en un InstrumentedCursor que mide cada sentencia y anota:
+
+    - latencia y filas en histogramas por función llamante y tipo de sentencia
+      (las filas de un SELECT se cuentan al leerlas: el cursor sin buffer de
+      mysql-connector no las conoce hasta recorrer el resultado)
+    - las sentencias más lentas que SLOW_QUERY_MS (registro circular)
+    - patrones N+1: dentro de un ámbito (un comando del bot o una petición al
+      dashboard) la misma sentencia repetida QUERY_N_PLUS_ONE_THRESHOLD veces o más
+
+Los ámbitos se abren con query_scope(nombre) (o begin_scope/end_scope en los
+hooks de Flask). render_prometheus() devuelve todo en el formato de texto de
+Prometheus para el endpoint /metrics.
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import config
+
+
+QUERY_METRICS_ENABLED = getattr(config, "QUERY_METRICS_ENABLED", True)
+SLOW_QUERY_MS = getattr(config, "SLOW_QUERY_MS", 200)                        # Umbral de consulta lenta
+SLOW_QUERY_LOG_SIZE = getattr(config, "SLOW_QUERY_LOG_SIZE", 100)            # Consultas lentas guardadas
+QUERY_N_PLUS_ONE_THRESHOLD = getattr(config, "QUERY_N_PLUS_ONE_THRESHOLD", 4)  # Repeticiones por ámbito
+
+# Límites de los histogramas (segundos para latencia, filas para resultados)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+SCOPE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# Ficheros que no cuentan como llamante (el propio envoltorio y los ayudantes de conexión)
+_SKIP_FILES = ("query_metrics.py", "db_connection.py", "db_utils.py", "contextlib.py")
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Forma normalizada de una sentencia (sin literales ni listas IN) para agruparla"""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode(errors="replace")
+    sql = _SPACES.sub(" ", sql).strip()
+    sql = _LITERALS.sub("?", sql)
+    sql = _IN_LISTS.sub("(...)", sql)
+    return sql[:300]
+
+
+def _operation(sql):
+    word = sql.split(" ", 1)[0].upper() if sql else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE") else "OTHER"
+
+
+def _caller():
+    """módulo.función del primer marco fuera de la capa de conexión"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.endswith(_SKIP_FILES):
+            module = frame.f_globals.get("__name__", "?")
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+class Histogram:
+    """Histograma acumulado al estilo Prometheus"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, limit in enumerate(self.buckets):
+            if value <= limit:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Cuantil aproximado (límite superior del bucket que lo contiene)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        accumulated = 0
+        for i, count in enumerate(self.counts):
+            accumulated += count
+            if accumulated >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class QueryMetrics:
+    """Acumula las métricas de todas las sentencias del proceso"""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log_size=SLOW_QUERY_LOG_SIZE,
+                 n_plus_one_threshold=QUERY_N_PLUS_ONE_THRESHOLD):
+        self.slow_ms = slow_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self._latency = {}      # (llamante, operación) -> Histogram
+        self._rows = {}         # (llamante, operación) -> Histogram
+        self._errors = {}       # (llamante, operación) -> int
+        self._scopes = {}       # ámbito -> Histogram de sentencias por ámbito
+        self._n_plus_one = {}   # (ámbito, huella) -> {"veces", "max", "ultima"}
+        self._slow = deque(maxlen=slow_log_size)
+        self._local = threading.local()
+        self._listeners = []    # Funciones(llamante, operación, sentencia, inicio, segundos, filas)
+
+    # ---------- Sentencias ----------
+
+    def add_listener(self, listener):
+        """Registra una función a la que se avisa de cada sentencia (p. ej. las trazas del bot)"""
+        self._listeners.append(listener)
+
+    def record(self, sql, seconds, rows, caller, error=False):
+        """
+        Anota una sentencia
+
+        Args:
+            rows: Filas afectadas, o None si se anotan después con record_rows
+
+        Returns:
+            tuple: (llamante, operación) para record_rows
+        """
+        text = fingerprint(sql)
+        key = (caller, _operation(text))
+        for listener in self._listeners:
+            listener(caller, key[1], text, time.perf_counter() - seconds, seconds, rows)
+        with self._lock:
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = Histogram(LATENCY_BUCKETS)
+                self._rows[key] = Histogram(ROW_BUCKETS)
+            latency.observe(seconds)
+            if rows is not None and rows >= 0:
+                self._rows[key].observe(rows)
+            if error:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            if seconds * 1000 >= self.slow_ms:
+                self._slow.append({
+                    "cuando": datetime.now().isoformat(timespec="seconds"),
+                    "ms": round(seconds * 1000, 1),
+                    "filas": rows,
+                    "llamante": caller,
+                    "sentencia": text,
+                })
+        if seconds * 1000 >= self.slow_ms:
+            print(f"[SQL] Consulta lenta ({seconds * 1000:.0f} ms) en {caller}: {text[:120]}")
+
+        scope = getattr(self._local, "scope", None)
+        if scope is not None:
+            scope["total"] += 1
+            scope["counts"][text] = scope["counts"].get(text, 0) + 1
+        return key
+
+    def record_rows(self, key, rows):
+        """Anota las filas leídas del resultado de una sentencia ya registrada"""
+        with self._lock:
+            histogram = self._rows.get(key)
+            if histogram is not None:
+                histogram.observe(rows)
+
+    # ---------- Ámbitos (N+1) ----------
+
+    def begin_scope(self, name):
+        """Empieza a contar las sentencias del hilo actual bajo `name`"""
+        self._local.scope = {"name": name, "total": 0, "counts": {}}
+
+    def end_scope(self):
+        """Cierra el ámbito del hilo actual y anota los patrones N+1 que haya"""
+        scope = getattr(self._local, "scope", None)
+        self._local.scope = None
+        if scope is None or scope["total"] == 0:
+            return
+        repeated = [(text, n) for text, n in scope["counts"].items() if n >= self.n_plus_one_threshold]
+        with self._lock:
+            histogram = self._scopes.get(scope["name"])
+            if histogram is None:
+                histogram = self._scopes[scope["name"]] = Histogram(SCOPE_BUCKETS)
+            histogram.observe(scope["total"])
+            for text, n in repeated:
+                entry = self._n_plus_one.setdefault((scope["name"], text), {"veces": 0, "max": 0, "ultima": None})
+                entry["veces"] += 1
+                entry["max"] = max(entry["max"], n)
+                entry["ultima"] = datetime.now().isoformat(timespec="seconds")
+        for text, n in repeated:
+            print(f"[SQL] Posible N+1 en {scope['name']}: {n} veces {text[:120]}")
+
+    @contextmanager
+    def scope(self, name):
+        previous = getattr(self._local, "scope", None)
+        if previous is not None:
+            # Ámbito anidado: las sentencias cuentan en el exterior
+            yield
+            return
+        self.begin_scope(name)
+        try:
+            yield
+        finally:
+            self.end_scope()
+
+    # ---------- Consulta ----------
+
+    def snapshot(self):
+        """
+        Resumen para el dashboard
+
+        Returns:
+            dict: statements [{llamante, operacion, n, total_ms, media_ms, p95_ms, filas_media, errores}]
+                  (ordenadas por tiempo total), slow [...], n_plus_one [...], scopes [...]
+        """
+        with self._lock:
+            statements = []
+            for (caller, operation), latency in self._latency.items():
+                rows = self._rows[(caller, operation)]
+                statements.append({
+                    "llamante": caller,
+                    "operacion": operation,
+                    "n": latency.count,
+                    "total_ms": round(latency.sum * 1000, 1),
+                    "media_ms": round(latency.sum / latency.count * 1000, 2) if latency.count else 0,
+                    "p95_ms": round(latency.quantile(0.95) * 1000, 1),
+                    "filas_media": round(rows.sum / rows.count, 1) if rows.count else 0,
+                    "errores": self._errors.get((caller, operation), 0),
+                })
+            statements.sort(key=lambda s: s["total_ms"], reverse=True)
+            n_plus_one = [
+                {"ambito": scope, "sentencia": text, **entry}
+                for (scope, text), entry in self._n_plus_one.items()
+            ]
+            n_plus_one.sort(key=lambda e: e["veces"], reverse=True)
+            scopes = [
+                {"ambito": name, "n": h.count, "media": round(h.sum / h.count, 1) if h.count else 0}
+                for name, h in self._scopes.items()
+            ]
+            return {
+                "statements": statements,
+                "slow": list(reversed(self._slow)),
+                "n_plus_one": n_plus_one,
+                "scopes": sorted(scopes, key=lambda s: s["media"], reverse=True),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._rows.clear()
+            self._errors.clear()
+            self._scopes.clear()
+            self._n_plus_one.clear()
+            self._slow.clear()
+
+    # ---------- Prometheus ----------
+
+    def render_prometheus(self):
+        """Métricas SQL en el formato de texto de Prometheus"""
+        lines = []
+        with self._lock:
+            _histogram_lines(lines, "trivial_sql_duration_seconds", "Latencia de las sentencias SQL",
+                             {_labels(caller=c, operation=o): h for (c, o), h in self._latency.items()})
+            _histogram_lines(lines, "trivial_sql_rows", "Filas devueltas o afectadas por sentencia",
+                             {_labels(caller=c, operation=o): h for (c, o), h in self._rows.items()})
+            _histogram_lines(lines, "trivial_scope_statements", "Sentencias SQL por comando o petición",
+                             {_labels(scope=s): h for s, h in self._scopes.items()})
+            lines.append("# HELP trivial_sql_errors_total Sentencias SQL que han fallado")
+            lines.append("# TYPE trivial_sql_errors_total counter")
+            for (caller, operation), n in self._errors.items():
+                lines.append(f"trivial_sql_errors_total{{{_labels(caller=caller, operation=operation)}}} {n}")
+            lines.append("# HELP trivial_sql_n_plus_one_total Ámbitos con una sentencia repetida (posible N+1)")
+            lines.append("# TYPE trivial_sql_n_plus_one_total counter")
+            per_scope = {}
+            for (scope, _), entry in self._n_plus_one.items():
+                per_scope[scope] = per_scope.get(scope, 0) + entry["veces"]
+            for scope, n in per_scope.items():
+                lines.append(f"trivial_sql_n_plus_one_total{{{_labels(scope=scope)}}} {n}")
+            lines.append("# HELP trivial_sql_slow_queries Consultas lentas en el registro circular")
+            lines.append("# TYPE trivial_sql_slow_queries gauge")
+            lines.append(f"trivial_sql_slow_queries {len(self._slow)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _histogram_lines(lines, name, help_text, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in histograms.items():
+        accumulated = 0
+        for limit, count in zip(histogram.buckets, histogram.counts):
+            accumulated += count
+            lines.append(f'{name}_bucket{{{labels},le="{limit}"}} {accumulated}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+def gauge_lines(name, help_text, values):
+    """Líneas de un gauge; values es {etiquetas (texto): valor} o un número"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    if isinstance(values, dict):
+        lines.extend(f"{name}{{{labels}}} {value}" for labels, value in values.items())
+    else:
+        lines.append(f"{name} {values}")
+    return lines
+
+
+class InstrumentedCursor:
+    """
+    Cursor que mide cada execute/executemany y delega todo lo demás en el cursor real
+
+    Si la sentencia devuelve un resultado (description no es None) las filas se
+    cuentan en fetchone/fetchmany/fetchall y al iterar, y se anotan cuando se
+    agota el resultado, se ejecuta otra sentencia o se cierra el cursor.
+    """
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._result = None      # [(llamante, operación), filas leídas] del resultado abierto
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._finish_result()
+        caller = _caller()
+        start = time.perf_counter()
+        try:
+            result = self._cursor.execute(operation, params, *args, **kwargs)
+        except Exception:
+            self._metrics.record(operation, time.perf_counter() - start, None, caller, error=True)
+            raise
+        self._record(operation, time.perf_counter() - start, caller)
+        return result
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._finish_result()
+        caller = _caller()
+        start = time.perf_counter()
+        try:
+            result = self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        except Exception:
+            self._metrics.record(operation, time.perf_counter() - start, None, caller, error=True)
+            raise
+        self._record(operation, time.perf_counter() - start, caller)
+        return result
+
+    def _record(self, operation, seconds, caller):
+        if self._has_result():
+            key = self._metrics.record(operation, seconds, None, caller)
+            self._result = [key, 0]
+        else:
+            self._metrics.record(operation, seconds, self._rowcount(), caller)
+
+    def _has_result(self):
+        try:
+            return self._cursor.description is not None
+        except Exception:
+            return False
+
+    def _rowcount(self):
+        try:
+            return self._cursor.rowcount
+        except Exception:
+            return None
+
+    def _count(self, rows):
+        if self._result is not None:
+            self._result[1] += rows
+
+    def _finish_result(self):
+        """Anota las filas leídas del resultado abierto (una sola vez)"""
+        if self._result is not None:
+            key, rows = self._result
+            self._result = None
+            self._metrics.record_rows(key, rows)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is None:
+            self._finish_result()
+        else:
+            self._count(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._count(len(rows))
+        if not rows:
+            self._finish_result()
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count(len(rows))
+        self._finish_result()
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._count(1)
+            yield row
+        self._finish_result()
+
+    def close(self):
+        self._finish_result()
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Instancia compartida del proceso (bot y dashboard)
+query_metrics = QueryMetrics()
+
+
+def instrument_cursor(cursor):
+    """Envuelve un cursor si la instrumentación está activa"""
+    if not QUERY_METRICS_ENABLED:
+        return cursor
+    return InstrumentedCursor(cursor, query_metrics)
+
+
+def query_scope(name):
+    """Context manager: ámbito (comando o petición) para detectar patrones N+1"""
+    return query_metrics.scope(name)
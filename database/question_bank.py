@@ -0,0 +1,137 @@
+"""
+Banco de preguntas en memoria
+
+Las preguntas cambian poco (solo desde el CRUD del dashboard) y se consultan en
+cada partida. El banco las carga de una vez con load_questions y las indexa por
+(asignatura, nivel, estado); cada escritura del CRUD lo invalida y la siguiente
+lectura lo recarga. Cada recarga incrementa la versión, que sirve para saber si
+algo derivado de las preguntas (p. ej. un mensaje ya renderizado) sigue vigente.
+"""
+
+import threading
+import time
+
+import config
+
+
+QUESTION_BANK_TTL = getattr(config, "QUESTION_BANK_TTL", 300)   # Segundos antes de recargar desde la BD
+
+
+class QuestionBank:
+    """
+    Preguntas indexadas por (asignatura, nivel, estado)
+
+    Las filas son las tuplas de SELECT * FROM questions:
+    [0]id, [1]id_subject, [2]state, [3]level, [4]question, [5]solution,
+    [6]why, [7..10]answer1-4
+
+    Args:
+        ttl: Segundos tras los que se recarga aunque no haya habido escrituras
+            (cubre cambios hechos desde otro proceso)
+    """
+
+    def __init__(self, ttl=QUESTION_BANK_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._version = 0
+        self._loaded_at = None
+        self._by_key = {}        # (id_subject, id) -> fila
+        self._index = {}         # (id_subject, level, state) -> [filas]
+        self._by_level = {}      # (level, state) -> [filas] de todas las asignaturas
+
+    # ---------- Carga ----------
+
+    def needs_load(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def load(self, rows):
+        """Reconstruye los índices a partir de las filas de questions"""
+        by_key = {}
+        index = {}
+        by_level = {}
+        for row in rows:
+            row = tuple(row)
+            by_key[(row[1], row[0])] = row
+            index.setdefault((row[1], row[3], row[2]), []).append(row)
+            by_level.setdefault((row[3], row[2]), []).append(row)
+
+        with self._lock:
+            self._by_key = by_key
+            self._index = index
+            self._by_level = by_level
+            self._version += 1
+            self._loaded_at = time.monotonic()
+        print(f"[BANCO] {len(by_key)} preguntas cargadas (versión {self._version})")
+
+    def ensure_loaded(self, db):
+        """Carga el banco desde la BD si está vacío, invalidado o caducado"""
+        if not self.needs_load():
+            return
+        with self._lock:
+            if not self.needs_load():
+                return
+            cursor = db.cursor()
+            cursor.execute("SELECT * FROM questions")
+            rows = cursor.fetchall()
+            cursor.close()
+            self.load(rows)
+
+    def invalidate(self):
+        """Fuerza la recarga en la próxima lectura (llamar tras cada escritura en questions)"""
+        with self._lock:
+            self._loaded_at = None
+
+    @property
+    def version(self):
+        return self._version
+
+    # ---------- Consultas ----------
+
+    def get(self, question_id, subject_id=None):
+        """
+        Pregunta por ID (None si no existe)
+
+        Los IDs se numeran por asignatura; sin subject_id se devuelve la
+        primera pregunta con ese ID
+        """
+        with self._lock:
+            if subject_id is not None:
+                return self._by_key.get((subject_id, question_id))
+            for (_, q_id), row in self._by_key.items():
+                if q_id == question_id:
+                    return row
+            return None
+
+    def questions(self, level, state="A", subject_id=None):
+        """
+        Preguntas de un nivel
+
+        Args:
+            level: Nivel de las preguntas
+            state: Estado ('A' por defecto; None para cualquier estado)
+            subject_id: Asignatura (None para todas)
+        """
+        with self._lock:
+            if subject_id is not None:
+                states = [state] if state is not None else {k[2] for k in self._index if k[:2] == (subject_id, level)}
+                return [row for s in states for row in self._index.get((subject_id, level, s), [])]
+            if state is not None:
+                return list(self._by_level.get((level, state), []))
+            return [row for (lvl, _), rows in self._by_level.items() if lvl == level for row in rows]
+
+    def count(self, level, state="A"):
+        """Número de preguntas del nivel"""
+        with self._lock:
+            if state is not None:
+                return len(self._by_level.get((level, state), []))
+            return sum(len(rows) for (lvl, _), rows in self._by_level.items() if lvl == level)
+
+    def max_level(self, state="A"):
+        """Nivel más alto con preguntas en ese estado (None si no hay)"""
+        with self._lock:
+            levels = [lvl for (lvl, s), rows in self._by_level.items() if s == state and rows]
+            return max(levels) if levels else None
+
+
+# Banco compartido por el bot y el dashboard
+question_bank = QuestionBank()
@@ -0,0 +1,213 @@
+"""
+Tabla resumen question_stats (una fila por pregunta respondida)
+
+Mantiene los agregados de student_question por id_question que usan la página
+de preguntas del dashboard y el CRUD de preguntas. Igual que student_stats, se
+actualiza en la misma transacción que escribe las respuestas.
+
+Uso desde la raíz del repositorio:
+    python -m database.question_stats ensure    # crea la tabla (y la rellena si es nueva)
+    python -m database.question_stats rebuild   # la recalcula desde student_question
+    python -m database.question_stats verify    # compara la tabla con student_question
+"""
+
+import sys
+
+
+QUESTION_STATS_DDL = """
+CREATE TABLE IF NOT EXISTS question_stats (
+    id_question INT NOT NULL PRIMARY KEY,
+    participantes INT NOT NULL DEFAULT 0,
+    total_intentos INT NOT NULL DEFAULT 0,
+    total_errores INT NOT NULL DEFAULT 0,
+    veces_retirada INT NOT NULL DEFAULT 0,
+    aciertos_primer_intento INT NOT NULL DEFAULT 0,
+    aciertos_segundo_intento INT NOT NULL DEFAULT 0,
+    total_segundo_intento INT NOT NULL DEFAULT 0
+)
+"""
+
+# Columnas de contadores en el orden de answer_deltas
+COUNTER_COLUMNS = [
+    "participantes", "total_intentos", "total_errores", "veces_retirada",
+    "aciertos_primer_intento", "aciertos_segundo_intento", "total_segundo_intento"
+]
+
+# Agregado de referencia (el mismo que calculaban las vistas de preguntas)
+AGGREGATE_QUERY = """
+SELECT
+    id_question,
+    COUNT(DISTINCT id_student) as participantes,
+    COALESCE(SUM(num_attempts), 0) as total_intentos,
+    COALESCE(SUM(mistake_number), 0) as total_errores,
+    SUM(CASE WHEN num_attempts >= 2 AND mistake_number = 0 THEN 1 ELSE 0 END) as veces_retirada,
+    SUM(CASE WHEN first_attempt = 1 THEN 1 ELSE 0 END) as aciertos_primer_intento,
+    SUM(CASE WHEN num_attempts >= 2 AND second_attempt = 1 THEN 1 ELSE 0 END) as aciertos_segundo_intento,
+    SUM(CASE WHEN num_attempts >= 2 THEN 1 ELSE 0 END) as total_segundo_intento
+FROM student_question {filtro}
+GROUP BY id_question
+"""
+
+UPSERT_DELTAS_QUERY = f"""
+INSERT INTO question_stats
+(id_question, {", ".join(COUNTER_COLUMNS)})
+VALUES (%s, {", ".join(["%s"] * len(COUNTER_COLUMNS))})
+ON DUPLICATE KEY UPDATE
+    {", ".join(f"{c} = {c} + VALUES({c})" for c in COUNTER_COLUMNS)}
+"""
+
+
+def answer_deltas(answers, existing):
+    """
+    Incrementos de question_stats que producen unas respuestas
+
+    Args:
+        answers: Iterable de (id_student, id_question, is_correct, fecha) en orden
+        existing: Diccionario {(id_student, id_question): (num_attempts, mistake_number, ...)}
+            con el estado previo de student_question
+
+    Returns:
+        dict: {id_question: [contadores en el orden de COUNTER_COLUMNS]}
+    """
+    state = dict(existing)
+    deltas = {}
+    for student_id, question_id, is_correct, _ in answers:
+        ok = 1 if is_correct else 0
+        delta = deltas.setdefault(question_id, [0] * len(COUNTER_COLUMNS))
+
+        key = (student_id, question_id)
+        previous = state.get(key)
+        if previous is None:
+            num_attempts, mistake_number = 1, 1 - ok
+            delta[0] += 1            # participantes
+            delta[4] += ok           # aciertos_primer_intento
+            was_retired = False
+        else:
+            num_attempts, mistake_number = previous[0] + 1, previous[1] + 1 - ok
+            was_retired = previous[0] >= 2 and previous[1] == 0
+            if num_attempts == 2:
+                delta[5] += ok       # aciertos_segundo_intento
+                delta[6] += 1        # total_segundo_intento
+        state[key] = (num_attempts, mistake_number)
+
+        delta[1] += 1                # total_intentos
+        delta[2] += 1 - ok           # total_errores
+        delta[3] += int(num_attempts >= 2 and mistake_number == 0) - int(was_retired)   # veces_retirada
+    return deltas
+
+
+def apply_deltas(cursor, deltas):
+    """Suma los incrementos a question_stats (dentro de la transacción del llamante)"""
+    if not deltas:
+        return
+    cursor.executemany(
+        UPSERT_DELTAS_QUERY,
+        [(question_id, *delta) for question_id, delta in sorted(deltas.items())]
+    )
+
+
+def ensure_question_stats_table(db):
+    """
+    Crea question_stats si no existe y, en ese caso, la rellena
+
+    Returns:
+        bool: True si la tabla se acaba de crear
+    """
+    cursor = db.cursor()
+    cursor.execute("SHOW TABLES LIKE 'question_stats'")
+    exists = cursor.fetchone() is not None
+    cursor.close()
+    if exists:
+        return False
+    rebuild_question_stats(db)
+    return True
+
+
+def rebuild_question_stats(db):
+    """Recalcula question_stats completa desde student_question en una transacción"""
+    cursor = db.cursor()
+    try:
+        cursor.execute(QUESTION_STATS_DDL)
+        cursor.execute("DELETE FROM question_stats")
+        cursor.execute(f"""
+            INSERT INTO question_stats (id_question, {", ".join(COUNTER_COLUMNS)})
+            {AGGREGATE_QUERY.format(filtro="")}
+        """)
+        rows = cursor.rowcount
+        db.commit()
+        print(f"[STATS] question_stats reconstruida ({rows} preguntas)")
+        return rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def rebuild_questions(cursor, question_ids):
+    """
+    Recalcula desde student_question las filas de unas preguntas (dentro de la
+    transacción del llamante, que debe tener bloqueadas sus filas de student_question)
+    """
+    question_ids = sorted(set(question_ids))
+    if not question_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(question_ids))
+    cursor.execute(f"DELETE FROM question_stats WHERE id_question IN ({placeholders})", question_ids)
+    cursor.execute(f"""
+        INSERT INTO question_stats (id_question, {", ".join(COUNTER_COLUMNS)})
+        {AGGREGATE_QUERY.format(filtro=f"WHERE id_question IN ({placeholders})")}
+    """, question_ids)
+
+
+def verify_question_stats(db):
+    """
+    Compara question_stats con el agregado de student_question
+
+    Returns:
+        list: (id_question, columna, valor_en_tabla, valor_esperado) de cada diferencia
+    """
+    cursor = db.cursor()
+    cursor.execute(AGGREGATE_QUERY.format(filtro=""))
+    expected = {row[0]: [int(v) for v in row[1:]] for row in cursor.fetchall()}
+    cursor.execute(f"SELECT id_question, {', '.join(COUNTER_COLUMNS)} FROM question_stats")
+    stored = {row[0]: [int(v) for v in row[1:]] for row in cursor.fetchall()}
+    cursor.close()
+
+    empty = [0] * len(COUNTER_COLUMNS)
+    differences = []
+    for question_id in sorted(set(expected) | set(stored)):
+        for column, actual, wanted in zip(COUNTER_COLUMNS, stored.get(question_id, empty), expected.get(question_id, empty)):
+            if actual != wanted:
+                differences.append((question_id, column, actual, wanted))
+    return differences
+
+
+def main(argv):
+    from database.db_connection import db_connection
+
+    command = argv[1] if len(argv) > 1 else "verify"
+    if command not in ("ensure", "rebuild", "verify"):
+        print(__doc__)
+        return 2
+
+    db = db_connection()
+    try:
+        if command == "ensure":
+            created = ensure_question_stats_table(db)
+            print("Tabla creada y rellenada" if created else "La tabla ya existía")
+        elif command == "rebuild":
+            rebuild_question_stats(db)
+        else:
+            differences = verify_question_stats(db)
+            for question_id, column, actual, wanted in differences[:50]:
+                print(f"Pregunta {question_id}: {column} = {actual} (esperado {wanted})")
+            print(f"{len(differences)} diferencias")
+            return 1 if differences else 0
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
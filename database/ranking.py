@@ -0,0 +1,167 @@
+"""
+Índice de clasificación en memoria para /clasificacion
+
+Mantiene a los estudiantes ordenados por (tasa_acierto DESC, preguntas_respondidas DESC)
+en un array ordenado. register_answer lo actualiza de forma incremental, así que
+la posición y el percentil se obtienen por búsqueda binaria (O(log n)) y el top 3
+cortando el array, sin volver a agregar la tabla student_question.
+
+Cada respuesta quita y vuelve a insertar la clave del estudiante en el array:
+localizarla es O(log n), pero desplazar los elementos es O(n). Con los tamaños
+de un curso (unos miles de estudiantes) ese desplazamiento es una copia de
+memoria de pocos microsegundos, mucho menos que la consulta que evita.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+
+# Misma estructura que las filas de query_ranking
+RankingRow = namedtuple(
+    "RankingRow",
+    ["id_student", "name", "preguntas_respondidas", "total_intentos", "total_errores", "tasa_acierto"]
+)
+
+
+def calcular_tasa_acierto(intentos, errores):
+    """
+    Tasa de acierto con el mismo redondeo que MySQL en query_ranking:
+    la división se redondea a 4 decimales y el resultado a 2 (mitad hacia arriba)
+    """
+    if not intentos:
+        return Decimal("0")
+    ratio = (Decimal(errores) / Decimal(intentos)).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+    return ((1 - ratio) * 100).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+class RankingIndex:
+    """
+    Clasificación ordenada y actualizable de estudiantes
+
+    Args:
+        refresh_interval: Segundos tras los que se reconstruye desde la BD
+            (corrige cualquier deriva respecto a escrituras externas)
+    """
+
+    def __init__(self, refresh_interval=600):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._entries = {}       # id_student -> [name, preguntas, intentos, errores]
+        self._keys = []          # Claves de orden ascendente: (-tasa, -preguntas, id_student)
+        self._loaded_at = None
+
+    def needs_load(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+
+    def load(self, rows):
+        """
+        Reconstruye el índice a partir de filas con la estructura de query_ranking
+
+        Args:
+            rows: Iterable de (id_student, name, preguntas, intentos, errores, tasa)
+        """
+        entries = {}
+        for est_id, nombre, preguntas, intentos, errores, _ in rows:
+            entries[est_id] = [nombre, int(preguntas), int(intentos), int(errores)]
+
+        keys = sorted(self._key(est_id, entry) for est_id, entry in entries.items())
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Fuerza la reconstrucción en la próxima consulta"""
+        with self._lock:
+            self._loaded_at = None
+
+    def record_answer(self, student_id, is_correct, is_new_question):
+        """
+        Aplica una respuesta al índice
+
+        Args:
+            student_id: ID del estudiante
+            is_correct: Si la respuesta fue correcta
+            is_new_question: Si es la primera vez que el estudiante responde esa pregunta
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return  # Se cargará completo desde la BD en la próxima consulta
+
+            entry = self._entries.get(student_id)
+            if entry is None:
+                entry = [None, 0, 0, 0]
+                self._entries[student_id] = entry
+            else:
+                self._remove_key(self._key(student_id, entry))
+
+            entry[1] += 1 if is_new_question else 0
+            entry[2] += 1
+            entry[3] += 0 if is_correct else 1
+            # O(n) por el desplazamiento del array (ver el docstring del módulo)
+            insort(self._keys, self._key(student_id, entry))
+
+    def set_name(self, student_id, name):
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is not None:
+                entry[0] = name
+
+    def total(self):
+        """Número de estudiantes en la clasificación"""
+        return len(self._keys)
+
+    def position(self, student_id):
+        """
+        Posición (1..n) del estudiante en la clasificación
+
+        Returns:
+            tuple: (posición, RankingRow) o (0, None) si no aparece en el ranking
+        """
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is None:
+                return 0, None
+            key = self._key(student_id, entry)
+            return bisect_left(self._keys, key) + 1, self._row(student_id, entry)
+
+    def percentile(self, student_id):
+        """Percentil 'Top X%' con la misma fórmula que handle_posicion"""
+        posicion, _ = self.position(student_id)
+        total = self.total()
+        if not posicion:
+            return None
+        return round(((total - posicion + 1) / total) * 100, 1)
+
+    def row_at(self, posicion):
+        """Fila de la clasificación en la posición indicada (1..n)"""
+        with self._lock:
+            student_id = self._keys[posicion - 1][2]
+            return self._row(student_id, self._entries[student_id])
+
+    def top(self, n=3):
+        """Primeras n filas de la clasificación"""
+        with self._lock:
+            return [self._row(key[2], self._entries[key[2]]) for key in self._keys[:n]]
+
+    def _remove_key(self, key):
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    @staticmethod
+    def _key(student_id, entry):
+        return (-calcular_tasa_acierto(entry[2], entry[3]), -entry[1], student_id)
+
+    @staticmethod
+    def _row(student_id, entry):
+        nombre, preguntas, intentos, errores = entry
+        return RankingRow(student_id, nombre, preguntas, intentos, errores,
+                          calcular_tasa_acierto(intentos, errores))
+
+
+# Índice compartido por todo el proceso
+ranking_index = RankingIndex()
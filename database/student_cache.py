@@ -0,0 +1,108 @@
+"""
+Caché de perfiles de estudiante por chat_id de Telegram
+
+Cada comando necesita (id, nombre, estado, nivel) del estudiante. Con la caché
+se resuelven con cero consultas si el perfil está en memoria y con una sola
+consulta si no. Las entradas caducan a los STUDENT_CACHE_TTL segundos y se
+invalidan explícitamente en cada escritura que las modifica (registro,
+promoción, modo de vista y cambios de estado desde el dashboard).
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import config
+
+
+STUDENT_CACHE_TTL = getattr(config, "STUDENT_CACHE_TTL", 300)
+STUDENT_CACHE_SIZE = getattr(config, "STUDENT_CACHE_SIZE", 50000)
+
+StudentProfile = namedtuple("StudentProfile", ["id", "name", "state", "level", "view_mode"])
+
+# Marca de "no está en caché" (None significa "estudiante no registrado")
+MISSING = object()
+
+
+class StudentProfileCache:
+    """
+    Caché LRU con TTL de perfiles indexada por chat_id
+
+    Args:
+        ttl: Segundos de validez de cada entrada
+        max_size: Número máximo de entradas (se expulsan las menos usadas)
+    """
+
+    def __init__(self, ttl=STUDENT_CACHE_TTL, max_size=STUDENT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # chat_id -> (perfil o None, caduca_en)
+        self._by_student = {}           # student_id -> chat_id
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, chat_id):
+        """
+        Perfil cacheado del chat
+
+        Returns:
+            StudentProfile, None (no registrado) o MISSING si hay que consultar la BD
+        """
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or entry[1] < time.monotonic():
+                self._misses += 1
+                return MISSING
+            self._entries.move_to_end(chat_id)
+            self._hits += 1
+            return entry[0]
+
+    def get_by_student(self, student_id):
+        """Perfil cacheado a partir del ID de estudiante (MISSING si no está)"""
+        with self._lock:
+            chat_id = self._by_student.get(student_id)
+        if chat_id is None:
+            return MISSING
+        return self.get(chat_id)
+
+    def put(self, chat_id, profile):
+        with self._lock:
+            self._entries[chat_id] = (profile, time.monotonic() + self.ttl)
+            self._entries.move_to_end(chat_id)
+            if profile is not None:
+                self._by_student[profile.id] = chat_id
+            while len(self._entries) > self.max_size:
+                old_chat_id, (old_profile, _) = self._entries.popitem(last=False)
+                if old_profile is not None:
+                    self._by_student.pop(old_profile.id, None)
+
+    def invalidate(self, chat_id=None, student_id=None):
+        """Elimina el perfil de un chat o de un estudiante"""
+        with self._lock:
+            if chat_id is None and student_id is not None:
+                chat_id = self._by_student.get(student_id)
+            if chat_id is None:
+                return
+            entry = self._entries.pop(chat_id, None)
+            if entry is not None and entry[0] is not None:
+                self._by_student.pop(entry[0].id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_student.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 3) if total else 0
+            }
+
+
+# Caché compartida por el bot y el dashboard
+student_cache = StudentProfileCache()
@@ -0,0 +1,236 @@
+"""
+Tabla resumen student_stats (una fila por estudiante)
+
+Mantiene los agregados de student_question que usan /misnumeros, la
+clasificación y las páginas de participantes y estudiantes del dashboard.
+Se actualiza en la misma transacción que escribe las respuestas
+(register_answer o el volcado del buffer), así que las vistas pasan a ser
+búsquedas por clave primaria cuyo coste no crece con el historial.
+
+Uso desde la raíz del repositorio:
+    python -m database.student_stats ensure    # crea la tabla (y la rellena si es nueva)
+    python -m database.student_stats rebuild   # la recalcula desde student_question
+    python -m database.student_stats verify    # compara la tabla con student_question
+"""
+
+import sys
+from datetime import date
+
+
+STUDENT_STATS_DDL = """
+CREATE TABLE IF NOT EXISTS student_stats (
+    id_student INT NOT NULL PRIMARY KEY,
+    preguntas_respondidas INT NOT NULL DEFAULT 0,
+    preguntas_retiradas INT NOT NULL DEFAULT 0,
+    total_intentos INT NOT NULL DEFAULT 0,
+    total_errores INT NOT NULL DEFAULT 0,
+    aciertos_primer_intento INT NOT NULL DEFAULT 0,
+    aciertos_segundo_intento INT NOT NULL DEFAULT 0,
+    total_segundo_intento INT NOT NULL DEFAULT 0,
+    primera_actividad DATE NULL,
+    ultima_actividad DATE NULL
+)
+"""
+
+# Columnas de contadores en el orden de answer_deltas
+COUNTER_COLUMNS = [
+    "preguntas_respondidas", "preguntas_retiradas", "total_intentos", "total_errores",
+    "aciertos_primer_intento", "aciertos_segundo_intento", "total_segundo_intento"
+]
+
+# Agregado de referencia (el mismo que calculaban las vistas)
+AGGREGATE_QUERY = """
+SELECT
+    id_student,
+    COUNT(DISTINCT id_question) as preguntas_respondidas,
+    COUNT(DISTINCT CASE WHEN (num_attempts - mistake_number >= 2) THEN id_question END) as preguntas_retiradas,
+    COALESCE(SUM(num_attempts), 0) as total_intentos,
+    COALESCE(SUM(mistake_number), 0) as total_errores,
+    SUM(CASE WHEN first_attempt = 1 THEN 1 ELSE 0 END) as aciertos_primer_intento,
+    SUM(CASE WHEN num_attempts >= 2 AND second_attempt = 1 THEN 1 ELSE 0 END) as aciertos_segundo_intento,
+    SUM(CASE WHEN num_attempts >= 2 THEN 1 ELSE 0 END) as total_segundo_intento,
+    MIN(first_attempt_date) as primera_actividad,
+    MAX(last_attempt_date) as ultima_actividad
+FROM student_question {filtro}
+GROUP BY id_student
+"""
+
+UPSERT_DELTAS_QUERY = f"""
+INSERT INTO student_stats
+(id_student, {", ".join(COUNTER_COLUMNS)}, primera_actividad, ultima_actividad)
+VALUES (%s, {", ".join(["%s"] * len(COUNTER_COLUMNS))}, %s, %s)
+ON DUPLICATE KEY UPDATE
+    {", ".join(f"{c} = {c} + VALUES({c})" for c in COUNTER_COLUMNS)},
+    primera_actividad = LEAST(COALESCE(primera_actividad, VALUES(primera_actividad)), VALUES(primera_actividad)),
+    ultima_actividad = GREATEST(COALESCE(ultima_actividad, VALUES(ultima_actividad)), VALUES(ultima_actividad))
+"""
+
+
+def answer_deltas(answers, existing):
+    """
+    Incrementos de student_stats que producen unas respuestas
+
+    Args:
+        answers: Iterable de (id_student, id_question, is_correct, fecha) en orden
+        existing: Diccionario {(id_student, id_question): (num_attempts, mistake_number, ...)}
+            con el estado previo de student_question (las claves que no están son nuevas)
+
+    Returns:
+        dict: {id_student: [contadores en el orden de COUNTER_COLUMNS..., primera, última]}
+    """
+    state = dict(existing)
+    deltas = {}
+    for student_id, question_id, is_correct, answered_on in answers:
+        ok = 1 if is_correct else 0
+        delta = deltas.get(student_id)
+        if delta is None:
+            delta = [0] * len(COUNTER_COLUMNS) + [answered_on, answered_on]
+            deltas[student_id] = delta
+
+        key = (student_id, question_id)
+        previous = state.get(key)
+        if previous is None:
+            num_attempts, mistake_number = 1, 1 - ok
+            delta[0] += 1            # preguntas_respondidas
+            delta[4] += ok           # aciertos_primer_intento
+            was_retired = False
+        else:
+            num_attempts, mistake_number = previous[0] + 1, previous[1] + 1 - ok
+            was_retired = previous[0] - previous[1] >= 2
+            if num_attempts == 2:
+                delta[5] += ok       # aciertos_segundo_intento
+                delta[6] += 1        # total_segundo_intento
+        state[key] = (num_attempts, mistake_number)
+
+        delta[1] += int(num_attempts - mistake_number >= 2) - int(was_retired)   # preguntas_retiradas
+        delta[2] += 1                # total_intentos
+        delta[3] += 1 - ok           # total_errores
+        delta[7] = min(delta[7], answered_on)
+        delta[8] = max(delta[8], answered_on)
+    return deltas
+
+
+def apply_deltas(cursor, deltas):
+    """Suma los incrementos a student_stats (dentro de la transacción del llamante)"""
+    if not deltas:
+        return
+    cursor.executemany(
+        UPSERT_DELTAS_QUERY,
+        [(student_id, *delta) for student_id, delta in sorted(deltas.items())]
+    )
+
+
+def ensure_student_stats_table(db):
+    """
+    Crea student_stats si no existe y, en ese caso, la rellena
+
+    Returns:
+        bool: True si la tabla se acaba de crear
+    """
+    cursor = db.cursor()
+    cursor.execute("SHOW TABLES LIKE 'student_stats'")
+    exists = cursor.fetchone() is not None
+    cursor.close()
+    if exists:
+        return False
+    rebuild_student_stats(db)
+    return True
+
+
+def rebuild_student_stats(db):
+    """Recalcula student_stats completa desde student_question en una transacción"""
+    cursor = db.cursor()
+    try:
+        cursor.execute(STUDENT_STATS_DDL)
+        cursor.execute("DELETE FROM student_stats")
+        cursor.execute(f"""
+            INSERT INTO student_stats
+            (id_student, {", ".join(COUNTER_COLUMNS)}, primera_actividad, ultima_actividad)
+            {AGGREGATE_QUERY.format(filtro="")}
+        """)
+        rows = cursor.rowcount
+        db.commit()
+        print(f"[STATS] student_stats reconstruida ({rows} estudiantes)")
+        return rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def rebuild_students(cursor, student_ids):
+    """
+    Recalcula desde student_question las filas de unos estudiantes (dentro de la
+    transacción del llamante, que debe tener bloqueadas sus filas de student_question)
+    """
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(student_ids))
+    cursor.execute(f"DELETE FROM student_stats WHERE id_student IN ({placeholders})", student_ids)
+    cursor.execute(f"""
+        INSERT INTO student_stats
+        (id_student, {", ".join(COUNTER_COLUMNS)}, primera_actividad, ultima_actividad)
+        {AGGREGATE_QUERY.format(filtro=f"WHERE id_student IN ({placeholders})")}
+    """, student_ids)
+
+
+def verify_student_stats(db):
+    """
+    Compara student_stats con el agregado de student_question
+
+    Returns:
+        list: (id_student, columna, valor_en_tabla, valor_esperado) de cada diferencia
+    """
+    columns = COUNTER_COLUMNS + ["primera_actividad", "ultima_actividad"]
+    cursor = db.cursor()
+    cursor.execute(AGGREGATE_QUERY.format(filtro=""))
+    expected = {row[0]: row[1:] for row in cursor.fetchall()}
+    cursor.execute(f"SELECT id_student, {', '.join(columns)} FROM student_stats")
+    stored = {row[0]: row[1:] for row in cursor.fetchall()}
+    cursor.close()
+
+    empty = [0] * len(COUNTER_COLUMNS) + [None, None]
+    differences = []
+    for student_id in sorted(set(expected) | set(stored)):
+        for column, actual, wanted in zip(columns, stored.get(student_id, empty), expected.get(student_id, empty)):
+            if _normalize(actual) != _normalize(wanted):
+                differences.append((student_id, column, actual, wanted))
+    return differences
+
+
+def _normalize(value):
+    if value is None or isinstance(value, date):
+        return value
+    return int(value)
+
+
+def main(argv):
+    from database.db_connection import db_connection
+
+    command = argv[1] if len(argv) > 1 else "verify"
+    if command not in ("ensure", "rebuild", "verify"):
+        print(__doc__)
+        return 2
+
+    db = db_connection()
+    try:
+        if command == "ensure":
+            created = ensure_student_stats_table(db)
+            print("Tabla creada y rellenada" if created else "La tabla ya existía")
+        elif command == "rebuild":
+            rebuild_student_stats(db)
+        else:
+            differences = verify_student_stats(db)
+            for student_id, column, actual, wanted in differences[:50]:
+                print(f"Estudiante {student_id}: {column} = {actual} (esperado {wanted})")
+            print(f"{len(differences)} diferencias")
+            return 1 if differences else 0
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
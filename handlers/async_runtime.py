@@ -0,0 +1,91 @@
+"""
+Runtime asíncrono del bot basado en python-telegram-bot
+Recibe las actualizaciones con asyncio y ejecuta los manejadores síncronos
+existentes (telebot + mysql.connector) en un pool de hilos, de forma que una
+consulta lenta o una llamada lenta a Telegram no bloquea al resto de estudiantes.
+Las actualizaciones de un mismo chat van siempre al mismo hilo y en orden
+(ver handlers/chat_dispatcher.py)
+"""
+
+import asyncio
+import time
+
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler
+
+from handlers.chat_dispatcher import ChatDispatcher
+from handlers.tracing import with_received_at
+
+
+class AsyncRuntime:
+    """
+    Puente entre python-telegram-bot (asyncio) y los manejadores síncronos
+
+    Args:
+        token: Token del bot de Telegram
+        commands: Diccionario {comando: función(message)} con los manejadores síncronos
+        callback: Función(call) que atiende los botones inline
+        workers: Número de hilos del puente (y de actualizaciones concurrentes)
+        base_url: URL base de la Bot API (None = api.telegram.org; útil para servidores falsos)
+        dispatcher: ChatDispatcher compartido (por defecto se crea uno con `workers` hilos)
+    """
+
+    def __init__(self, token, commands, callback, workers=8, base_url=None, dispatcher=None):
+        self.token = token
+        self.commands = commands
+        self.callback = callback
+        self.workers = workers
+        self.base_url = base_url
+        self.dispatcher = dispatcher or ChatDispatcher(workers)
+        self.application = None
+
+    def build(self):
+        """
+        Construye la Application con un handler por comando y otro para los callbacks
+
+        Returns:
+            telegram.ext.Application configurada
+        """
+        builder = Application.builder().token(self.token).concurrent_updates(self.workers)
+        if self.base_url:
+            builder = builder.base_url(f"{self.base_url}/bot").base_file_url(f"{self.base_url}/file/bot")
+
+        self.application = builder.build()
+
+        for command, handler in self.commands.items():
+            self.application.add_handler(CommandHandler(command, self._bridge_message(handler)))
+        self.application.add_handler(CallbackQueryHandler(self._bridge_callback(self.callback)))
+
+        return self.application
+
+    def run(self, poll_timeout=60):
+        """Arranca el long polling asíncrono (bloquea hasta Ctrl+C)"""
+        if self.application is None:
+            self.build()
+        try:
+            self.application.run_polling(timeout=poll_timeout, close_loop=False)
+        finally:
+            self.dispatcher.shutdown(wait=False)
+
+    async def run_in_worker(self, chat_id, fn, *args):
+        """Ejecuta una función síncrona en el hilo asignado al chat"""
+        # La traza cuenta desde que la actualización llega al bucle, no desde que el hilo la atiende
+        fn = with_received_at(fn, time.perf_counter())
+        return await asyncio.wrap_future(self.dispatcher.submit(chat_id, fn, *args))
+
+    def _bridge_message(self, handler):
+        async def on_command(update, context):
+            if update.effective_message is None:
+                return
+            try:
+                await self.run_in_worker(update.effective_chat.id, handler, update.effective_message)
+            except Exception as e:
+                print(f"[ASYNC] Error en /{handler.__name__}: {e}")
+        return on_command
+
+    def _bridge_callback(self, handler):
+        async def on_callback(update, context):
+            try:
+                await self.run_in_worker(update.effective_chat.id, handler, update.callback_query)
+            except Exception as e:
+                print(f"[ASYNC] Error en callback '{update.callback_query.data}': {e}")
+        return on_callback
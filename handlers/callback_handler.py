@@ -2,7 +2,11 @@ from telebot.types import CallbackQuery
 from keyboards.inline_buttons import buttons_play
 from handlers.start_handler import quiz_sessions, send_question, iniciar_juego # Importamos la sesión del test
 from database.db_connection import db_connection
-from database.db_sql import register_answer
+from database.db_sql import register_answer, get_question
+from handlers.chat_dispatcher import ProcessedKeys
+
+# Mensajes (chat_id, message_id) cuyos botones ya se han atendido
+processed_messages = ProcessedKeys(max_size=50000)
 
 #  Maneja la respuesta del usuario
 
@@ -11,7 +15,14 @@ def callback_response(bot, call: CallbackQuery):
     session = quiz_sessions.get(chat_id)
 
 # IMPORTANTE: Registrar la respuesta en la base de datos
-    student_id = session.get("student_id")
+    student_id = session.student_id if session else None
+    
+    # Cada mensaje de confirmación o de pregunta se atiende una sola vez: una doble
+    # pulsación no inicia dos partidas ni registra dos respuestas
+    if call.data not in ("nav_prev", "nav_next") and not processed_messages.add((chat_id, call.message.message_id)):
+        print(f"[CALLBACK] Pulsación repetida ignorada en {chat_id} (mensaje {call.message.message_id})")
+        bot.answer_callback_query(call.id)
+        return
     
     # Manejar confirmacion de jugar
     if call.data.startswith("confirmar_jugar_"):
@@ -44,27 +55,29 @@ def callback_response(bot, call: CallbackQuery):
         return
     # Manejar navegación en modo paginado
     elif call.data == "nav_prev":
-        if not session or session.get("estado") != "jugando":
+        if not session or session.estado != "jugando":
             bot.answer_callback_query(call.id, "❌ Sesión no válida")
             return
         
-        current_page = session.get("current_option_page", 0)
+        current_page = session.current_option_page
         if current_page > 0:
-            session["current_option_page"] = current_page - 1
+            session.current_option_page = current_page - 1
+            quiz_sessions.save(chat_id, session)
             bot.delete_message(chat_id, call.message.message_id)
             send_question(bot, chat_id, db, student_id)
         bot.answer_callback_query(call.id)
         return
     
     elif call.data == "nav_next":
-        if not session or session.get("estado") != "jugando":
+        if not session or session.estado != "jugando":
             bot.answer_callback_query(call.id, "❌ Sesión no válida")
             return
         
-        current_page = session.get("current_option_page", 0)
-        total_options = session.get("total_options", 4)
+        current_page = session.current_option_page
+        total_options = session.total_options
         if current_page < total_options - 1:
-            session["current_option_page"] = current_page + 1
+            session.current_option_page = current_page + 1
+            quiz_sessions.save(chat_id, session)
             bot.delete_message(chat_id, call.message.message_id)
             send_question(bot, chat_id, db, student_id)
         bot.answer_callback_query(call.id)
@@ -73,12 +86,26 @@ def callback_response(bot, call: CallbackQuery):
     # Manejar respuestas a preguntas (código existente)
     if call.data == "1" or call.data == "2" or call.data == "3" or call.data == "4":
 
-        if not session or session.get("estado") != "jugando":
+        if not session or session.estado != "jugando" or session.finished:
             bot.answer_callback_query(call.id, "? Sesión no válida. Usa /jugar para comenzar.")
             return
 
+        # Solo cuenta la respuesta a la pregunta en curso (no a una anterior)
+        if session.message_id is not None and call.message.message_id != session.message_id:
+            print(f"[CALLBACK] Respuesta a una pregunta ya superada en {chat_id}, se ignora")
+            bot.answer_callback_query(call.id)
+            return
+
         # Obtener información de la pregunta actual
-        current_question = quiz_sessions[chat_id]["questions"][session["current_index"]]
+        current_question = get_question(session.current_question_key)
+        if current_question is None:
+            bot.answer_callback_query(call.id, "? La pregunta ya no está disponible.")
+            session.current_index = session.current_index + 1
+            quiz_sessions.save(chat_id, session)
+            db = db_connection()
+            send_question(bot, chat_id, db, student_id)
+            db.close()
+            return
         question_id = current_question[0]  # ID de la pregunta
         correct_answer = current_question[5]  # Respuesta correcta
         reason = current_question[6]  # Motivo/explicación
@@ -91,14 +118,15 @@ def callback_response(bot, call: CallbackQuery):
         else:
             format_question_text = f"❌ Respuesta incorrecta ¡Qué pena!! \n <b>Motivo:</b> \n {reason}"
 
-        # Eliminar botones después de responder
-        bot.edit_message_reply_markup(chat_id, call.message.message_id, reply_markup=None)
+        # Sustituir la pregunta por la corrección; editar el texto sin reply_markup quita
+        # también los botones, así que basta una sola llamada a Telegram
         bot.edit_message_text(f" {format_question_text} ", chat_id, call.message.message_id, parse_mode="HTML")
-        
 
-        if student_id:
+        def guardar_respuesta():
+            if not student_id:
+                return
             db = db_connection()
-            success = register_answer(db, student_id, question_id, is_correct)
+            success = register_answer(db, student_id, question_id, is_correct, subject_id=subject_id)
             print("Registro respuesta:", success)
             db.close()
             
@@ -106,8 +134,17 @@ def callback_response(bot, call: CallbackQuery):
                 print(f"Error al registrar respuesta del estudiante {student_id} para pregunta {question_id}")
         
         # Avanzar a la siguiente pregunta
-        session["current_index"] = session["current_index"] + 1
-        session["message_id"] = call.message.message_id  # Actualizar message_id para la siguiente pregunta
+        subject_id = session.current_question_key[0]
+        session.current_index = session.current_index + 1
+        session.message_id = call.message.message_id  # Actualizar message_id para la siguiente pregunta
+        quiz_sessions.save(chat_id, session)
         
-        # Enviar siguiente pregunta
-        send_question(bot, chat_id, db, student_id)
\ No newline at end of file
+        if session.finished:
+            # Última pregunta: la respuesta se guarda antes de calcular el balance del nivel
+            guardar_respuesta()
+            send_question(bot, chat_id, None, student_id)
+        else:
+            # La siguiente pregunta se encola primero y Telegram la recibe mientras
+            # se guarda la respuesta en la base de datos
+            send_question(bot, chat_id, None, student_id)
+            guardar_respuesta()
\ No newline at end of file
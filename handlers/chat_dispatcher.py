@@ -0,0 +1,219 @@
+"""
+Despacho serializado por chat
+
+Las actualizaciones de un mismo chat se ejecutan siempre en el mismo hilo
+(chat_id % número de shards), en el orden en que llegan; las de chats
+distintos se reparten entre los shards y se atienden en paralelo. Así dos
+pulsaciones seguidas del mismo botón nunca modifican la sesión a la vez.
+
+Un chat lento solo retrasa a los chats de su mismo shard, por eso conviene
+tener tantos shards como conexiones del pool puedan usarse a la vez.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# Despachador que ejecuta la tarea del hilo actual (para run_after_update)
+_current = threading.local()
+
+
+class ChatDispatcher:
+    """
+    Ejecutores de un solo hilo repartidos por chat_id
+
+    Args:
+        shards: Número de hilos (chats atendidos en paralelo)
+    """
+
+    def __init__(self, shards=8):
+        self.shards = max(1, shards)
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"chat-shard-{i}")
+            for i in range(self.shards)
+        ]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = [0] * self.shards
+        self._submitted = 0
+        self._inline = 0
+        self._rejected = 0
+
+    def shard_for(self, chat_id):
+        return hash(chat_id) % self.shards
+
+    def submit(self, chat_id, fn, *args):
+        """
+        Encola fn(*args) en el hilo del chat
+
+        Si ya se está en ese hilo (un manejador que llama a otro) se ejecuta
+        directamente para no bloquearse esperando a sí mismo.
+
+        Returns:
+            concurrent.futures.Future con el resultado
+        """
+        shard = self.shard_for(chat_id)
+        if getattr(self._local, "shard", None) == shard:
+            with self._lock:
+                self._inline += 1
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        with self._lock:
+            self._pending[shard] += 1
+            self._submitted += 1
+        return self._executors[shard].submit(self._run, shard, fn, args)
+
+    def try_submit(self, chat_id, fn, *args, max_pending=None, max_shard_pending=None):
+        """
+        Encola fn(*args) en el hilo del chat solo si hay sitio
+
+        Args:
+            max_pending: Máximo de tareas pendientes entre todos los hilos
+            max_shard_pending: Máximo de tareas pendientes en el hilo del chat
+                (así un chat muy activo no llena la cola de todos)
+
+        Returns:
+            concurrent.futures.Future, o None si la cola está llena
+        """
+        shard = self.shard_for(chat_id)
+        with self._lock:
+            full = (max_pending is not None and sum(self._pending) >= max_pending) or \
+                   (max_shard_pending is not None and self._pending[shard] >= max_shard_pending)
+            if full:
+                self._rejected += 1
+                return None
+            self._pending[shard] += 1
+            self._submitted += 1
+        return self._executors[shard].submit(self._run, shard, fn, args)
+
+    def submit_after(self, chat_id, fn, *args):
+        """
+        Encola fn(*args) en el hilo del chat detrás de lo que ya esté pendiente
+
+        A diferencia de submit, nunca se ejecuta en línea: desde el propio hilo
+        del chat sirve para dejar trabajo para cuando termine la tarea actual.
+        """
+        shard = self.shard_for(chat_id)
+        with self._lock:
+            self._pending[shard] += 1
+            self._submitted += 1
+        return self._executors[shard].submit(self._run, shard, fn, args)
+
+    def call(self, chat_id, fn, *args):
+        """Ejecuta fn(*args) en el hilo del chat y espera el resultado"""
+        return self.submit(chat_id, fn, *args).result()
+
+    def _run(self, shard, fn, args):
+        self._local.shard = shard
+        _current.dispatcher = self
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._pending[shard] -= 1
+
+    def shutdown(self, wait=True):
+        for executor in self._executors:
+            executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "shards": self.shards,
+                "submitted": self._submitted,
+                "inline": self._inline,
+                "rejected": self._rejected,
+                "pending": sum(self._pending),
+                "max_shard_pending": max(self._pending)
+            }
+
+
+def run_after_update(chat_id, fn, *args):
+    """
+    Ejecuta fn(*args) en el hilo del chat en cuanto termine la actualización actual
+
+    La respuesta al estudiante no espera a fn, y la siguiente actualización del
+    mismo chat sí (va detrás en la misma cola), así que ve su resultado. Fuera
+    de un ChatDispatcher (pruebas, scripts) se ejecuta directamente.
+    """
+    dispatcher = getattr(_current, "dispatcher", None)
+    if dispatcher is None:
+        return fn(*args)
+    return dispatcher.submit_after(chat_id, _deferred(chat_id, fn), *args)
+
+
+def in_chat_thread(chat_id, fn):
+    """
+    Envuelve fn para que se ejecute en el hilo del chat aunque la llame otro hilo
+
+    Sirve para callbacks que llegan desde fuera del despachador (p. ej. el hilo
+    de envíos cuando Telegram confirma un mensaje) y modifican la sesión: se
+    encolan detrás de las actualizaciones pendientes del chat en lugar de
+    competir con ellas. Se usa el ChatDispatcher de la tarea actual; fuera de
+    uno, fn se devuelve tal cual.
+    """
+    dispatcher = getattr(_current, "dispatcher", None)
+    if dispatcher is None:
+        return fn
+
+    task = _deferred(chat_id, fn)
+
+    def submit(*args):
+        dispatcher.submit_after(chat_id, task, *args)
+    return submit
+
+
+def _deferred(chat_id, fn):
+    """fn sin propagar excepciones: en una tarea diferida nadie espera el resultado"""
+    def run(*args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"[DISPATCH] Error en tarea diferida {getattr(fn, '__name__', fn)} del chat {chat_id}: {e}")
+    return run
+
+
+class ProcessedKeys:
+    """
+    Conjunto acotado de claves ya procesadas (p. ej. (chat_id, message_id))
+
+    Args:
+        max_size: Claves recordadas; se olvidan primero las más antiguas
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._keys = OrderedDict()
+        self._duplicates = 0
+
+    def add(self, key):
+        """
+        Marca la clave como procesada
+
+        Returns:
+            bool: True si es la primera vez, False si ya se había procesado
+        """
+        with self._lock:
+            if key in self._keys:
+                self._duplicates += 1
+                return False
+            self._keys[key] = True
+            if len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+            return True
+
+    def discard(self, key):
+        """Olvida la clave (p. ej. una actualización que se rechazó y se volverá a recibir)"""
+        with self._lock:
+            self._keys.pop(key, None)
+
+    @property
+    def duplicates(self):
+        return self._duplicates
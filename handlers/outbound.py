@@ -0,0 +1,430 @@
+"""
+Envío de mensajes a Telegram en segundo plano
+
+Los manejadores ya no esperan a la Bot API: OutboundBot encola cada llamada
+(send_message, edit_message_text, ...) y devuelve un Future. Un pool de
+OUTBOUND_WORKERS hilos las envía:
+
+    - en orden dentro de cada chat y en paralelo entre chats
+    - respetando cubos de fichas por chat (OUTBOUND_CHAT_RATE/BURST) y global
+      (OUTBOUND_GLOBAL_RATE); un chat sin fichas se reprograma sin bloquear hilos
+    - reintentando tras un 429 con el retry_after que indica Telegram y tras
+      errores de red; el 429 no dice si el límite superado es el del chat o el
+      global del bot, así que se pausan ese tiempo el chat y el cubo global
+    - fusionando ediciones del mismo mensaje que aún están en cola: quitar los
+      botones y cambiar el texto se envían como un único edit_message_text
+
+Todas las peticiones comparten una sesión HTTP con un pool de conexiones
+persistentes (install_http_pool).
+
+Quien necesite el resultado (p. ej. el message_id de la pregunta enviada) usa
+on_sent(resultado, función), que funciona igual con un Future o con el
+mensaje devuelto por un bot síncrono.
+"""
+
+import heapq
+import inspect
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from telebot.apihelper import ApiTelegramException
+
+import config
+
+
+OUTBOUND_ENABLED = getattr(config, "OUTBOUND_ENABLED", True)
+OUTBOUND_WORKERS = getattr(config, "OUTBOUND_WORKERS", 8)            # Hilos de envío (y conexiones HTTP)
+OUTBOUND_GLOBAL_RATE = getattr(config, "OUTBOUND_GLOBAL_RATE", 30)   # Mensajes/s del bot en total
+OUTBOUND_CHAT_RATE = getattr(config, "OUTBOUND_CHAT_RATE", 1)        # Mensajes/s sostenidos por chat
+OUTBOUND_CHAT_BURST = getattr(config, "OUTBOUND_CHAT_BURST", 5)      # Ráfaga permitida por chat
+OUTBOUND_MAX_RETRIES = getattr(config, "OUTBOUND_MAX_RETRIES", 3)    # Reintentos por 429 o error de red
+
+# Métodos que pasan por el planificador; answer_callback_query y delete_message no
+# cuentan para los límites de mensajes de Telegram
+QUEUED_METHODS = ("send_message", "edit_message_text", "edit_message_reply_markup",
+                  "delete_message", "answer_callback_query")
+UNLIMITED_METHODS = ("answer_callback_query", "delete_message")
+
+CHAT_BUCKETS_MAX = 10000    # Cubos por chat recordados (se olvidan los menos recientes)
+
+
+class TokenBucket:
+    """
+    Cubo de fichas: `rate` fichas por segundo hasta un máximo de `burst`
+
+    try_take() no bloquea: toma una ficha o devuelve los segundos que faltan.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def refund(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def pause(self, seconds):
+        """Vacía el cubo para que no haya fichas en `seconds` segundos (tras un 429)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+class _Job:
+    __slots__ = ("method", "params", "futures", "attempts")
+
+    def __init__(self, method, params, future):
+        self.method = method
+        self.params = params
+        self.futures = [future]
+        self.attempts = 0
+
+    @property
+    def message_key(self):
+        return self.params.get("chat_id"), self.params.get("message_id")
+
+
+def _merge(last, job):
+    """
+    Fusiona job en last (ambos del mismo chat, last aún sin enviar)
+
+    Returns:
+        bool: True si se han fusionado
+    """
+    edits = ("edit_message_text", "edit_message_reply_markup")
+    if last.method not in edits or job.method not in edits or last.message_key != job.message_key:
+        return False
+    if job.method == "edit_message_text":
+        # El texto nuevo sustituye al anterior; si no trae botones conserva los de la edición en cola
+        params = dict(job.params)
+        if "reply_markup" not in params and "reply_markup" in last.params:
+            params["reply_markup"] = last.params["reply_markup"]
+        last.method, last.params = "edit_message_text", params
+    elif last.method == "edit_message_text":
+        last.params = dict(last.params, reply_markup=job.params.get("reply_markup"))
+    else:
+        last.params = job.params
+    last.futures.extend(job.futures)
+    return True
+
+
+class OutboundSender:
+    """
+    Planificador de envíos a la Bot API
+
+    Args:
+        bot: TeleBot que hace las llamadas HTTP
+        workers: Hilos de envío
+        global_rate: Mensajes por segundo del bot en total
+        chat_rate: Mensajes por segundo sostenidos por chat
+        chat_burst: Ráfaga por chat
+        max_retries: Reintentos tras 429 o error de red
+    """
+
+    def __init__(self, bot, workers=OUTBOUND_WORKERS, global_rate=OUTBOUND_GLOBAL_RATE,
+                 chat_rate=OUTBOUND_CHAT_RATE, chat_burst=OUTBOUND_CHAT_BURST,
+                 max_retries=OUTBOUND_MAX_RETRIES):
+        self.bot = bot
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_buckets = OrderedDict()
+        self._cond = threading.Condition()
+        self._queues = {}           # carril -> deque de _Job
+        self._busy = set()          # carriles que tiene un hilo o el planificador
+        self._ready = []            # montículo (instante, secuencia, carril)
+        self._seq = itertools.count()
+        self._threads = []
+        self._stopping = False
+        self._stats = {"encoladas": 0, "enviadas": 0, "fusionadas": 0, "reintentos_429": 0,
+                       "reintentos_red": 0, "errores": 0, "esperas_limite": 0, "envio_ms": 0.0}
+
+    # ---------- Encolado ----------
+
+    def submit(self, lane, method, params):
+        """
+        Encola una llamada a la Bot API
+
+        Args:
+            lane: Carril de orden (el chat_id; las llamadas de un carril se envían en orden)
+            method: Nombre del método de TeleBot
+            params: Argumentos con nombre
+
+        Returns:
+            concurrent.futures.Future con lo que devuelva TeleBot
+        """
+        future = Future()
+        job = _Job(method, params, future)
+        with self._cond:
+            self._start()
+            self._stats["encoladas"] += 1
+            queue = self._queues.setdefault(lane, deque())
+            # Solo se fusiona con la última llamada en cola y si ningún hilo la ha cogido
+            if queue and _merge(queue[-1], job):
+                self._stats["fusionadas"] += 1
+                return future
+            queue.append(job)
+            if lane not in self._busy:
+                self._schedule(lane, 0.0)
+        return future
+
+    def _schedule(self, lane, delay):
+        self._busy.add(lane)
+        heapq.heappush(self._ready, (time.monotonic() + delay, next(self._seq), lane))
+        self._cond.notify()
+
+    def _start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"telegram-sender-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # ---------- Envío ----------
+
+    def _next_lane(self):
+        """Espera al siguiente carril listo y saca su primera llamada (None al parar)"""
+        with self._cond:
+            while True:
+                if self._stopping and not self._ready:
+                    return None, None
+                if self._ready:
+                    ready_at, _, lane = self._ready[0]
+                    wait = ready_at - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._ready)
+                        return lane, self._queues[lane].popleft()
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _chat_bucket(self, lane):
+        with self._cond:
+            bucket = self._chat_buckets.get(lane)
+            if bucket is None:
+                bucket = self._chat_buckets[lane] = TokenBucket(self.chat_rate, self.chat_burst)
+                if len(self._chat_buckets) > CHAT_BUCKETS_MAX:
+                    self._chat_buckets.popitem(last=False)
+            else:
+                self._chat_buckets.move_to_end(lane)
+            return bucket
+
+    def _acquire(self, lane, job):
+        """Segundos a esperar antes de poder enviar job (0 si ya tiene fichas)"""
+        if job.method in UNLIMITED_METHODS:
+            return 0.0
+        bucket = self._chat_bucket(lane)
+        wait = bucket.try_take()
+        if wait:
+            return wait
+        wait = self._global.try_take()
+        if wait:
+            bucket.refund()
+        return wait
+
+    def _worker(self):
+        while True:
+            lane, job = self._next_lane()
+            if job is None:
+                return
+            wait = self._acquire(lane, job)
+            if wait:
+                self._requeue(lane, job, wait, "esperas_limite")
+                continue
+            self._send(lane, job)
+
+    def _send(self, lane, job):
+        start = time.perf_counter()
+        try:
+            result = getattr(self.bot, job.method)(**job.params)
+        except ApiTelegramException as e:
+            if e.error_code == 429 and job.attempts < self.max_retries:
+                retry_after = (e.result_json.get("parameters") or {}).get("retry_after", 1)
+                print(f"[ENVIO] 429 en {job.method} ({lane}); reintento en {retry_after} s")
+                self._chat_bucket(lane).pause(retry_after)
+                # El retry_after también vale para el límite global: el resto de hilos
+                # no deben seguir enviando mientras tanto
+                self._global.pause(retry_after)
+                self._requeue(lane, job, retry_after, "reintentos_429")
+                return
+            self._fail(lane, job, e)
+            return
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if job.attempts < self.max_retries:
+                self._requeue(lane, job, 2 ** job.attempts, "reintentos_red")
+                return
+            self._fail(lane, job, e)
+            return
+        except Exception as e:
+            self._fail(lane, job, e)
+            return
+
+        with self._cond:
+            self._stats["enviadas"] += 1
+            self._stats["envio_ms"] += (time.perf_counter() - start) * 1000
+        for future in job.futures:
+            future.set_result(result)
+        self._done(lane)
+
+    def _requeue(self, lane, job, delay, counter):
+        """Devuelve job a la cabeza de su carril y lo reprograma dentro de `delay` segundos"""
+        if counter != "esperas_limite":
+            job.attempts += 1
+        with self._cond:
+            self._stats[counter] += 1
+            self._queues[lane].appendleft(job)
+            heapq.heappush(self._ready, (time.monotonic() + delay, next(self._seq), lane))
+            self._cond.notify()
+
+    def _fail(self, lane, job, error):
+        print(f"[ENVIO] Error en {job.method} ({lane}): {error}")
+        with self._cond:
+            self._stats["errores"] += 1
+        for future in job.futures:
+            future.set_exception(error)
+        self._done(lane)
+
+    def _done(self, lane):
+        with self._cond:
+            queue = self._queues.get(lane)
+            if queue:
+                heapq.heappush(self._ready, (time.monotonic(), next(self._seq), lane))
+                self._cond.notify()
+            else:
+                self._queues.pop(lane, None)
+                self._busy.discard(lane)
+                self._cond.notify_all()
+
+    # ---------- Control ----------
+
+    def flush(self, timeout=None):
+        """
+        Espera a que se envíe todo lo encolado
+
+        Returns:
+            bool: True si la cola ha quedado vacía
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout=10):
+        """Envía lo pendiente y detiene los hilos"""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        return flushed
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["en_cola"] = sum(len(queue) for queue in self._queues.values())
+            stats["chats_en_cola"] = len(self._busy)
+        stats["envio_medio_ms"] = round(stats.pop("envio_ms") / stats["enviadas"], 1) if stats["enviadas"] else 0
+        return stats
+
+
+class OutboundBot:
+    """
+    Fachada del bot para los manejadores: las llamadas de QUEUED_METHODS se
+    encolan en el OutboundSender y devuelven un Future; el resto va directo a TeleBot
+    """
+
+    def __init__(self, bot, sender):
+        self._bot = bot
+        self._sender = sender
+        self._signatures = {method: inspect.signature(getattr(bot, method)) for method in QUEUED_METHODS}
+        for method in QUEUED_METHODS:
+            setattr(self, method, self._enqueuer(method))
+
+    def _enqueuer(self, method):
+        signature = self._signatures[method]
+
+        def enqueue(*args, **kwargs):
+            params = signature.bind(*args, **kwargs).arguments
+            params.update(params.pop("kwargs", {}))
+            lane = params.get("chat_id") or ("callback", params.get("callback_query_id"))
+            return self._sender.submit(lane, method, params)
+        enqueue.__name__ = method
+        return enqueue
+
+    def __getattr__(self, name):
+        return getattr(self._bot, name)
+
+
+# Planificador del proceso (lo crea bot.py al arrancar; None si los envíos son síncronos)
+_sender = None
+
+
+def create_sender(bot, **kwargs):
+    """Crea el planificador compartido del proceso"""
+    global _sender
+    _sender = OutboundSender(bot, **kwargs)
+    return _sender
+
+
+def get_outbound_stats():
+    """Métricas del planificador de envíos (para el dashboard y /metrics)"""
+    if _sender is None:
+        return {"enabled": False, "en_cola": 0}
+    return _sender.stats()
+
+
+def on_sent(result, callback):
+    """
+    Llama a callback(mensaje) cuando el envío termina bien
+
+    result puede ser un Future de OutboundBot o el mensaje devuelto por un bot
+    síncrono (runtime sin cola o bots falsos de las pruebas).
+    """
+    if not isinstance(result, Future):
+        callback(result)
+        return
+
+    def done(future):
+        if future.exception() is None:
+            try:
+                callback(future.result())
+            except Exception as e:
+                print(f"[ENVIO] Error al procesar el envío: {e}")
+    result.add_done_callback(done)
+
+
+def install_http_pool(size=OUTBOUND_WORKERS):
+    """Sesión HTTP compartida por telebot con `size` conexiones persistentes a la Bot API"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=size + 4)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    apihelper.session = session
+    return session
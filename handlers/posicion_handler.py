@@ -1,4 +1,4 @@
-from database.db_sql import query_ranking, chat_id_result, check_student_registration
+from database.db_sql import get_ranking, get_ranking_top, chat_id_result, check_student_registration
 
 def handle_posicion(bot, message, db):
     """
@@ -44,26 +44,18 @@ def handle_posicion(bot, message, db):
             student_name = id_student[1]
             print(f"Nombre: {student_name}")  
             
-            # Calcular la tasa de acierto para todos los estudiantes
-            rankings = query_ranking(db)
+            # Clasificación en memoria (actualizada por register_answer)
+            ranking = get_ranking(db)
+            total_estudiantes = ranking.total()
 
-            print(f"Ranking obtenido: {rankings}")
-            if not rankings:
+            if total_estudiantes == 0:
                 bot.send_message(chat_id, "📊 Aún no hay datos suficientes para generar el ranking.")
                 return
             
-            # Encontrar la posición del estudiante
-            posicion = 0
-            mi_tasa_acierto = 0
-            mi_preguntas = 0
-            total_estudiantes = len(rankings)
-            
-            for idx, (est_id, nombre, preguntas, intentos, errores, tasa) in enumerate(rankings):
-                if est_id == student_id:
-                    posicion = idx + 1
-                    mi_tasa_acierto = tasa
-                    mi_preguntas = preguntas
-                    break
+            # Encontrar la posición del estudiante (búsqueda binaria)
+            posicion, mi_fila = ranking.position(student_id)
+            mi_tasa_acierto = mi_fila.tasa_acierto if mi_fila else 0
+            mi_preguntas = mi_fila.preguntas_respondidas if mi_fila else 0
             
             if posicion == 0:
                 # El estudiante no ha respondido ninguna pregunta aún
@@ -95,8 +87,7 @@ def handle_posicion(bot, message, db):
                 
                 # Obtener información del top 3
                 top_3_info = ""
-                for idx in range(min(3, len(rankings))):
-                    est_id, nombre, preguntas, intentos, errores, tasa = rankings[idx]
+                for idx, (est_id, nombre, preguntas, intentos, errores, tasa) in enumerate(get_ranking_top(db, 3)):
                     if idx == 0:
                         emoji = "🥇"
                     elif idx == 1:
@@ -120,7 +111,7 @@ def handle_posicion(bot, message, db):
                 
                 # Si está cerca del siguiente puesto, mostrar motivación
                 if posicion > 1:
-                    siguiente_tasa = rankings[posicion-2][5]
+                    siguiente_tasa = ranking.row_at(posicion - 1).tasa_acierto
                     diferencia = round(siguiente_tasa - mi_tasa_acierto, 2)
                     if diferencia <= 5:
                         mensaje += f"\n💪 ¡Estás a solo {diferencia}% del siguiente puesto!"
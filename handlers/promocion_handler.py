@@ -5,7 +5,9 @@ from database.db_sql import (
     check_level_completion,
     exists_next_level,
     promote_student_level,
-    get_max_level
+    get_max_level,
+    flush_answers,
+    AnswerFlushError
 )
 
 def handle_promocion(bot, message, db):
@@ -47,7 +49,15 @@ def handle_promocion(bot, message, db):
         # Obtener nivel actual
         nivel_actual = get_student_level(db, student_id)
         
-        # Verificar completitud del nivel actual
+        # Verificar completitud del nivel actual (con las respuestas del buffer ya escritas)
+        try:
+            flush_answers()
+        except AnswerFlushError as e:
+            # Sin todas las respuestas en la BD no se puede decidir la promoción
+            print(f"[PROMOCION] Promoción no evaluada para el estudiante {student_id}: {e}")
+            bot.send_message(chat_id, "⚠️ Tus últimas respuestas aún no se han guardado. "
+                                      "Vuelve a usar /promocion dentro de un rato.")
+            return
         total_preguntas, preguntas_respondidas = check_level_completion(db, student_id, nivel_actual)
         
         # Verificar si completó todas las preguntas del nivel
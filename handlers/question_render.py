@@ -0,0 +1,141 @@
+"""
+Caché de preguntas ya renderizadas
+
+El texto de una pregunta (enunciado y opciones en Markdown) y su teclado son
+iguales para todos los estudiantes; solo cambia la cabecera "Nivel n |
+Pregunta i/n". La caché guarda por (asignatura, id) el cuerpo ya formateado y
+el JSON del teclado, así que enviar una pregunta es una búsqueda y pegar la
+cabecera.
+
+Una entrada es válida mientras el banco de preguntas no se recargue
+(question_bank.version); tras una recarga se comprueba que la fila no haya
+cambiado antes de reutilizarla. update_question y delete_question del CRUD la
+invalidan explícitamente.
+"""
+
+import threading
+from collections import OrderedDict
+
+import config
+from keyboards.inline_buttons import buttons_play
+from database.question_bank import question_bank
+
+
+QUESTION_RENDER_CACHE_SIZE = getattr(config, "QUESTION_RENDER_CACHE_SIZE", 5000)   # Preguntas renderizadas guardadas
+
+# Los teclados solo tienen dos variantes (2 o 4 opciones): se serializan una vez
+KEYBOARD_JSON = {
+    False: buttons_play(False).to_json(),
+    True: buttons_play(True).to_json(),
+}
+
+
+def render_body(row):
+    """
+    Cuerpo en Markdown de una pregunta (sin cabecera) y si tiene cuatro opciones
+
+    row es la fila de questions: [4] = question, [7..10] = answer1-4
+    """
+    question_text, opcion1, opcion2, opcion3, opcion4 = row[4], row[7], row[8], row[9], row[10]
+    if opcion3 is None or opcion4 is None:
+        # Solo 2 opciones
+        return (
+            f"*{question_text}*\n\n"
+            f"🔴 *Opción 1:* {opcion1}\n"
+            f"🔵 *Opción 2:* {opcion2}\n"
+        ), False
+    # 4 opciones
+    return (
+        f"*{question_text}*\n\n"
+        f"🔴 *Opción 1:* {opcion1}\n"
+        f"🔵 *Opción 2:* {opcion2}\n"
+        f"🟢 *Opción 3:* {opcion3}\n"
+        f"🟣 *Opción 4:* {opcion4}\n"
+    ), True
+
+
+def render_header(nivel, index, total):
+    return f"📚 *Nivel {nivel}* | Pregunta {index + 1}/{total}\n\n"
+
+
+class QuestionRenderCache:
+    """
+    Cuerpos y teclados renderizados por (asignatura, id) con expulsión LRU
+
+    Args:
+        max_size: Preguntas guardadas
+    """
+
+    def __init__(self, max_size=QUESTION_RENDER_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (id_subject, id) -> [versión, fila, cuerpo, teclado]
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, row):
+        """
+        Cuerpo y JSON del teclado de la pregunta
+
+        Args:
+            row: Fila de la pregunta tal como la devuelve el banco
+
+        Returns:
+            tuple: (cuerpo en Markdown, JSON del teclado)
+        """
+        key = (row[1], row[0])
+        version = question_bank.version
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] == version or entry[1] == row):
+                # Misma versión del banco, o banco recargado sin cambios en esta pregunta
+                entry[0] = version
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[2], entry[3]
+            self._misses += 1
+
+        body, cuatro_opciones = render_body(row)
+        keyboard = KEYBOARD_JSON[cuatro_opciones]
+        with self._lock:
+            self._entries[key] = [version, row, body, keyboard]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return body, keyboard
+
+    def render(self, row, nivel, index, total):
+        """
+        Mensaje completo de la pregunta para un estudiante
+
+        Returns:
+            tuple: (texto en Markdown, JSON del teclado)
+        """
+        body, keyboard = self.get(row)
+        return render_header(nivel, index, total) + body, keyboard
+
+    def invalidate(self, subject_id=None, question_id=None):
+        """Descarta una pregunta (o todas si no se indica cuál)"""
+        with self._lock:
+            self._invalidations += 1
+            if question_id is None:
+                self._entries.clear()
+            elif subject_id is None:
+                for key in [k for k in self._entries if k[1] == question_id]:
+                    del self._entries[key]
+            else:
+                self._entries.pop((subject_id, question_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+            }
+
+
+# Caché compartida del proceso
+question_renders = QuestionRenderCache()
@@ -0,0 +1,308 @@
+"""
+Almacén de sesiones de juego (/jugar)
+
+Cada sesión guarda solo las claves (id_subject, id) de sus preguntas; el
+contenido se resuelve en el banco de preguntas al enviarlas. Hay dos backends:
+
+- MemorySessionStore: LRU con caducidad en memoria (se pierde al reiniciar)
+- SqliteSessionStore: fichero SQLite local con una caché LRU delante; las
+  partidas sobreviven a un reinicio del bot
+
+Ambos expulsan las sesiones abandonadas (TTL) y las menos usadas cuando se
+supera el máximo, y llevan métricas de aciertos y expulsiones.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from handlers.tracing import traced
+
+
+SESSION_BACKEND = getattr(config, "SESSION_BACKEND", "sqlite")         # 'sqlite' o 'memory'
+SESSION_DB_PATH = getattr(config, "SESSION_DB_PATH", "quiz_sessions.db")
+SESSION_TTL = getattr(config, "SESSION_TTL", 24 * 3600)                 # Segundos sin actividad antes de expulsar
+SESSION_MAX_SIZE = getattr(config, "SESSION_MAX_SIZE", 100000)          # Sesiones máximas guardadas
+SESSION_CACHE_SIZE = getattr(config, "SESSION_CACHE_SIZE", 10000)       # Sesiones en memoria delante de SQLite
+SESSION_SWEEP_EVERY = 1000                                              # Escrituras entre limpiezas del fichero
+
+
+class QuizSession:
+    """Estado de la partida de un chat"""
+
+    __slots__ = (
+        "student_id", "student_name", "nivel", "estado", "message_id",
+        "question_ids", "current_index", "current_option_page", "total_options"
+    )
+
+    def __init__(self, student_id, student_name, nivel, estado="esperando_confirmacion",
+                 message_id=None, question_ids=None, current_index=0,
+                 current_option_page=0, total_options=4):
+        self.student_id = student_id
+        self.student_name = student_name
+        self.nivel = nivel
+        self.estado = estado
+        self.message_id = message_id
+        self.question_ids = question_ids or []      # [(id_subject, id), ...]
+        self.current_index = current_index
+        self.current_option_page = current_option_page
+        self.total_options = total_options
+
+    @property
+    def total_questions(self):
+        return len(self.question_ids)
+
+    @property
+    def finished(self):
+        return self.current_index >= len(self.question_ids)
+
+    @property
+    def current_question_key(self):
+        """Clave (id_subject, id) de la pregunta actual o None si no quedan"""
+        if self.finished:
+            return None
+        return self.question_ids[self.current_index]
+
+    def to_json(self):
+        data = {slot: getattr(self, slot) for slot in self.__slots__}
+        return json.dumps(data, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        data["question_ids"] = [tuple(key) for key in data.get("question_ids") or []]
+        return cls(**data)
+
+    def __repr__(self):
+        return (f"QuizSession(student_id={self.student_id}, nivel={self.nivel}, estado={self.estado!r}, "
+                f"pregunta={self.current_index}/{len(self.question_ids)})")
+
+
+class MemorySessionStore:
+    """
+    Sesiones en memoria con expulsión LRU y caducidad por inactividad
+
+    Args:
+        max_size: Número máximo de sesiones
+        ttl: Segundos sin actividad tras los que se expulsa una sesión
+    """
+
+    def __init__(self, max_size=SESSION_MAX_SIZE, ttl=SESSION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()   # chat_id -> (sesión, último_uso)
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+
+    @traced("sesion.get")
+    def get(self, chat_id):
+        """Sesión del chat (None si no existe o ha caducado)"""
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(chat_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            session, touched_at = entry
+            if now - touched_at > self.ttl:
+                del self._sessions[chat_id]
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._sessions[chat_id] = (session, now)
+            self._sessions.move_to_end(chat_id)
+            self._hits += 1
+            return session
+
+    @traced("sesion.save")
+    def save(self, chat_id, session):
+        """Guarda (o actualiza tras modificarla) la sesión del chat"""
+        with self._lock:
+            self._sessions[chat_id] = (session, time.time())
+            self._sessions.move_to_end(chat_id)
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+                self._evicted += 1
+
+    @traced("sesion.delete")
+    def delete(self, chat_id):
+        with self._lock:
+            self._sessions.pop(chat_id, None)
+
+    def sweep(self):
+        """Expulsa las sesiones caducadas y devuelve cuántas"""
+        limit = time.time() - self.ttl
+        removed = 0
+        with self._lock:
+            # El OrderedDict está ordenado por último uso: las caducadas van al principio
+            while self._sessions:
+                chat_id, (_, touched_at) = next(iter(self._sessions.items()))
+                if touched_at >= limit:
+                    break
+                del self._sessions[chat_id]
+                removed += 1
+            self._expired += removed
+        return removed
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, chat_id):
+        return self.get(chat_id) is not None
+
+    def __getitem__(self, chat_id):
+        session = self.get(chat_id)
+        if session is None:
+            raise KeyError(chat_id)
+        return session
+
+    def __setitem__(self, chat_id, session):
+        self.save(chat_id, session)
+
+    def __delitem__(self, chat_id):
+        self.delete(chat_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "hits": self._hits,
+                "misses": self._misses,
+                "expired": self._expired,
+                "evicted": self._evicted
+            }
+
+
+class SqliteSessionStore(MemorySessionStore):
+    """
+    Sesiones persistidas en un fichero SQLite local, con una caché LRU en memoria
+
+    Cada save() escribe la sesión en disco, así que tras un reinicio las
+    partidas continúan donde se quedaron.
+
+    Args:
+        path: Ruta del fichero SQLite
+        max_size: Número máximo de sesiones en disco
+        ttl: Segundos sin actividad tras los que se expulsa una sesión
+        cache_size: Sesiones que se mantienen deserializadas en memoria
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, max_size=SESSION_MAX_SIZE, ttl=SESSION_TTL,
+                 cache_size=SESSION_CACHE_SIZE):
+        super().__init__(max_size=cache_size, ttl=ttl)
+        self.path = path
+        self.max_stored = max_size
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS quiz_sessions (
+                chat_id INTEGER PRIMARY KEY,
+                data TEXT NOT NULL,
+                touched_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_quiz_sessions_touched ON quiz_sessions (touched_at)")
+        self._stored_evicted = 0
+        self._writes = 0
+        self.sweep()
+
+    @traced("sesion.get")
+    def get(self, chat_id):
+        session = super().get(chat_id)
+        if session is not None:
+            return session
+
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT data, touched_at FROM quiz_sessions WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.ttl:
+            self.delete(chat_id)
+            with self._lock:
+                self._expired += 1
+            return None
+
+        session = QuizSession.from_json(row[0])
+        super().save(chat_id, session)
+        return session
+
+    @traced("sesion.save")
+    def save(self, chat_id, session):
+        super().save(chat_id, session)
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO quiz_sessions (chat_id, data, touched_at) VALUES (?, ?, ?)",
+                (chat_id, session.to_json(), time.time())
+            )
+            self._writes += 1
+            sweep = self._writes % SESSION_SWEEP_EVERY == 0
+        if sweep:
+            self.sweep()
+
+    @traced("sesion.delete")
+    def delete(self, chat_id):
+        super().delete(chat_id)
+        with self._db_lock:
+            self._conn.execute("DELETE FROM quiz_sessions WHERE chat_id = ?", (chat_id,))
+
+    def sweep(self):
+        """Expulsa las sesiones caducadas y recorta el fichero a max_size"""
+        removed = super().sweep()
+        with self._db_lock:
+            cursor = self._conn.execute(
+                "DELETE FROM quiz_sessions WHERE touched_at < ?", (time.time() - self.ttl,)
+            )
+            expired = max(cursor.rowcount, 0)
+            stored = self._conn.execute("SELECT COUNT(*) FROM quiz_sessions").fetchone()[0]
+            evicted = 0
+            if stored > self.max_stored:
+                cursor = self._conn.execute("""
+                    DELETE FROM quiz_sessions WHERE chat_id IN (
+                        SELECT chat_id FROM quiz_sessions ORDER BY touched_at LIMIT ?
+                    )
+                """, (stored - self.max_stored,))
+                evicted = max(cursor.rowcount, 0)
+        with self._lock:
+            self._expired += max(expired - removed, 0)
+            self._stored_evicted += evicted
+        return max(expired, removed)
+
+    def __len__(self):
+        with self._db_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM quiz_sessions").fetchone()[0]
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            "backend": "sqlite",
+            "cached": stats["sessions"],
+            "sessions": len(self),
+            "cache_evicted": stats["evicted"],
+            "evicted": self._stored_evicted
+        })
+        return stats
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    """Crea el almacén de sesiones configurado en SESSION_BACKEND"""
+    if backend == "sqlite":
+        try:
+            return SqliteSessionStore()
+        except sqlite3.Error as e:
+            print(f"[SESSION] No se pudo abrir {SESSION_DB_PATH} ({e}); sesiones solo en memoria")
+    return MemorySessionStore()
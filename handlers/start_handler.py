@@ -4,19 +4,27 @@ Gestiona el inicio de partidas, verificación de registro y envío de preguntas
 """
 
 from telebot.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from keyboards.inline_buttons import buttons_play
 from database.db_sql import (
     load_questions_by_level, 
     check_student_registration, 
     chat_id_result,
     get_student_level,
     check_number_question_level,
-    promote_student_level
+    promote_student_level,
+    flush_answers,
+    get_question,
+    AnswerFlushError
 )
+from handlers.session_store import QuizSession, create_session_store
+from handlers.outbound import on_sent
+from handlers.question_render import question_renders
+from handlers.chat_dispatcher import in_chat_thread, run_after_update
+from database.db_connection import db_connection
 
-# Diccionario global para guardar el progreso de cada usuario
-# Estructura: {chat_id: {student_id, nivel, questions, current_index, estado, message_id}}
-quiz_sessions = {}
+# Almacén global con el progreso de cada usuario (chat_id -> QuizSession)
+# Las sesiones guardan solo las claves de las preguntas; tras modificar una
+# sesión hay que llamar a quiz_sessions.save(chat_id, session)
+quiz_sessions = create_session_store()
 
 
 def handle_jugar(bot, message: Message, db):
@@ -128,15 +136,13 @@ def handle_jugar(bot, message: Message, db):
         )
         
         # Guardar información temporal para usar después de la confirmación
-        quiz_sessions[chat_id] = {
-            "student_id": student_id,
-            "student_name": student_name,
-            "nivel": nivel_actual,
-            "estado": "esperando_confirmacion",
-            "message_id": message_id,
-            "questions": [],
-            "current_index": 0
-        }
+        quiz_sessions[chat_id] = QuizSession(
+            student_id=student_id,
+            student_name=student_name,
+            nivel=nivel_actual,
+            estado="esperando_confirmacion",
+            message_id=message_id
+        )
         print(f"[JUGAR] Sesión creada para {chat_id} - Esperando confirmación")
         
     else:
@@ -162,7 +168,7 @@ def iniciar_juego(bot, chat_id, db):
     
     session = quiz_sessions.get(chat_id)
     
-    if not session or session["estado"] != "esperando_confirmacion":
+    if not session or session.estado != "esperando_confirmacion":
         print(f"[INICIAR] ERROR: Sesión no válida para {chat_id}")
         bot.send_message(
             chat_id, 
@@ -172,8 +178,8 @@ def iniciar_juego(bot, chat_id, db):
         return
     
     # Cargar preguntas del nivel del estudiante
-    nivel = session["nivel"]
-    student_id = session["student_id"]
+    nivel = session.nivel
+    student_id = session.student_id
     print(f"[INICIAR] Cargando preguntas del nivel {nivel}")
     questions = load_questions_by_level(db, nivel, student_id)
     
@@ -191,12 +197,11 @@ def iniciar_juego(bot, chat_id, db):
     
     print(f"[INICIAR] Cargadas {len(questions)} preguntas del nivel {nivel}")
     
-    # Actualizar sesión del usuario con las preguntas
-    quiz_sessions[chat_id].update({
-        "questions": questions,
-        "current_index": 0,
-        "estado": "jugando"
-    })
+    # Actualizar sesión del usuario con las claves de las preguntas
+    session.question_ids = [(question[1], question[0]) for question in questions]
+    session.current_index = 0
+    session.estado = "jugando"
+    quiz_sessions.save(chat_id, session)
     
     # Enviar mensaje de inicio
     bot.send_message(
@@ -235,11 +240,80 @@ def send_question(bot, chat_id, db, student_id):
         return
     
     # Verificar si quedan preguntas
-    if session["current_index"] >= len(session["questions"]):
-        
-        
-        # Verificar completitud del nivel actual
-        db.reconnect()
+    if session.finished:
+        # El balance del nivel (volcar respuestas, contar, promocionar) se calcula en
+        # segundo plano: la corrección de la última respuesta no lo espera
+        del quiz_sessions[chat_id]
+        run_after_update(chat_id, finalizar_partida, bot, chat_id, student_id)
+        return
+    
+    # Obtener datos de la pregunta actual
+    current_index = session.current_index
+    question_data = get_question(session.current_question_key, db)
+    
+    if question_data is None:
+        # La pregunta se eliminó desde el dashboard durante la partida: se salta
+        print(f"[PREGUNTA] Pregunta {session.current_question_key} ya no existe, se omite")
+        session.current_index += 1
+        quiz_sessions.save(chat_id, session)
+        send_question(bot, chat_id, db, student_id)
+        return
+    
+    question_id = question_data[0]
+    print(f"[PREGUNTA] Enviando pregunta {current_index + 1}/{session.total_questions} (ID: {question_id}) a {chat_id}")
+    
+    # Texto y teclado salen de la caché de preguntas renderizadas; solo se añade la cabecera
+    format_question_text, markup = question_renders.render(
+        question_data, session.nivel, current_index, session.total_questions
+    )
+    
+    # El envío va en segundo plano: el message_id se guarda cuando Telegram lo confirma.
+    # Mientras tanto queda a None y se acepta la respuesta a la pregunta en curso
+    session.message_id = None
+    quiz_sessions.save(chat_id, session)
+
+    def guardar_message_id(sent_message):
+        actual = quiz_sessions.get(chat_id)
+        if actual is not None and actual.current_index == current_index and actual.message_id is None:
+            actual.message_id = sent_message.message_id
+            quiz_sessions.save(chat_id, actual)
+
+    # Enviar pregunta. La confirmación llega en el hilo de envíos: el message_id se
+    # guarda en el hilo del chat para no pisar una respuesta que esté avanzando la sesión
+    on_sent(bot.send_message(
+        chat_id, 
+        format_question_text, 
+        parse_mode='Markdown', 
+        reply_markup=markup
+    ), in_chat_thread(chat_id, guardar_message_id))
+    print(f"[PREGUNTA] Pregunta encolada para su envío")
+
+
+def finalizar_partida(bot, chat_id, student_id):
+    """
+    Comprueba el nivel al acabar la tanda de preguntas y felicita al estudiante
+    Se ejecuta después de la última respuesta, en el hilo del chat (run_after_update)
+    
+    Args:
+        bot: Instancia del bot de Telegram
+        chat_id: ID del chat del usuario
+        student_id: ID del estudiante
+    """
+    # Verificar completitud del nivel actual (con las respuestas del buffer ya escritas)
+    try:
+        flush_answers()
+    except AnswerFlushError as e:
+        # Sin todas las respuestas en la BD no se evalúa el nivel (se puede pedir con /promocion)
+        print(f"[PREGUNTA] Nivel no evaluado para el estudiante {student_id}: {e}")
+        bot.send_message(
+            chat_id,
+            "🎉 Has contestado a la tanda de preguntas propuestas.\n\n"
+            "⚠️ Tus últimas respuestas aún no se han guardado; usa /promocion dentro de un rato "
+            "para comprobar si subes de nivel."
+        )
+        return
+    db = db_connection()
+    try:
         total_preguntas, preguntas_respondidas, nivel = check_number_question_level(db, student_id)
         print(f"[PREGUNTA] Nivel completado: {preguntas_respondidas}/{total_preguntas} preguntas respondidas")
         if preguntas_respondidas != 0:            
@@ -263,71 +337,8 @@ def send_question(bot, chat_id, db, student_id):
                 "⬆️ Usa /promocion para verificar si puedes subir de nivel",
                 parse_mode='Markdown'
             )
-
-        # Limpiar sesión
+    finally:
         db.close()
-        del quiz_sessions[chat_id]
-        return
-    
-    # Obtener datos de la pregunta actual
-    current_index = session["current_index"]
-    question_data = session["questions"][current_index]
-    
-    # Estructura de question_data (según tabla questions):
-    # [0] = id, [1] = id_subject, [2] = state, [3] = level, [4] = question,
-    # [5] = solution, [6] = why, [7] = answer1, [8] = answer2, 
-    # [9] = answer3, [10] = answer4
-    
-    question_id = question_data[0]
-    question_text = question_data[4]
-    opcion1 = question_data[7]
-    opcion2 = question_data[8]
-    opcion3 = question_data[9]
-    opcion4 = question_data[10]
-    
-    print(f"[PREGUNTA] Enviando pregunta {current_index + 1}/{len(session['questions'])} (ID: {question_id}) a {chat_id}")
-    
-    # Crear el markup con botones
-    #markup = buttons_play()
-    
-    # Formatear el mensaje según el número de opciones
-    if opcion3 is None or opcion4 is None:
-        # Solo 2 opciones
-        format_question_text = (
-            f"📚 *Nivel {session['nivel']}* | "
-            f"Pregunta {current_index + 1}/{len(session['questions'])}\n\n"
-            f"*{question_text}*\n\n"
-            f"🔴 *Opción 1:* {opcion1}\n"
-            f"🔵 *Opción 2:* {opcion2}\n"
-        )
-        cuatro_opciones = False
-    else:
-        # 4 opciones
-        format_question_text = (
-            f"📚 *Nivel {session['nivel']}* | "
-            f"Pregunta {current_index + 1}/{len(session['questions'])}\n\n"
-            f"*{question_text}*\n\n"
-            f"🔴 *Opción 1:* {opcion1}\n"
-            f"🔵 *Opción 2:* {opcion2}\n"
-            f"🟢 *Opción 3:* {opcion3}\n"
-            f"🟣 *Opción 4:* {opcion4}\n"
-        )
-        cuatro_opciones = True
-    
-    # Crear el markup con botones
-    markup = buttons_play(cuatro_opciones)
-    
-    # Enviar pregunta
-    sent_message = bot.send_message(
-        chat_id, 
-        format_question_text, 
-        parse_mode='Markdown', 
-        reply_markup=markup
-    )
-    
-    # Actualizar message_id en la sesión
-    session["message_id"] = sent_message.message_id
-    print(f"[PREGUNTA] Pregunta enviada exitosamente")
 
 
 def get_session(chat_id):
@@ -338,7 +349,7 @@ def get_session(chat_id):
         chat_id: ID del chat del usuario
         
     Returns:
-        dict: Sesión del usuario o None si no existe
+        QuizSession: Sesión del usuario o None si no existe
     """
     return quiz_sessions.get(chat_id)
 
@@ -366,8 +377,6 @@ def get_current_question_id(chat_id):
         int: ID de la pregunta actual o None
     """
     session = quiz_sessions.get(chat_id)
-    if session and session["estado"] == "jugando":
-        current_index = session["current_index"]
-        if current_index < len(session["questions"]):
-            return session["questions"][current_index][0]  # ID de la pregunta
+    if session and session.estado == "jugando" and not session.finished:
+        return session.current_question_key[1]  # ID de la pregunta
     return None
\ No newline at end of file
@@ -0,0 +1,283 @@
+"""
+Trazas por actualización de Telegram
+
+Cada actualización (comando o botón) abre una traza con sus tramos:
+
+    recepcion       desde que llega la actualización hasta que el hilo del chat la atiende
+    sesion.*        lecturas y escrituras del almacén de sesiones
+    sql *           cada sentencia SQL (vía query_metrics)
+    telegram.*      cada llamada a la Bot API
+    total           la traza entera; lo no cubierto por tramos es tiempo propio del manejador
+
+Anotar un tramo cuesta un perf_counter y un append a una lista, así que se
+registran en todas las actualizaciones y la decisión de qué guardar se toma al
+cerrar la traza: las que superan TRACE_SLOW_MS van siempre al registro circular
+de lentas y del resto se guarda una muestra (TRACE_SAMPLE_RATE). Los totales
+por manejador y tipo de tramo se acumulan para todas.
+
+La vista se ve en el dashboard (Configuración > Trazas del bot).
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import config
+from database.query_metrics import query_metrics
+
+
+TRACING_ENABLED = getattr(config, "TRACING_ENABLED", True)
+TRACE_SAMPLE_RATE = getattr(config, "TRACE_SAMPLE_RATE", 0.05)      # Fracción de trazas normales guardadas
+TRACE_SLOW_MS = getattr(config, "TRACE_SLOW_MS", 1000)              # Trazas más lentas van al registro de lentas
+TRACE_LOG_SIZE = getattr(config, "TRACE_LOG_SIZE", 50)              # Trazas guardadas en cada registro
+TRACE_MAX_SPANS = 200                                               # Tramos por traza (el resto solo se cuentan)
+
+# Tipos de tramo para el desglose (prefijo del nombre)
+CATEGORIES = ("recepcion", "sesion", "sql", "telegram", "propio")
+
+
+class Trace:
+    """Traza de una actualización: tramos (nombre, inicio_ms, duración_ms, detalle)"""
+
+    __slots__ = ("name", "chat_id", "started", "received", "spans", "dropped", "open_span", "error")
+
+    def __init__(self, name, chat_id, received=None):
+        self.name = name
+        self.chat_id = chat_id
+        self.started = time.perf_counter()
+        self.received = received if received is not None else self.started
+        self.spans = []
+        self.dropped = 0
+        self.open_span = None
+        self.error = None
+
+    def add(self, name, start, seconds, detail=None):
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append((name, (start - self.received) * 1000, seconds * 1000, detail))
+
+
+def _category(name):
+    return name.split(".", 1)[0].split(" ", 1)[0]
+
+
+class Tracer:
+    """Registro de trazas del proceso (un Trace activo por hilo)"""
+
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE, slow_ms=TRACE_SLOW_MS, log_size=TRACE_LOG_SIZE):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._slow = deque(maxlen=log_size)
+        self._sampled = deque(maxlen=log_size)
+        self._totals = {}      # manejador -> {"n", "ms", "max_ms", "errores", categoría: ms}
+
+    # ---------- Trazas ----------
+
+    def current(self):
+        return getattr(self._local, "trace", None)
+
+    @contextmanager
+    def trace(self, name, chat_id, received=None):
+        """Abre la traza de una actualización en el hilo actual"""
+        if not TRACING_ENABLED or self.current() is not None:
+            # Un manejador que llama a otro sigue en la traza exterior
+            yield None
+            return
+        trace = Trace(name, chat_id, received)
+        if trace.started - trace.received > 0:
+            trace.add("recepcion", trace.received, trace.started - trace.received)
+        self._local.trace = trace
+        try:
+            yield trace
+        except Exception as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._local.trace = None
+            self._finish(trace)
+
+    @contextmanager
+    def span(self, name, detail=None):
+        """
+        Tramo dentro de la traza del hilo (no hace nada si no hay traza)
+
+        Un tramo con el mismo nombre que el que ya está abierto (p. ej.
+        SqliteSessionStore.get llamando a MemorySessionStore.get) se funde con él.
+        """
+        trace = self.current()
+        if trace is None or trace.open_span == name:
+            yield
+            return
+        previous, trace.open_span = trace.open_span, name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.open_span = previous
+            trace.add(name, start, time.perf_counter() - start, detail)
+
+    def traced(self, name):
+        """Decorador: la función entera es un tramo"""
+        def decorator(fn):
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            wrapper.__wrapped__ = fn
+            return wrapper
+        return decorator
+
+    def _on_statement(self, caller, operation, sql, start, seconds, rows):
+        """Oyente de query_metrics: cada sentencia SQL es un tramo"""
+        trace = self.current()
+        if trace is not None:
+            trace.add(f"sql {operation}", start, seconds, f"{caller}: {sql[:160]}")
+
+    def _finish(self, trace):
+        ended = time.perf_counter()
+        total_ms = (ended - trace.received) * 1000
+        by_category = dict.fromkeys(CATEGORIES, 0.0)
+        covered = 0.0
+        for name, _, ms, _ in _top_level(trace.spans):
+            category = _category(name)
+            by_category[category] = by_category.get(category, 0.0) + ms
+            covered += ms
+        by_category["propio"] = max(0.0, total_ms - covered)
+
+        slow = total_ms >= self.slow_ms
+        keep = slow or random.random() < self.sample_rate
+        with self._lock:
+            totals = self._totals.get(trace.name)
+            if totals is None:
+                totals = self._totals[trace.name] = {"n": 0, "ms": 0.0, "max_ms": 0.0, "errores": 0}
+            totals["n"] += 1
+            totals["ms"] += total_ms
+            totals["max_ms"] = max(totals["max_ms"], total_ms)
+            totals["errores"] += trace.error is not None
+            for category, ms in by_category.items():
+                totals[category] = totals.get(category, 0.0) + ms
+            if keep:
+                record = {
+                    "cuando": datetime.now().isoformat(timespec="seconds"),
+                    "manejador": trace.name,
+                    "chat_id": trace.chat_id,
+                    "total_ms": round(total_ms, 1),
+                    "desglose": {c: round(ms, 1) for c, ms in by_category.items()},
+                    "tramos": [(n, round(s, 1), round(d, 1), detail) for n, s, d, detail in trace.spans],
+                    "descartados": trace.dropped,
+                    "error": trace.error,
+                }
+                (self._slow if slow else self._sampled).append(record)
+        if slow:
+            print(f"[TRAZA] {trace.name} lento ({total_ms:.0f} ms) en chat {trace.chat_id}: "
+                  + ", ".join(f"{c} {ms:.0f} ms" for c, ms in by_category.items() if ms >= 1))
+
+    # ---------- Consulta ----------
+
+    def snapshot(self):
+        """
+        Resumen para el dashboard
+
+        Returns:
+            dict: handlers [{manejador, n, media_ms, max_ms, errores, <categoría>_pct}]
+                  (ordenados por tiempo total), slow [...], sampled [...] (las más recientes primero)
+        """
+        with self._lock:
+            handlers = []
+            for name, totals in self._totals.items():
+                entry = {
+                    "manejador": name,
+                    "n": totals["n"],
+                    "media_ms": round(totals["ms"] / totals["n"], 1),
+                    "max_ms": round(totals["max_ms"], 1),
+                    "total_ms": round(totals["ms"], 1),
+                    "errores": totals["errores"],
+                }
+                for category in CATEGORIES:
+                    entry[f"{category}_pct"] = round(totals.get(category, 0.0) / totals["ms"] * 100, 1) \
+                        if totals["ms"] else 0
+                handlers.append(entry)
+            handlers.sort(key=lambda h: h["total_ms"], reverse=True)
+            return {
+                "handlers": handlers,
+                "slow": list(reversed(self._slow)),
+                "sampled": list(reversed(self._sampled)),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._slow.clear()
+            self._sampled.clear()
+
+
+def _top_level(spans):
+    """Tramos que no están contenidos en otro (para no contar dos veces el tiempo anidado)"""
+    result = []
+    end = float("-inf")
+    for span in sorted(spans, key=lambda s: (s[1], -s[2])):
+        if span[1] + span[2] <= end + 1e-6:
+            continue
+        result.append(span)
+        end = max(end, span[1] + span[2])
+    return result
+
+
+# Instancia compartida del proceso (bot y dashboard)
+tracer = Tracer()
+query_metrics.add_listener(tracer._on_statement)
+
+# Marca de llegada pendiente por hilo (la pone el runtime antes de ejecutar el manejador)
+_received = threading.local()
+
+
+def arrival_time():
+    """Momento de llegada de la actualización en curso (marca del runtime o ahora)"""
+    return getattr(_received, "at", None) or time.perf_counter()
+
+
+def trace_update(name, chat_id, received=None):
+    """Context manager: traza de una actualización"""
+    return tracer.trace(name, chat_id, received)
+
+
+def span(name, detail=None):
+    """Context manager: tramo dentro de la traza actual"""
+    return tracer.span(name, detail)
+
+
+def traced(name):
+    """Decorador: tramo con el nombre dado alrededor de la función"""
+    return tracer.traced(name)
+
+
+def with_received_at(fn, received):
+    """
+    Envuelve fn para que la traza que abra cuente desde `received`
+
+    Lo usa el runtime asíncrono: la actualización llega al bucle de asyncio y
+    el manejador arranca después en el hilo del chat.
+    """
+    def wrapper(*args):
+        _received.at = received
+        try:
+            return fn(*args)
+        finally:
+            _received.at = None
+    return wrapper
+
+
+def trace_methods(obj, names, prefix):
+    """Sustituye los métodos `names` de obj por versiones que abren un tramo prefix.<método>"""
+    for name in names:
+        method = getattr(obj, name, None)
+        if method is not None:
+            setattr(obj, name, tracer.traced(f"{prefix}.{name}")(method))
+    return obj
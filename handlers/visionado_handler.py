@@ -1,4 +1,4 @@
-from database.db_sql import check_student_registration, chat_id_result
+from database.db_sql import check_student_registration, chat_id_result, flush_answers, AnswerFlushError
 
 def handle_visionado(bot, message, db):
     """
@@ -34,18 +34,24 @@ def handle_visionado(bot, message, db):
         student_id = student_info[0]
         student_name = student_info[1]
         
-        # Obtener estadísticas del estudiante
+        # Obtener estadísticas del estudiante (con las respuestas del buffer ya escritas)
+        try:
+            flush_answers()
+        except AnswerFlushError as e:
+            print(f"[VISIONADO] Estadísticas sin las últimas respuestas del estudiante {student_id}: {e}")
+            bot.send_message(chat_id, "⚠️ Algunas de tus últimas respuestas aún no se han guardado; "
+                                      "las estadísticas pueden no incluirlas.")
         cursor = db.cursor()
         query = """
         SELECT 
-            COUNT(DISTINCT sq.id_question) as preguntas_respondidas,
-            SUM(sq.num_attempts) as total_intentos,
-            SUM(CASE WHEN sq.first_attempt = 1 THEN 1 ELSE 0 END) as aciertos_primer_intento,
-            COALESCE( SUM(CASE  WHEN num_attempts >= 2 AND second_attempt = 1 THEN 1 ELSE 0 END), 0) as aciertos_segundo_intento,
-            COALESCE( SUM(CASE  WHEN num_attempts >= 2 THEN 1 ELSE 0 END), 0) as total_segundo_intento,
+            st.preguntas_respondidas,
+            st.total_intentos,
+            st.aciertos_primer_intento,
+            st.aciertos_segundo_intento,
+            st.total_segundo_intento,
             (SELECT COUNT(*) FROM questions WHERE state = 'A') as total_preguntas
-        FROM student_question sq
-        WHERE sq.id_student = %s
+        FROM student_stats st
+        WHERE st.id_student = %s
         """
         cursor.execute(query, (student_id,))
         stats = cursor.fetchone()
@@ -0,0 +1,212 @@
+"""
+Runtime del bot por webhook
+
+Telegram envía cada actualización por POST a la app Flask del dashboard
+(WEBHOOK_PATH) en lugar de que el bot la pida con long polling. La petición
+solo valida, deduplica y encola: el manejador se ejecuta después en el hilo
+del chat (ChatDispatcher), así que las actualizaciones de un mismo chat se
+atienden en orden y las de chats distintos en paralelo.
+
+La cola está acotada (WEBHOOK_QUEUE_SIZE en total, WEBHOOK_SHARD_QUEUE_SIZE por
+hilo). Cuando está llena se aplica WEBHOOK_OVERLOAD_POLICY:
+
+    defer   responde 503 y Telegram reintenta la actualización más tarde; las
+            siguientes del mismo chat también se aplazan hasta que entre la
+            aplazada, para no atenderlas en desorden
+    drop    responde 200 y la descarta; a los botones se les contesta con un
+            aviso para que no se queden cargando
+
+La ruta es pública (la app Flask escucha en 0.0.0.0), así que WEBHOOK_SECRET es
+obligatorio: sin él el runtime no arranca y cada petición sin la cabecera
+X-Telegram-Bot-Api-Secret-Token correcta recibe un 403.
+
+Pruebas locales contra la Bot API falsa:
+    python -m tools.load_test --runtime webhook --updates 500
+"""
+
+import hmac
+import threading
+import time
+
+from telebot import types
+
+import config
+from handlers.chat_dispatcher import ProcessedKeys
+from handlers.tracing import with_received_at
+
+
+WEBHOOK_URL = getattr(config, "WEBHOOK_URL", None)                          # URL pública (https://...) del servidor
+WEBHOOK_PATH = getattr(config, "WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = getattr(config, "WEBHOOK_SECRET", None)                    # Cabecera X-Telegram-Bot-Api-Secret-Token (obligatoria)
+WEBHOOK_QUEUE_SIZE = getattr(config, "WEBHOOK_QUEUE_SIZE", 1000)            # Actualizaciones pendientes en total
+WEBHOOK_SHARD_QUEUE_SIZE = getattr(config, "WEBHOOK_SHARD_QUEUE_SIZE", 200)  # Pendientes por hilo de chats
+WEBHOOK_OVERLOAD_POLICY = getattr(config, "WEBHOOK_OVERLOAD_POLICY", "defer")  # 'defer' o 'drop'
+WEBHOOK_RETRY_AFTER = getattr(config, "WEBHOOK_RETRY_AFTER", 5)             # Segundos sugeridos al aplazar
+WEBHOOK_MAX_CONNECTIONS = getattr(config, "WEBHOOK_MAX_CONNECTIONS", 40)    # Conexiones simultáneas de Telegram
+
+# Un chat con una actualización aplazada deja de esperar por ella pasado este tiempo
+# (Telegram acaba descartando las que fallan demasiadas veces)
+DEFER_HOLD_SECONDS = 120
+
+BUSY_TEXT = "⏳ Hay mucha gente jugando ahora mismo. Inténtalo en unos segundos."
+
+
+class WebhookRuntime:
+    """
+    Recepción de actualizaciones por webhook con cola acotada
+
+    Args:
+        bot: TeleBot (para registrar el webhook y avisar de descartes)
+        commands: Diccionario {comando: función(message)} con los manejadores síncronos
+        callback: Función(call) que atiende los botones inline
+        dispatcher: ChatDispatcher compartido con los manejadores
+        queue_size: Máximo de actualizaciones pendientes en total
+        shard_queue_size: Máximo de pendientes por hilo
+        policy: 'defer' (503, Telegram reintenta) o 'drop' (200 y se descarta)
+        secret: Token secreto que Telegram envía en cada petición (obligatorio)
+    """
+
+    def __init__(self, bot, commands, callback, dispatcher, queue_size=WEBHOOK_QUEUE_SIZE,
+                 shard_queue_size=WEBHOOK_SHARD_QUEUE_SIZE, policy=WEBHOOK_OVERLOAD_POLICY,
+                 secret=WEBHOOK_SECRET):
+        if policy not in ("defer", "drop"):
+            raise ValueError(f"WEBHOOK_OVERLOAD_POLICY desconocida: {policy}")
+        if not secret:
+            raise ValueError("Falta WEBHOOK_SECRET en config.py: sin él cualquiera puede enviar "
+                             "actualizaciones falsas a la ruta del webhook")
+        self.bot = bot
+        self.commands = commands
+        self.callback = callback
+        self.dispatcher = dispatcher
+        self.queue_size = queue_size
+        self.shard_queue_size = shard_queue_size
+        self.policy = policy
+        self.secret = secret
+        self._processed = ProcessedKeys()
+        self._lock = threading.Lock()
+        self._deferred_chats = {}     # chat_id -> (update_id aplazado, instante)
+        self._counts = {"recibidas": 0, "encoladas": 0, "ignoradas": 0, "duplicadas": 0,
+                        "aplazadas": 0, "descartadas": 0, "errores": 0}
+
+    # ---------- Registro en Telegram ----------
+
+    def install(self, app, path=WEBHOOK_PATH):
+        """Añade la ruta POST del webhook a la app Flask"""
+        from flask import request
+
+        def telegram_webhook():
+            status, headers = self.handle(request.get_json(silent=True),
+                                          request.headers.get("X-Telegram-Bot-Api-Secret-Token"))
+            return "", status, headers
+
+        app.add_url_rule(path, "telegram_webhook", telegram_webhook, methods=["POST"])
+        return self
+
+    def set_webhook(self, url=WEBHOOK_URL, path=WEBHOOK_PATH):
+        """Registra la URL del webhook en Telegram (sin descartar las actualizaciones pendientes)"""
+        if not url:
+            raise ValueError("Falta WEBHOOK_URL en config.py")
+        return self.bot.set_webhook(
+            url=url.rstrip("/") + path,
+            secret_token=self.secret,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=["message", "callback_query"],
+        )
+
+    # ---------- Recepción ----------
+
+    def handle(self, data, secret=None):
+        """
+        Atiende una petición del webhook
+
+        Args:
+            data: Actualización (JSON ya decodificado)
+            secret: Valor de la cabecera X-Telegram-Bot-Api-Secret-Token
+
+        Returns:
+            tuple: (código HTTP, cabeceras)
+        """
+        received = time.perf_counter()
+        if not secret or not hmac.compare_digest(secret.encode(), self.secret.encode()):
+            return 403, {}
+        if not isinstance(data, dict) or "update_id" not in data:
+            return 400, {}
+        self._count("recibidas")
+
+        update = types.Update.de_json(data)
+        target = self._route(update)
+        if target is None:
+            self._count("ignoradas")
+            return 200, {}
+        chat_id, handler, arg = target
+
+        if not self._processed.add(update.update_id):
+            # Reintento de Telegram de una actualización ya encolada
+            self._count("duplicadas")
+            return 200, {}
+
+        with self._lock:
+            held = self._deferred_chats.get(chat_id)
+            if held is not None and (held[0] == update.update_id or received - held[1] > DEFER_HOLD_SECONDS):
+                held = None
+                del self._deferred_chats[chat_id]
+
+        future = None
+        if held is None:
+            future = self.dispatcher.try_submit(
+                chat_id, with_received_at(self._run, received), handler, arg,
+                max_pending=self.queue_size, max_shard_pending=self.shard_queue_size
+            )
+        if future is not None:
+            self._count("encoladas")
+            return 200, {}
+        return self._overloaded(update, chat_id, arg)
+
+    def _overloaded(self, update, chat_id, arg):
+        if self.policy == "defer":
+            self._processed.discard(update.update_id)
+            with self._lock:
+                self._deferred_chats.setdefault(chat_id, (update.update_id, time.perf_counter()))
+            self._count("aplazadas")
+            return 503, {"Retry-After": str(WEBHOOK_RETRY_AFTER)}
+
+        self._count("descartadas")
+        print(f"[WEBHOOK] Cola llena; actualización {update.update_id} del chat {chat_id} descartada")
+        if update.callback_query is not None:
+            try:
+                self.bot.answer_callback_query(arg.id, BUSY_TEXT)
+            except Exception as e:
+                print(f"[WEBHOOK] No se pudo avisar del descarte: {e}")
+        return 200, {}
+
+    def _route(self, update):
+        """(chat_id, manejador, argumento) de la actualización, o None si no hay manejador"""
+        if update.callback_query is not None and update.callback_query.message is not None:
+            call = update.callback_query
+            return call.message.chat.id, self.callback, call
+        message = update.message
+        if message is None or not message.text or not message.text.startswith("/"):
+            return None
+        command = message.text.split()[0][1:].split("@")[0].lower()
+        handler = self.commands.get(command)
+        if handler is None:
+            return None
+        return message.chat.id, handler, message
+
+    def _run(self, handler, arg):
+        try:
+            handler(arg)
+        except Exception as e:
+            self._count("errores")
+            print(f"[WEBHOOK] Error en {handler.__name__}: {e}")
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats["chats_aplazados"] = len(self._deferred_chats)
+        stats.update({f"cola_{k}": v for k, v in self.dispatcher.stats().items()})
+        return stats
@@ -0,0 +1,23 @@
+"""
+Configuración común de las pruebas
+
+Los módulos del bot importan config.py, que no está en el repositorio (tiene
+el token y la contraseña de la BD). Si no existe se usa config.example.py: las
+pruebas no se conectan a Telegram ni a MySQL.
+"""
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    spec = importlib.util.spec_from_file_location("config", os.path.join(ROOT, "config.example.py"))
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    sys.modules["config"] = config
@@ -0,0 +1,267 @@
+"""
+Pruebas del buffer de respuestas (database/answer_buffer.py) con sqlite3 como
+sustituto de MySQL: volcado, reproducción del diario, checkpoint y reintentos
+
+    python -m pytest tests/test_answer_buffer.py
+"""
+
+import json
+import re
+import sqlite3
+
+import pytest
+
+from database.answer_buffer import AnswerBuffer, AnswerFlushError, ensure_checkpoint_table
+
+
+# Claves únicas de las tablas con INSERT ... ON DUPLICATE KEY UPDATE
+CONFLICT_KEYS = {
+    "student_question": "id_student, id_question",
+    "answer_buffer_checkpoint": "id",
+}
+
+
+def to_sqlite(query):
+    """Traduce al dialecto de sqlite las construcciones de MySQL que usa el buffer"""
+    query = query.replace("%s", "?").replace(" FOR UPDATE", "").replace("INSERT IGNORE", "INSERT OR IGNORE")
+    query = query.replace(") IN ((", ") IN (VALUES (")
+    if "ON DUPLICATE KEY UPDATE" in query:
+        table = re.search(r"INSERT INTO (\w+)", query).group(1)
+        query = query.replace("ON DUPLICATE KEY UPDATE",
+                              f"ON CONFLICT({CONFLICT_KEYS[table]}) DO UPDATE SET")
+        query = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", query)
+        query = query.replace("GREATEST(", "MAX(").replace("IF(", "iif(")
+    return query
+
+
+class SqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        self._cursor.execute(to_sqlite(query), params)
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(to_sqlite(query), rows)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """Conexión sqlite3 con la interfaz que usa el buffer (cursor con dialecto MySQL)"""
+
+    def __init__(self, path):
+        self._path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=1)
+        self._db.execute("PRAGMA foreign_keys = ON")
+
+    def cursor(self):
+        return SqliteCursor(self._db.cursor())
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+
+@pytest.fixture
+def sqlite_factory(tmp_path):
+    """Factoría de conexiones a una BD con student_question y la fila de control"""
+    path = str(tmp_path / "buffer.db")
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE questions (id INTEGER PRIMARY KEY);
+        INSERT INTO questions (id) VALUES (1), (2), (3);
+        CREATE TABLE student_question (
+            id_student INTEGER NOT NULL,
+            id_question INTEGER NOT NULL REFERENCES questions(id),
+            mistake_number INTEGER NOT NULL,
+            num_attempts INTEGER NOT NULL,
+            first_attempt INTEGER NOT NULL,
+            second_attempt INTEGER NOT NULL,
+            first_attempt_date TEXT,
+            last_attempt_date TEXT,
+            PRIMARY KEY (id_student, id_question)
+        );
+    """)
+    db.close()
+    factory = lambda: SqliteConnection(path)
+    ensure_checkpoint_table(factory())
+    return factory
+
+
+@pytest.fixture
+def make_buffer(tmp_path, sqlite_factory):
+    """Crea buffers sin hilo de volcado (se vuelca a mano con flush)"""
+    def make(**kwargs):
+        buffer = AnswerBuffer(sqlite_factory, journal_path=str(tmp_path / "journal.log"),
+                              dead_letter_path=str(tmp_path / "dead_letter.log"),
+                              fsync=False, retries=2, retry_delay=0, **kwargs)
+        buffer._replay_journal(buffer._read_applied_seq())
+        buffer._journal = open(buffer.journal_path, "a", encoding="utf-8")
+        return buffer
+    return make
+
+
+def attempts(factory, student_id, question_id):
+    cursor = factory().cursor()
+    cursor.execute(
+        "SELECT num_attempts, mistake_number, first_attempt, second_attempt FROM student_question "
+        "WHERE id_student = %s AND id_question = %s", (student_id, question_id)
+    )
+    return cursor.fetchone()
+
+
+def applied_seq(factory):
+    cursor = factory().cursor()
+    cursor.execute("SELECT last_seq FROM answer_buffer_checkpoint WHERE id = 1")
+    return cursor.fetchone()[0]
+
+
+def test_flush_upserts_answers_in_order(make_buffer, sqlite_factory):
+    buffer = make_buffer()
+    buffer.submit(7, 1, False)
+    buffer.submit(7, 1, True)
+    buffer.submit(7, 2, True)
+
+    assert buffer.flush() == 3
+    assert attempts(sqlite_factory, 7, 1) == (2, 1, 0, 1)
+    assert attempts(sqlite_factory, 7, 2) == (1, 0, 1, 0)
+    assert applied_seq(sqlite_factory) == 3
+    assert buffer.stats()["queue_depth"] == 0
+
+
+def test_replay_requeues_unflushed_answers(make_buffer, sqlite_factory):
+    crashed = make_buffer()
+    crashed.submit(7, 1, True)
+    crashed.submit(8, 1, False)
+    crashed._journal.close()    # Caída antes del volcado
+
+    buffer = make_buffer()
+    assert buffer.stats()["queue_depth"] == 2
+    assert buffer.flush() == 2
+    assert attempts(sqlite_factory, 8, 1) == (1, 1, 0, 0)
+
+
+def test_replay_skips_answers_already_committed(make_buffer, sqlite_factory, monkeypatch):
+    crashed = make_buffer()
+    crashed.submit(7, 1, False)
+    crashed.submit(7, 1, True)
+    # Caída entre el commit del lote y la marca "ckpt" del diario
+    monkeypatch.setattr(crashed, "_checkpoint", lambda seq: None)
+    assert crashed.flush() == 2
+    crashed._journal.close()
+
+    buffer = make_buffer()
+    assert buffer.stats()["queue_depth"] == 0
+    assert buffer.stats()["replayed"] == 0
+    assert attempts(sqlite_factory, 7, 1) == (2, 1, 0, 1)
+
+    # Los seq nuevos siguen a los ya aplicados
+    buffer.submit(7, 1, True)
+    assert buffer.flush() == 1
+    assert applied_seq(sqlite_factory) == 3
+    assert attempts(sqlite_factory, 7, 1)[0] == 3
+
+
+def test_retry_after_lost_commit_skips_applied_answers(make_buffer, sqlite_factory):
+    class LostAckConnection(SqliteConnection):
+        """El commit llega a la BD pero la conexión se cae antes de confirmarlo"""
+        lost = False
+
+        def commit(self):
+            super().commit()
+            if not LostAckConnection.lost:
+                LostAckConnection.lost = True
+                raise sqlite3.OperationalError("conexión perdida")
+
+    buffer = make_buffer()
+    buffer._connection_factory = lambda: LostAckConnection(sqlite_factory()._path)
+    buffer.submit(7, 1, False)
+    buffer.submit(7, 1, True)
+
+    assert buffer.flush() == 0
+    stats = buffer.stats()
+    assert stats["retries"] == 1
+    assert stats["skipped_rows"] == 2
+    assert attempts(sqlite_factory, 7, 1) == (2, 1, 0, 1)
+
+
+def test_transient_error_is_retried(make_buffer, sqlite_factory):
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_factory():
+        if failures:
+            raise failures.pop()
+        return sqlite_factory()
+
+    buffer = make_buffer()
+    buffer._connection_factory = flaky_factory
+    buffer.submit(7, 1, True)
+    assert buffer.flush() == 1
+    assert buffer.stats()["retries"] == 1
+    assert attempts(sqlite_factory, 7, 1) == (1, 0, 1, 0)
+
+
+def test_transient_error_keeps_batch_queued_after_retries(make_buffer, sqlite_factory):
+    def down_factory():
+        raise sqlite3.OperationalError("servidor caído")
+
+    buffer = make_buffer()
+    buffer._connection_factory = down_factory
+    buffer.submit(7, 1, True)
+    buffer.submit(7, 2, True)
+
+    with pytest.raises(AnswerFlushError) as raised:
+        buffer.flush()
+    assert raised.value.pending == 2
+    assert raised.value.dead_lettered == 0
+    stats = buffer.stats()
+    assert stats["retries"] == 2
+    assert stats["failed_flushes"] == 1
+    assert stats["queue_depth"] == 2
+
+    # Cuando vuelve la BD se escriben en orden
+    buffer._connection_factory = sqlite_factory
+    assert buffer.flush() == 2
+
+
+def test_permanent_error_dead_letters_only_bad_rows(make_buffer, sqlite_factory, tmp_path):
+    buffer = make_buffer()
+    buffer.submit(7, 1, True)
+    buffer.submit(7, 99, True)      # Pregunta inexistente: viola la clave ajena
+    buffer.submit(7, 2, False)
+    buffer.submit(8, 3, True)
+
+    with pytest.raises(AnswerFlushError) as raised:
+        buffer.flush()
+    assert raised.value.applied == 3
+    assert raised.value.dead_lettered == 1
+    assert raised.value.pending == 0
+    assert buffer.stats()["queue_depth"] == 0
+    assert buffer.stats()["retries"] == 0      # Los errores permanentes no se reintentan
+
+    assert attempts(sqlite_factory, 7, 1) == (1, 0, 1, 0)
+    assert attempts(sqlite_factory, 7, 2) == (1, 1, 0, 0)
+    assert attempts(sqlite_factory, 8, 3) == (1, 0, 1, 0)
+    assert applied_seq(sqlite_factory) == 4
+
+    with open(tmp_path / "dead_letter.log", encoding="utf-8") as dead_letter:
+        records = [json.loads(line) for line in dead_letter]
+    assert [(r["seq"], r["q"]) for r in records] == [(2, 99)]
+    assert "FOREIGN KEY" in records[0]["error"]
+
+    # La cola no queda bloqueada
+    buffer.submit(7, 1, False)
+    assert buffer.flush() == 1
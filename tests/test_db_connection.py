@@ -0,0 +1,224 @@
+"""
+Pruebas del pool de conexiones (database/db_connection.py) con sqlite3 como
+sustituto de MySQL
+
+    python -m pytest tests/test_db_connection.py
+"""
+
+import sqlite3
+import threading
+
+import mysql.connector
+import pytest
+
+import database.db_connection as db_connection_module
+from database.db_connection import (
+    POOL_RESERVED, ConnectionPool, PooledConnection, PoolTimeoutError, check_pool_size,
+    configure_pool, db_connection
+)
+
+
+@pytest.fixture
+def sqlite_factory(tmp_path):
+    """Factoría de conexiones sqlite3 a un mismo fichero (comparten los datos como en MySQL)"""
+    path = str(tmp_path / "pool.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE answers (id INTEGER PRIMARY KEY, correct INTEGER)")
+    db.commit()
+    db.close()
+    return lambda: sqlite3.connect(path, check_same_thread=False, timeout=1)
+
+
+def test_timeout_when_pool_is_exhausted(sqlite_factory):
+    pool = ConnectionPool(sqlite_factory, size=1, timeout=0.1)
+    held = pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waits"] == 1
+    assert stats["wait_time"] >= 0.1
+    assert stats["in_use"] == 1
+    pool.release(held)
+
+
+def test_waiting_thread_gets_released_connection(sqlite_factory):
+    pool = ConnectionPool(sqlite_factory, size=1, timeout=5)
+    held = pool.acquire()
+    result = {}
+
+    def borrow():
+        result["conn"] = pool.acquire()
+
+    thread = threading.Thread(target=borrow)
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive()     # Esperando un hueco
+
+    pool.release(held)
+    thread.join(5)
+    assert result["conn"] is held
+    assert pool.stats()["waits"] == 1
+    assert pool.stats()["created"] == 1
+
+
+def test_release_rolls_back_open_transaction(sqlite_factory):
+    pool = ConnectionPool(sqlite_factory, size=1)
+    raw = pool.acquire()
+    raw.execute("INSERT INTO answers (correct) VALUES (1)")
+    assert raw.in_transaction
+    pool.release(raw)
+
+    # El siguiente usuario recibe la misma conexión física, sin la transacción a medias
+    again = pool.acquire()
+    assert again is raw
+    assert not again.in_transaction
+    assert again.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 0
+    pool.release(again)
+
+
+def test_release_discards_connection_when_rollback_fails(sqlite_factory):
+    class BrokenConnection:
+        in_transaction = True
+        closed = False
+
+        def rollback(self):
+            raise sqlite3.OperationalError("conexión perdida")
+
+        def close(self):
+            self.closed = True
+
+    broken = BrokenConnection()
+    factories = iter([lambda: broken, sqlite_factory])
+    pool = ConnectionPool(lambda: next(factories)(), size=1)
+
+    raw = pool.acquire()
+    pool.release(raw)
+    assert broken.closed
+    assert pool.stats()["discarded"] == 1
+    assert pool.stats()["open"] == 0
+
+    # El hueco queda libre para una conexión nueva
+    fresh = pool.acquire()
+    assert isinstance(fresh, sqlite3.Connection)
+    pool.release(fresh)
+
+
+def test_health_check_discards_dead_idle_connection(sqlite_factory):
+    pool = ConnectionPool(sqlite_factory, size=1, health_check_idle=0)
+    raw = pool.acquire()
+    pool.release(raw)
+
+    # La conexión muere mientras está ociosa (p. ej. wait_timeout del servidor)
+    raw.close()
+
+    fresh = pool.acquire()
+    assert fresh is not raw
+    assert fresh.execute("SELECT 1").fetchone() == (1,)
+    stats = pool.stats()
+    assert stats["discarded"] == 1
+    assert stats["created"] == 2
+    assert stats["open"] == 1
+    pool.release(fresh)
+
+
+def test_health_check_skipped_for_recently_used_connection(sqlite_factory):
+    pool = ConnectionPool(sqlite_factory, size=1, health_check_idle=60)
+    raw = pool.acquire()
+    pool.release(raw)
+    raw.close()
+
+    # Dentro de health_check_idle no se comprueba: se entrega tal cual
+    assert pool.acquire() is raw
+    assert pool.stats()["discarded"] == 0
+
+
+def test_thread_affinity(sqlite_factory):
+    pool = ConnectionPool(sqlite_factory, size=2)
+    mine = pool.acquire()
+    other_acquired = threading.Event()
+    main_released = threading.Event()
+    other_released = threading.Event()
+    result = {}
+
+    def other_thread():
+        result["first"] = pool.acquire()
+        other_acquired.set()
+        main_released.wait(5)
+        pool.release(result["first"])
+        other_released.set()
+        main_released.wait(5)
+        result["second"] = pool.acquire()
+        pool.release(result["second"])
+
+    thread = threading.Thread(target=other_thread)
+    thread.start()
+    other_acquired.wait(5)
+    pool.release(mine)
+    main_released.set()
+    other_released.wait(5)
+
+    # La última devuelta es la del otro hilo, pero cada hilo recupera la suya
+    assert pool.acquire() is mine
+    thread.join(5)
+    assert result["second"] is result["first"]
+    assert result["first"] is not mine
+
+
+def test_pooled_connection_close_returns_to_pool(sqlite_factory):
+    pool = ConnectionPool(sqlite_factory, size=1)
+    db = PooledConnection(pool)
+    assert pool.stats()["in_use"] == 1
+
+    db.close()
+    db.close()      # Cerrar dos veces no devuelve la conexión dos veces
+    assert pool.stats()["in_use"] == 0
+    assert pool.stats()["idle"] == 1
+
+    # reconnect() tras close() vuelve a pedir una conexión al pool
+    db.reconnect()
+    assert pool.stats()["in_use"] == 1
+    db.close()
+
+
+def test_check_pool_size_requires_reserved_connections():
+    check_pool_size(8, size=8 + POOL_RESERVED)
+    with pytest.raises(ValueError):
+        check_pool_size(8, size=8 + POOL_RESERVED - 1)
+
+
+@pytest.fixture
+def shared_pool():
+    """Restaura el pool compartido del proceso después de sustituirlo"""
+    yield
+    db_connection_module._pool = None
+
+
+def test_db_connection_does_not_ping_on_borrow(shared_pool):
+    pings = []
+
+    class Connection:
+        in_transaction = False
+
+        def is_connected(self):
+            pings.append(1)
+            return True
+
+        def rollback(self):
+            pass
+
+    configure_pool(Connection, size=2, health_check_idle=60)
+    for _ in range(5):
+        db_connection().close()
+    assert pings == []
+
+
+def test_db_connection_returns_error_when_connection_fails(shared_pool):
+    def unreachable():
+        raise mysql.connector.Error("servidor inaccesible")
+
+    configure_pool(unreachable, size=1)
+    assert db_connection() == -1
+    assert db_connection_module.get_pool_stats()["in_use"] == 0
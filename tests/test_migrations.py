@@ -0,0 +1,78 @@
+"""
+Pruebas de database/migrations.py con sqlite3 como sustituto de MySQL: una
+migración que falla al arrancar no bloquea las siguientes
+
+    python -m pytest tests/test_migrations.py
+"""
+
+import sqlite3
+
+import pytest
+
+from database import migrations
+from database.migrations import MigrationError, ensure_schema, migrate
+
+
+class SqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        if "GET_LOCK" in query or "RELEASE_LOCK" in query:
+            query, params = "SELECT 1", ()
+        query = query.replace("%s", "?").replace("NOW()", "CURRENT_TIMESTAMP")
+        self._cursor.execute(query, params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    def __init__(self):
+        self._db = sqlite3.connect(":memory:")
+
+    def cursor(self):
+        return SqliteCursor(self._db.cursor())
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+
+def datos_duplicados(db):
+    raise MigrationError("Hay filas duplicadas")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        (1, "Tabla a", ["CREATE TABLE a (id INT)"]),
+        (2, "Clave única", [datos_duplicados, "CREATE UNIQUE INDEX a_id ON a (id)"]),
+        (3, "Tabla b", ["CREATE TABLE b (id INT)"]),
+    ])
+    return SqliteConnection()
+
+
+def test_ensure_schema_applies_migrations_after_a_failing_one(db):
+    with pytest.raises(MigrationError) as raised:
+        ensure_schema(db)
+    assert raised.value.applied == [1, 3]
+    assert [version for version, _, _ in raised.value.failed] == [2]
+    assert migrations.applied_versions(db) == {1, 3}
+
+    # La siguiente ejecución solo reintenta la que falló
+    assert [m[0] for m in migrations.pending_migrations(db)] == [2]
+
+
+def test_migrate_stops_at_first_failure(db):
+    with pytest.raises(MigrationError):
+        migrate(db)
+    assert migrations.applied_versions(db) == {1}
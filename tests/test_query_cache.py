@@ -0,0 +1,81 @@
+"""
+Pruebas de la invalidación de la caché de consultas (database/query_cache.py)
+
+    python -m pytest tests/test_query_cache.py
+"""
+
+import pytest
+
+import database.query_cache as query_cache_module
+from database.query_cache import QueryCache, cached_query
+
+
+class Clock:
+    """Reloj manual para time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_debounced_invalidation_is_deferred_not_dropped(clock):
+    cache = QueryCache(ttls={"general": 300})
+    cache.invalidate("answers", debounce=10)
+
+    # Resultado calculado justo después de la invalidación
+    clock.now += 1
+    cache.set("k", "antes", "general", ("answers",))
+
+    # Una respuesta dentro del intervalo queda pendiente: aún se sirve el resultado
+    clock.now += 1
+    cache.invalidate("answers", debounce=10)
+    assert cache.get("k", "general") == (True, "antes")
+
+    # Al acabar el intervalo se aplica aunque no llegue ninguna respuesta más
+    clock.now += 8
+    assert cache.get("k", "general") == (False, None)
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_debounce_window_restarts_after_deferred_invalidation(clock):
+    cache = QueryCache(ttls={"general": 300})
+    cache.invalidate("answers", debounce=10)
+    clock.now += 5
+    cache.invalidate("answers", debounce=10)     # Pendiente hasta +10
+    clock.now += 6
+    cache.set("k", "nuevo", "general", ("answers",))
+
+    # El siguiente intervalo cuenta desde la invalidación aplazada
+    clock.now += 1
+    cache.invalidate("answers", debounce=10)
+    assert cache.get("k", "general") == (True, "nuevo")
+    clock.now += 9
+    assert cache.get("k", "general") == (False, None)
+
+
+def test_invalidation_during_query_is_not_cached_as_fresh(monkeypatch):
+    cache = QueryCache(ttls={"general": 300})
+    monkeypatch.setattr(query_cache_module, "query_cache", cache)
+    calls = []
+
+    @cached_query("general", tags=("answers",))
+    def consulta():
+        calls.append(1)
+        if len(calls) == 1:
+            # Se registra una respuesta mientras la consulta lee datos antiguos
+            cache.invalidate("answers")
+        return len(calls)
+
+    assert consulta() == 1
+    assert consulta() == 2      # El primer resultado se guardó ya caducado
+    assert consulta() == 2
+    assert len(calls) == 2
@@ -0,0 +1,75 @@
+"""
+Pruebas del recuento de filas de InstrumentedCursor (database/query_metrics.py)
+con sqlite3, que como el cursor sin buffer de mysql-connector da rowcount = -1
+en los SELECT
+
+    python -m pytest tests/test_query_metrics.py
+"""
+
+import sqlite3
+
+import pytest
+
+from database.query_metrics import InstrumentedCursor, QueryMetrics
+
+
+@pytest.fixture
+def db():
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE answers (id INTEGER PRIMARY KEY, correct INTEGER)")
+    db.executemany("INSERT INTO answers (correct) VALUES (?)", [(i % 2,) for i in range(25)])
+    yield db
+    db.close()
+
+
+def row_counts(metrics, operation):
+    """(número de observaciones, suma de filas) del histograma de filas de la operación"""
+    for (_, op), histogram in metrics._rows.items():
+        if op == operation:
+            return histogram.count, histogram.sum
+    return 0, 0
+
+
+def test_select_rows_counted_on_fetchall(db):
+    metrics = QueryMetrics()
+    cursor = InstrumentedCursor(db.cursor(), metrics)
+    cursor.execute("SELECT id FROM answers WHERE correct = ?", (1,))
+    assert row_counts(metrics, "SELECT") == (0, 0)     # Aún no se ha leído nada
+
+    assert len(cursor.fetchall()) == 12
+    assert row_counts(metrics, "SELECT") == (1, 12)
+    cursor.close()
+    assert row_counts(metrics, "SELECT") == (1, 12)    # Cerrar no lo anota otra vez
+
+
+@pytest.mark.parametrize("read", [
+    lambda cursor: [row for row in cursor],
+    lambda cursor: list(iter(cursor.fetchone, None)),
+    lambda cursor: [r for rows in iter(lambda: cursor.fetchmany(10), []) for r in rows],
+])
+def test_select_rows_counted_when_exhausted(db, read):
+    metrics = QueryMetrics()
+    cursor = InstrumentedCursor(db.cursor(), metrics)
+    cursor.execute("SELECT id FROM answers", ())
+    assert len(read(cursor)) == 25
+    assert row_counts(metrics, "SELECT") == (1, 25)
+
+
+def test_partial_read_recorded_on_close_or_next_execute(db):
+    metrics = QueryMetrics()
+    cursor = InstrumentedCursor(db.cursor(), metrics)
+    cursor.execute("SELECT id FROM answers", ())
+    cursor.fetchone()
+    cursor.fetchone()
+    cursor.execute("SELECT id FROM answers LIMIT 3", ())
+    assert row_counts(metrics, "SELECT") == (1, 2)
+    cursor.fetchone()
+    cursor.close()
+    assert row_counts(metrics, "SELECT") == (2, 3)
+
+
+def test_dml_uses_rowcount(db):
+    metrics = QueryMetrics()
+    cursor = InstrumentedCursor(db.cursor(), metrics)
+    cursor.execute("UPDATE answers SET correct = 1 WHERE correct = 0", ())
+    assert row_counts(metrics, "UPDATE") == (1, 13)
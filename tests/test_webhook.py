@@ -0,0 +1,57 @@
+"""
+Pruebas de la comprobación del token secreto del webhook (handlers/webhook.py)
+
+    python -m pytest tests/test_webhook.py
+"""
+
+import threading
+
+import pytest
+
+from handlers.chat_dispatcher import ChatDispatcher
+from handlers.webhook import WebhookRuntime
+
+
+def make_update(update_id=1, chat_id=42, text="/start"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Prueba"},
+            "text": text,
+        },
+    }
+
+
+@pytest.fixture
+def runtime():
+    handled = threading.Event()
+    dispatcher = ChatDispatcher(shards=1)
+    webhook = WebhookRuntime(None, {"start": lambda message: handled.set()}, None, dispatcher,
+                             secret="s3creto")
+    webhook.handled = handled
+    yield webhook
+    dispatcher.shutdown()
+
+
+def test_requires_secret():
+    dispatcher = ChatDispatcher(shards=1)
+    for secret in (None, ""):
+        with pytest.raises(ValueError):
+            WebhookRuntime(None, {}, None, dispatcher, secret=secret)
+    dispatcher.shutdown()
+
+
+def test_rejects_missing_or_wrong_secret(runtime):
+    assert runtime.handle(make_update(), None) == (403, {})
+    assert runtime.handle(make_update(), "otro") == (403, {})
+    assert runtime.stats()["recibidas"] == 0
+    assert not runtime.handled.is_set()
+
+
+def test_accepts_correct_secret(runtime):
+    assert runtime.handle(make_update(), "s3creto") == (200, {})
+    assert runtime.handled.wait(5)
+    assert runtime.stats()["encoladas"] == 1
@@ -0,0 +1,130 @@
+"""
+Benchmark de las métricas derivadas de participantes
+
+Genera N estudiantes sintéticos con la misma forma que devuelve la consulta de
+get_datos_participantes, calcula las métricas con la versión anterior (apply
+fila a fila) y con calcular_metricas_participantes (por columnas), comprueba que
+el resultado es idéntico y muestra los tiempos.
+
+Uso (desde la raíz del repositorio):
+    python -m tools.bench_participantes --students 100000
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dashboard.data.participantes_queries import (
+    calcular_metricas_participantes,
+    calcular_progreso,
+    calcular_nivel_actividad
+)
+
+
+def generar_participantes(n, total_preguntas, seed=42):
+    """DataFrame sintético con las columnas de la consulta de participantes"""
+    rng = np.random.default_rng(seed)
+    hoy = date(2025, 6, 1)
+
+    sin_comenzar = rng.random(n) < 0.15
+    respondidas = np.where(sin_comenzar, 0, rng.integers(1, total_preguntas + 20, n))
+    total_primero = respondidas
+    aciertos_primero = (total_primero * rng.random(n)).astype(int)
+    total_segundo = (respondidas * rng.random(n)).astype(int)
+    aciertos_segundo = (total_segundo * rng.random(n)).astype(int)
+    retiradas = (respondidas * rng.random(n) * 0.5).astype(int)
+    intentos = respondidas + total_segundo
+
+    inicio = rng.integers(0, 365, n)
+    duracion = rng.integers(0, 200, n)
+    primera = [None if s else hoy - timedelta(days=int(i)) for s, i in zip(sin_comenzar, inicio)]
+    ultima = [None if s else min(hoy, p + timedelta(days=int(d))) for s, p, d in zip(sin_comenzar, primera, duracion)]
+    dias_inactivo = [None if u is None else (hoy - u).days for u in ultima]
+
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "nombre": [f"Estudiante {i}" for i in range(n)],
+        "email": [f"e{i}@alumno.uned.es" for i in range(n)],
+        "preguntas_respondidas": respondidas,
+        "preguntas_retiradas": retiradas,
+        "total_intentos": intentos,
+        "aciertos_primer_intento": aciertos_primero,
+        "total_primer_intento": total_primero,
+        "aciertos_segundo_intento": aciertos_segundo,
+        "total_segundo_intento": total_segundo,
+        "ultima_actividad": ultima,
+        "primera_actividad": primera,
+        "dias_inactivo": dias_inactivo,
+    })
+
+
+def metricas_fila_a_fila(df, total_preguntas):
+    """Implementación anterior de get_datos_participantes (DataFrame.apply con axis=1)"""
+    df['progreso'] = df.apply(lambda row: calcular_progreso(
+        row['preguntas_respondidas'],
+        total_preguntas,
+        row['dias_inactivo']
+    ), axis=1)
+
+    df['actividad'] = df.apply(lambda row: calcular_nivel_actividad(
+        row['preguntas_respondidas'],
+        total_preguntas,
+        row['primera_actividad'],
+        row['ultima_actividad']
+    ), axis=1)
+
+    df['porcentaje_primer_intento'] = df.apply(
+        lambda x: round((x['aciertos_primer_intento'] / x['total_primer_intento']) * 100, 1)
+        if x['total_primer_intento'] > 0 else 0,
+        axis=1
+    )
+
+    df['porcentaje_segundo_intento'] = df.apply(
+        lambda x: round((x['aciertos_segundo_intento'] / x['total_segundo_intento']) * 100, 1)
+        if x['total_segundo_intento'] > 0 else 0,
+        axis=1
+    )
+
+    df['diferencia_porcentajes'] = df['porcentaje_segundo_intento'] - df['porcentaje_primer_intento']
+    df['porcentaje_completado'] = (df['preguntas_respondidas'] / total_preguntas * 100).round(1)
+    df['porcentaje_retiradas'] = (df['preguntas_retiradas'] / total_preguntas * 100).round(1)
+    df['total_preguntas'] = total_preguntas
+    return df
+
+
+def medir(fn, df, total_preguntas, repeticiones):
+    mejor = float("inf")
+    resultado = None
+    for _ in range(repeticiones):
+        copia = df.copy()
+        inicio = time.perf_counter()
+        resultado = fn(copia, total_preguntas)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de métricas de participantes")
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=120, help="Preguntas activas")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = generar_participantes(args.students, args.questions)
+    print(f"{len(df)} participantes sintéticos, {args.questions} preguntas activas")
+
+    t_fila, esperado = medir(metricas_fila_a_fila, df, args.questions, 1)
+    t_col, obtenido = medir(calcular_metricas_participantes, df, args.questions, args.repeat)
+
+    pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=False)
+    print("Resultado idéntico a la versión fila a fila: OK")
+    print(f"Fila a fila (apply):  {t_fila * 1000:9.1f} ms")
+    print(f"Por columnas:         {t_col * 1000:9.1f} ms")
+    print(f"Aceleración:          {t_fila / t_col:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
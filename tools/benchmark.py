@@ -0,0 +1,324 @@
+"""
+Benchmark de extremo a extremo del bot y del dashboard
+
+Ejecuta los manejadores del bot (handle_jugar, callback_response,
+handle_posicion, handle_visionado, handle_promocion) con un bot falso que no
+llama a Telegram, y todas las funciones de consulta del dashboard, contra el
+MySQL configurado en config.py. Para cada operación registra las latencias
+(p50/p95/p99) y las consultas SQL por llamada (diferencia del contador global
+Questions de MySQL, así que la base de datos debe estar dedicada a la prueba).
+
+Los resultados se guardan como línea base en tools/baselines/<escala>.json y
+las ejecuciones siguientes se comparan con ella: una operación empeora si su
+p95 crece más de --tolerance o si hace más consultas que antes.
+
+Las partidas registran respuestas y pueden promocionar estudiantes, así que
+para comparar con una línea base hay que regenerar antes los datos:
+    python -m tools.generate_dataset --scale 10k --create-schema
+    python -m tools.benchmark --scale 10k --save-baseline
+    python -m tools.generate_dataset --scale 10k
+    python -m tools.benchmark --scale 10k
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import database.query_cache as query_cache_module
+from database.db_connection import db_connection
+from tools.load_test import percentile
+
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+MAX_ANSWERS_PER_GAME = 10
+
+
+# ---------- Bot falso ----------
+
+class StubBot:
+    """Bot con la interfaz de telebot que solo cuenta los mensajes enviados"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.sent = 0
+        self.last_message_id = {}
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+        message_id = next(self._ids)
+        self.last_message_id[chat_id] = message_id
+        return SimpleNamespace(message_id=message_id, chat=SimpleNamespace(id=chat_id), text=text)
+
+    def edit_message_text(self, *args, **kwargs):
+        self.sent += 1
+
+    def edit_message_reply_markup(self, *args, **kwargs):
+        self.sent += 1
+
+    def delete_message(self, *args, **kwargs):
+        self.sent += 1
+
+    def answer_callback_query(self, *args, **kwargs):
+        self.sent += 1
+
+
+def make_message(chat_id, text):
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=0, text=text,
+                           from_user=SimpleNamespace(id=chat_id))
+
+
+def make_call(chat_id, data, message_id):
+    return SimpleNamespace(id=str(message_id), data=data,
+                           message=SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=message_id))
+
+
+# ---------- Medición ----------
+
+class Recorder:
+    """Latencias y consultas por operación"""
+
+    def __init__(self):
+        self.samples = {}
+        self._status_db = db_connection()
+
+    def questions(self):
+        cursor = self._status_db.cursor()
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+        value = int(cursor.fetchone()[1])
+        cursor.close()
+        return value
+
+    def measure(self, name, fn, *args):
+        before = self.questions()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn(*args)
+        elapsed = time.perf_counter() - start
+        # La propia consulta SHOW STATUS cuenta como una
+        queries = self.questions() - before - 1
+        self.samples.setdefault(name, []).append((elapsed, queries))
+        return result
+
+    def summary(self):
+        results = {}
+        for name, samples in sorted(self.samples.items()):
+            latencies = [elapsed * 1000 for elapsed, _ in samples]
+            queries = sorted(q for _, q in samples)
+            results[name] = {
+                "n": len(samples),
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+                "p99_ms": round(percentile(latencies, 99), 3),
+                "max_ms": round(max(latencies), 3),
+                "queries": queries[len(queries) // 2],
+            }
+        return results
+
+    def close(self):
+        self._status_db.close()
+
+
+# ---------- Escenarios ----------
+
+def sample_chats(n, seed):
+    """chat_id de estudiantes activos elegidos al azar (con semilla)"""
+    db = db_connection()
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT DISTINCT s.cid FROM students s
+        JOIN student_subject ss ON ss.id_student = s.id
+        WHERE ss.state = 'A'
+    """)
+    chats = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    db.close()
+    random.Random(seed).shuffle(chats)
+    return chats[:n]
+
+
+def _with_db(handler):
+    """Igual que los manejadores de bot.py: una conexión del pool por mensaje"""
+    def run(bot, update):
+        db = db_connection()
+        try:
+            handler(bot, update, db)
+        finally:
+            db.close()
+    return run
+
+
+def run_bot(recorder, chats):
+    from handlers.start_handler import handle_jugar, quiz_sessions
+    from handlers.callback_handler import callback_response
+    from handlers.posicion_handler import handle_posicion
+    from handlers.visionado_handler import handle_visionado
+    from handlers.promocion_handler import handle_promocion
+
+    bot = StubBot()
+    jugar = _with_db(handle_jugar)
+    for chat_id in chats:
+        recorder.measure("bot.misnumeros", _with_db(handle_visionado), bot, make_message(chat_id, "/misnumeros"))
+        recorder.measure("bot.clasificacion", _with_db(handle_posicion), bot, make_message(chat_id, "/clasificacion"))
+
+        # Partida: /jugar, confirmación y respuestas hasta terminar (o MAX_ANSWERS_PER_GAME)
+        recorder.measure("bot.jugar", jugar, bot, make_message(chat_id, "/jugar"))
+        if chat_id not in quiz_sessions:
+            continue
+        confirm = make_call(chat_id, f"confirmar_jugar_{chat_id}", bot.last_message_id[chat_id])
+        recorder.measure("bot.confirmar", callback_response, bot, confirm)
+        for _ in range(MAX_ANSWERS_PER_GAME):
+            session = quiz_sessions.get(chat_id)
+            if session is None or session.estado != "jugando":
+                break
+            answer = make_call(chat_id, random.choice("1234"), session.message_id)
+            recorder.measure("bot.respuesta", callback_response, bot, answer)
+        if chat_id in quiz_sessions:
+            del quiz_sessions[chat_id]
+
+        recorder.measure("bot.promocion", _with_db(handle_promocion), bot, make_message(chat_id, "/promocion"))
+
+
+def dashboard_queries(student_id):
+    """(nombre, función, argumentos) de todas las consultas de lectura del dashboard"""
+    from dashboard.data import (actividad_queries, crud_queries, data_query, estudiantes_queries,
+                                general_queries, participantes_queries, periodo_analytics,
+                                preguntas_queries)
+
+    today = date.today()
+    return [
+        ("general.actividad_mensual_anual", general_queries.get_actividad_mensual_anual, ()),
+        ("general.resumen_general", general_queries.get_resumen_general, ()),
+        ("general.top_asignaturas", general_queries.get_top_asignaturas, ()),
+        ("general.evolucion_ultima_semana", general_queries.get_evolucion_diaria_ultima_semana, ()),
+        ("general.progreso_estudiantes", data_query.progreso_estudiantes, ()),
+        ("participantes.datos", participantes_queries.get_datos_participantes, ()),
+        ("participantes.pagina_sql", participantes_queries.get_pagina_participantes,
+         (0, 15, (("preguntas_respondidas", "desc"),), "")),
+        ("participantes.pagina_pandas", participantes_queries.get_pagina_participantes,
+         (0, 15, (("progreso", "asc"),), "")),
+        ("participantes.resumen", participantes_queries.get_resumen_participantes, ()),
+        ("participantes.distribucion", participantes_queries.get_distribucion_actividad, ()),
+        ("participantes.top", participantes_queries.get_top_participantes, ()),
+        ("preguntas.estadisticas", preguntas_queries.get_estadisticas_preguntas, ()),
+        ("preguntas.pagina_sql", preguntas_queries.get_pagina_preguntas, (0, 20, (("total_intentos", "desc"),), "")),
+        ("preguntas.resumen", preguntas_queries.get_resumen_preguntas, ()),
+        ("preguntas.por_asignatura", preguntas_queries.get_preguntas_por_asignatura, ()),
+        ("preguntas.top", preguntas_queries.get_top_preguntas_faciles_dificiles, ()),
+        ("actividad.periodo", periodo_analytics.analizar_periodo, (today.month, today.year)),
+        ("actividad.comparacion_meses", actividad_queries.get_comparacion_meses, ()),
+        ("estudiantes.pendientes", estudiantes_queries.get_estudiantes_pendientes, ()),
+        ("estudiantes.activos", estudiantes_queries.get_estudiantes_activos, ()),
+        ("estudiantes.estadisticas", estudiantes_queries.get_estadisticas_estudiantes, ()),
+        ("estudiantes.historial", estudiantes_queries.get_historial_estudiante, (student_id,)),
+        ("crud.asignaturas", crud_queries.get_all_subjects, ()),
+        ("crud.preguntas_asignatura", crud_queries.get_questions_by_subject, (1,)),
+    ]
+
+
+def run_dashboard(recorder, iterations, student_id):
+    for _ in range(iterations):
+        for name, fn, args in dashboard_queries(student_id):
+            recorder.measure("dashboard." + name, fn, *args)
+
+
+# ---------- Líneas base ----------
+
+def baseline_path(scale):
+    return os.path.join(BASELINE_DIR, f"{scale}.json")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Operaciones que empeoran respecto a la línea base
+
+    Returns:
+        list: [(operación, motivo)]
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("resultados", {}).get(name)
+        if previous is None:
+            continue
+        # Se ignoran diferencias de menos de 1 ms (ruido en operaciones muy rápidas)
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance) and current["p95_ms"] - previous["p95_ms"] > 1:
+            regressions.append((name, f"p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms"))
+        if current["queries"] > previous["queries"]:
+            regressions.append((name, f"consultas {previous['queries']} -> {current['queries']}"))
+    return regressions
+
+
+def print_results(results):
+    print(f"{'operación':42s} {'n':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'consultas':>9s}")
+    for name, r in results.items():
+        print(f"{name:42s} {r['n']:5d} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} {r['queries']:9d}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark del bot y del dashboard")
+    parser.add_argument("--scale", default="10k", help="Nombre de la línea base (escala de los datos)")
+    parser.add_argument("--chats", type=int, default=200, help="Estudiantes que juegan una partida")
+    parser.add_argument("--dashboard-iterations", type=int, default=5)
+    parser.add_argument("--cache", action="store_true", help="Deja activa la caché de consultas del dashboard")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Aumento de p95 permitido (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv[1:])
+
+    random.seed(args.seed)
+    if not args.cache:
+        query_cache_module.QUERY_CACHE_ENABLED = False
+
+    chats = sample_chats(args.chats, args.seed)
+    if not chats:
+        print("No hay estudiantes activos: genere antes los datos con tools.generate_dataset")
+        return 2
+
+    db = db_connection()
+    cursor = db.cursor()
+    cursor.execute("SELECT id FROM students WHERE cid = %s", (chats[0],))
+    student_id = cursor.fetchone()[0]
+    cursor.close()
+    db.close()
+
+    recorder = Recorder()
+    try:
+        run_bot(recorder, chats)
+        run_dashboard(recorder, args.dashboard_iterations, student_id)
+    finally:
+        recorder.close()
+
+    results = recorder.summary()
+    print_results(results)
+
+    path = baseline_path(args.scale)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"escala": args.scale, "fecha": date.today().isoformat(), "chats": len(chats),
+                       "cache": args.cache, "resultados": results}, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en {path}")
+        return 0
+
+    if not os.path.exists(path):
+        print(f"Sin línea base en {path} (use --save-baseline)")
+        return 0
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for name, reason in regressions:
+        print(f"EMPEORA {name}: {reason}")
+    print(f"{len(regressions)} operaciones empeoran respecto a {path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
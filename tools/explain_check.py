@@ -0,0 +1,220 @@
+"""
+Comprobación con EXPLAIN de las consultas del bot y del dashboard
+
+Extrae (con ast, sin importar los módulos) las consultas SQL literales de
+database/db_sql.py y dashboard/data/*.py, las ejecuta con EXPLAIN contra el
+MySQL configurado en config.py y marca las que recorren una tabla entera
+(type ALL o index) sobre una tabla grande.
+
+Las consultas de database/db_sql.py son calientes (se ejecutan por mensaje del
+bot) salvo las de COLD_FUNCTIONS; un recorrido completo en ellas, o que EXPLAIN
+no pueda analizarlas (SQL inválido, parámetros que no encajan), hace fallar la
+comprobación. Las del dashboard solo se informan, salvo con --strict.
+
+El optimizador prefiere recorrer tablas pequeñas aunque haya índice, así que la
+base de datos tiene que estar poblada (y con las migraciones aplicadas):
+    python -m database.migrations migrate
+    python -m tools.explain_check
+    python -m tools.explain_check --list          # solo muestra las consultas extraídas
+    python -m tools.explain_check --strict        # también falla por las del dashboard
+"""
+
+import argparse
+import ast
+import glob
+import os
+import re
+import sys
+from datetime import date
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HOT_FILES = ["database/db_sql.py"]
+DASHBOARD_FILES = sorted(
+    os.path.relpath(path, ROOT) for path in glob.glob(os.path.join(ROOT, "dashboard", "data", "*.py"))
+    if not path.endswith("__init__.py")
+)
+
+# Funciones de db_sql.py que leen tablas completas a propósito (carga del banco, clasificación)
+COLD_FUNCTIONS = {"load_questions", "query_ranking", "get_ranking", "get_ranking_top", "register_student"}
+
+# Tablas pequeñas por diseño: recorrerlas no es un problema
+SMALL_TABLES = {"subject", "dashboard_users", "password_reset_tokens"}
+
+SQL_START = re.compile(r"^\s*(SELECT|UPDATE|DELETE|INSERT\s+INTO\s+\w+\s*(\([^)]*\))?\s*SELECT|WITH)\b", re.I | re.S)
+TEXT_COLUMNS = re.compile(r"(name|email|state|status|view_mode|token|username|password|question)\W*\s*(=|<>|!=|LIKE)\s*$", re.I)
+DATE_COLUMNS = re.compile(r"(date|fecha|actividad|_at)\W*\s*(=|<>|!=|<|<=|>|>=|BETWEEN|AND)\s*$", re.I)
+
+
+class Query:
+    """Consulta extraída del código"""
+
+    def __init__(self, path, line, function, sql):
+        self.path = path
+        self.line = line
+        self.function = function
+        self.sql = sql
+
+    @property
+    def hot(self):
+        return self.path in HOT_FILES and self.function not in COLD_FUNCTIONS
+
+    def __str__(self):
+        return f"{self.path}:{self.line} {self.function}()"
+
+
+# ---------- Extracción ----------
+
+def _module_constants(tree):
+    """Constantes de texto de nivel de módulo (para resolver f-strings como f"SELECT {_SELECT}")"""
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    constants[target.id] = node.value.value
+    return constants
+
+
+def _resolve(node, constants):
+    """Texto de un literal o f-string; None si depende de valores que solo existen al ejecutar"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value, ast.FormattedValue) and isinstance(value.value, ast.Name) \
+                    and value.value.id in constants:
+                parts.append(constants[value.value.id])
+            else:
+                return None
+        return "".join(parts)
+    return None
+
+
+def extract_queries(path):
+    """Consultas SQL literales de un fichero con la función que las contiene"""
+    with open(os.path.join(ROOT, path), encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    constants = _module_constants(tree)
+
+    queries = []
+    for function in ast.walk(tree):
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        nodes = list(ast.walk(function))
+        # Los trozos literales de un f-string no son consultas por sí mismos
+        pieces = {id(value) for node in nodes if isinstance(node, ast.JoinedStr) for value in node.values}
+        for node in nodes:
+            if not isinstance(node, (ast.Constant, ast.JoinedStr)) or id(node) in pieces:
+                continue
+            sql = _resolve(node, constants)
+            if sql and SQL_START.match(sql):
+                queries.append(Query(path, node.lineno, function.name, sql.strip()))
+
+    # Una consulta dentro de una función anidada aparece también en la exterior
+    unique = {}
+    for query in queries:
+        unique.setdefault((query.line, query.sql), query)
+    return sorted(unique.values(), key=lambda q: q.line)
+
+
+def sample_params(sql):
+    """Valores de ejemplo para cada %s, según la columna con la que se comparan"""
+    params = []
+    for match in re.finditer(r"%s", sql):
+        before = sql[:match.start()]
+        if TEXT_COLUMNS.search(before):
+            params.append("A")
+        elif DATE_COLUMNS.search(before):
+            params.append(date.today())
+        else:
+            params.append(1)
+    return tuple(params)
+
+
+# ---------- EXPLAIN ----------
+
+def explain(db, query):
+    """Filas de EXPLAIN de la consulta (lista de dicts)"""
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + query.sql, sample_params(query.sql))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def full_scans(plan, min_rows):
+    """Tablas que el plan recorre enteras con al menos min_rows filas estimadas"""
+    scans = []
+    for row in plan:
+        table = row.get("table") or ""
+        if not table or table.startswith("<") or table in SMALL_TABLES:
+            continue  # Tablas derivadas, uniones y tablas pequeñas
+        if row.get("type") in ("ALL", "index") and (row.get("rows") or 0) >= min_rows:
+            scans.append((table, row.get("type"), row.get("rows")))
+    return scans
+
+
+def check(db, queries, min_rows, strict=False):
+    """
+    Ejecuta EXPLAIN sobre cada consulta y muestra el resultado
+
+    Las consultas que EXPLAIN no puede analizar cuentan igual que un recorrido completo
+
+    Returns:
+        int: Consultas que hacen fallar la comprobación
+    """
+    failures = 0
+    for query in queries:
+        fails = query.hot or strict
+        try:
+            plan = explain(db, query)
+        except Exception as e:
+            failures += fails
+            print(f"{'FALLO ' if fails else 'AVISO '} {query}: EXPLAIN falló: {e}")
+            continue
+        scans = full_scans(plan, min_rows)
+        if not scans:
+            print(f"OK     {query}")
+            continue
+        failures += fails
+        detail = ", ".join(f"{table} ({kind}, ~{rows} filas)" for table, kind, rows in scans)
+        print(f"{'FALLO ' if fails else 'AVISO '} {query}: recorrido completo de {detail}")
+    return failures
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="EXPLAIN de las consultas del bot y del dashboard")
+    parser.add_argument("--list", action="store_true", help="Solo lista las consultas extraídas")
+    parser.add_argument("--strict", action="store_true", help="Falla también por las consultas del dashboard")
+    parser.add_argument("--min-rows", type=int, default=1000,
+                        help="Filas estimadas a partir de las que un recorrido completo cuenta")
+    args = parser.parse_args(argv[1:])
+
+    queries = [query for path in HOT_FILES + DASHBOARD_FILES for query in extract_queries(path)]
+
+    if args.list:
+        for query in queries:
+            print(f"{'[caliente] ' if query.hot else ''}{query}")
+            print("    " + " ".join(query.sql.split())[:200])
+        print(f"{len(queries)} consultas")
+        return 0
+
+    from database.db_connection import db_connection
+
+    db = db_connection()
+    try:
+        failures = check(db, queries, args.min_rows, args.strict)
+    finally:
+        db.close()
+    print(f"{len(queries)} consultas, {failures} con recorridos completos o errores no permitidos")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
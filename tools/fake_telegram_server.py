@@ -0,0 +1,217 @@
+"""
+Servidor falso de la Bot API de Telegram para pruebas de carga locales
+
+Implementa lo mínimo que usan telebot y python-telegram-bot:
+getMe, getUpdates (long polling), sendMessage, editMessageText,
+editMessageReplyMarkup, deleteMessage, answerCallbackQuery y cualquier otro
+método respondiendo {"ok": true}. Registra el instante de cada llamada por chat
+para poder medir latencias extremo a extremo.
+
+Uso:
+    server = FakeTelegramServer(latency=0.05)
+    server.start()
+    server.push_command(chat_id=1, text="/ayuda")
+    ...
+    server.stop()
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeTelegramServer:
+    """
+    Bot API de Telegram en memoria servida por HTTP
+
+    Args:
+        host: Interfaz de escucha
+        port: Puerto (0 = puerto libre aleatorio)
+        latency: Segundos de retardo artificial en los métodos de envío
+    """
+
+    SEND_METHODS = {
+        "sendMessage", "editMessageText", "editMessageReplyMarkup",
+        "deleteMessage", "answerCallbackQuery"
+    }
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.latency = latency
+        self._lock = threading.Condition()
+        self._updates = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self.calls = []              # (instante, método, chat_id)
+        self.pushed_at = {}          # update_id -> instante en que se encoló
+        self.update_chat = {}        # update_id -> chat_id
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._dispatch()
+
+            def do_POST(self):
+                self._dispatch()
+
+            def _dispatch(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                if body and "json" in content_type:
+                    params.update(json.loads(body))
+                elif body and "form-urlencoded" in content_type:
+                    params.update({k: v[0] for k, v in parse_qs(body.decode()).items()})
+
+                method = url.path.rsplit("/", 1)[-1]
+                result = server.handle(method, params)
+                payload = json.dumps({"ok": True, "result": result}).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # ---------- Inyección de actualizaciones ----------
+
+    def push_command(self, chat_id, text):
+        """Encola un mensaje de texto (p. ej. '/jugar') de un chat"""
+        return self._push({
+            "message": self._message(chat_id, text)
+        }, chat_id)
+
+    def push_callback(self, chat_id, data, message_id=1):
+        """Encola la pulsación de un botón inline"""
+        message = self._message(chat_id, "pregunta", message_id=message_id)
+        message["from"]["is_bot"] = True
+        return self._push({
+            "callback_query": {
+                "id": str(self._next_update_id),
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+                "chat_instance": str(chat_id),
+                "message": message,
+                "data": data
+            }
+        }, chat_id)
+
+    def make_update(self, chat_id, text):
+        """Construye (sin encolar) una actualización de texto, para webhooks"""
+        with self._lock:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            self.pushed_at[update_id] = time.perf_counter()
+            self.update_chat[update_id] = chat_id
+        return {"update_id": update_id, "message": self._message(chat_id, text)}
+
+    def _push(self, update, chat_id):
+        with self._lock:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            update["update_id"] = update_id
+            self.pushed_at[update_id] = time.perf_counter()
+            self.update_chat[update_id] = chat_id
+            self._updates.append(update)
+            self._lock.notify_all()
+        return update_id
+
+    def _message(self, chat_id, text, message_id=None):
+        entities = []
+        if text.startswith("/"):
+            entities.append({"type": "bot_command", "offset": 0, "length": len(text.split()[0])})
+        return {
+            "message_id": message_id or 1,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+            "text": text,
+            "entities": entities
+        }
+
+    # ---------- Métodos de la Bot API ----------
+
+    def handle(self, method, params):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "TrivialUNED", "username": "trivial_bot",
+                    "can_join_groups": False, "can_read_all_group_messages": False,
+                    "supports_inline_queries": False}
+
+        if method == "getUpdates":
+            return self._get_updates(params)
+
+        if method in self.SEND_METHODS:
+            if self.latency:
+                time.sleep(self.latency)
+            chat_id = params.get("chat_id")
+            with self._lock:
+                self.calls.append((time.perf_counter(), method, int(chat_id) if chat_id else None))
+                message_id = self._next_message_id
+                self._next_message_id += 1
+            if method in ("sendMessage", "editMessageText"):
+                return {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": int(chat_id or 0), "type": "private"},
+                    "text": params.get("text", "")
+                }
+            return True
+
+        return True
+
+    def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        deadline = time.monotonic() + min(timeout, 1.0)
+        with self._lock:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._lock.wait(deadline - time.monotonic())
+            return list(self._updates[:100])
+
+    # ---------- Métricas ----------
+
+    def first_reply_latencies(self):
+        """
+        Latencia de cada actualización: desde que se encola hasta la primera
+        llamada de envío a su chat (requiere un chat distinto por actualización)
+
+        Returns:
+            list: Latencias en segundos de las actualizaciones respondidas
+        """
+        first_call = {}
+        with self._lock:
+            for ts, _, chat_id in self.calls:
+                if chat_id is not None and chat_id not in first_call:
+                    first_call[chat_id] = ts
+            return [
+                first_call[self.update_chat[uid]] - pushed
+                for uid, pushed in self.pushed_at.items()
+                if self.update_chat[uid] in first_call
+            ]
@@ -0,0 +1,314 @@
+"""
+Generador de datos sintéticos para pruebas de carga y benchmarks
+
+Rellena subject, questions, students, student_subject y student_question con
+datos de forma realista:
+    - las preguntas se numeran por asignatura y se reparten por niveles
+    - ~15% de los estudiantes se registran y no llegan a jugar, un ~5% queda
+      pendiente de aprobación y otro ~3% dado de baja
+    - la actividad sigue una distribución de cola larga (pocos estudiantes
+      responden casi todo y la mayoría unas decenas de preguntas)
+    - la probabilidad de acierto depende de la habilidad del estudiante y de la
+      dificultad de la pregunta; las fechas se reparten en una ventana de días
+      con más actividad entre semana
+
+Después aplica las migraciones (índices y tablas de resumen) y recalcula
+student_stats, question_stats y las tablas diarias.
+
+BORRA el contenido de esas tablas: úsese solo contra una base de datos de
+pruebas (por ejemplo un contenedor MySQL local configurado en config.py).
+Con --create-schema crea antes las tablas base con las columnas que usa el
+código, para partir de una base de datos vacía.
+
+Uso (desde la raíz del repositorio):
+    python -m tools.generate_dataset --scale 10k --create-schema
+    python -m tools.generate_dataset --students 2500 --subjects 2 --days 120
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from database.db_connection import db_connection
+
+
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000}
+
+BATCH_SIZE = 5000
+
+# Esquema mínimo de las tablas base (solo para bases de datos de pruebas vacías)
+BASE_SCHEMA_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS subject (
+        id INT NOT NULL PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        faculty VARCHAR(200) NULL,
+        num_success INT NOT NULL DEFAULT 2,
+        status CHAR(1) NOT NULL DEFAULT 'A'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS questions (
+        id INT NOT NULL,
+        id_subject INT NOT NULL,
+        state CHAR(1) NOT NULL DEFAULT 'A',
+        level INT NOT NULL DEFAULT 1,
+        question TEXT NOT NULL,
+        solution INT NOT NULL,
+        why TEXT NULL,
+        answer1 VARCHAR(500) NOT NULL,
+        answer2 VARCHAR(500) NOT NULL,
+        answer3 VARCHAR(500) NULL,
+        answer4 VARCHAR(500) NULL,
+        PRIMARY KEY (id_subject, id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS students (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        cid BIGINT NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        email VARCHAR(200) NOT NULL,
+        view_mode CHAR(1) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS student_subject (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        id_student INT NOT NULL,
+        id_subject INT NOT NULL,
+        state CHAR(1) NOT NULL DEFAULT 'P',
+        level INT NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS student_question (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        id_student INT NOT NULL,
+        id_question INT NOT NULL,
+        mistake_number INT NOT NULL DEFAULT 0,
+        num_attempts INT NOT NULL DEFAULT 0,
+        first_attempt TINYINT NOT NULL DEFAULT 0,
+        second_attempt TINYINT NOT NULL DEFAULT 0,
+        first_attempt_date DATE NULL,
+        last_attempt_date DATE NULL
+    )
+    """,
+]
+
+# Tablas que se vacían antes de generar (en orden de dependencias)
+TABLES = ["student_question", "student_subject", "students", "questions", "subject"]
+
+# Primer chat_id sintético (lejos de los chats reales de Telegram)
+CID_BASE = 9_000_000_000
+
+
+def _insert_many(db, query, rows):
+    """Inserta las filas (lista o generador) en bloques de BATCH_SIZE; devuelve cuántas"""
+    cursor = db.cursor()
+    total = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                cursor.executemany(query, batch)
+                db.commit()
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(query, batch)
+            db.commit()
+            total += len(batch)
+    finally:
+        cursor.close()
+    return total
+
+
+def generate_subjects(n_subjects):
+    return [(i, f"Asignatura {i}", f"Facultad {1 + (i - 1) % 3}", 2, "A") for i in range(1, n_subjects + 1)]
+
+
+def generate_questions(rng, n_subjects, per_level, levels):
+    """Preguntas numeradas por asignatura; devuelve las filas y la dificultad de cada id"""
+    rows = []
+    difficulty = {}
+    for subject_id in range(1, n_subjects + 1):
+        question_id = 0
+        for level in range(1, levels + 1):
+            for _ in range(per_level):
+                question_id += 1
+                four = rng.random() < 0.7
+                rows.append((
+                    question_id, subject_id, "A" if rng.random() > 0.03 else "I", level,
+                    f"Pregunta {question_id} de la asignatura {subject_id} (nivel {level})",
+                    int(rng.integers(1, 5 if four else 3)),
+                    f"Explicación de la pregunta {question_id}",
+                    "Opción A", "Opción B",
+                    "Opción C" if four else None,
+                    "Opción D" if four else None,
+                ))
+                # Más difíciles en los niveles altos
+                difficulty[question_id] = float(np.clip(rng.normal(0.25 + 0.12 * level, 0.15), 0.02, 0.95))
+    return rows, difficulty
+
+
+def generate_students(rng, n_students):
+    rows = []
+    for i in range(n_students):
+        rows.append((CID_BASE + i, f"Estudiante {i + 1}", f"estudiante{i + 1}@alumno.uned.es",
+                     "2" if rng.random() < 0.2 else "1"))
+    return rows
+
+
+def student_profiles(rng, student_ids, n_questions):
+    """
+    Estado, preguntas respondidas y nivel de cada estudiante
+
+    Returns:
+        dict: {id_student: (estado, preguntas respondidas, nivel)}
+    """
+    n = len(student_ids)
+    states = rng.choice(["A", "P", "B"], size=n, p=[0.92, 0.05, 0.03])
+    never_played = rng.random(n) < 0.15
+    # Cola larga: la mediana responde unas decenas de preguntas
+    answered = np.minimum(n_questions, rng.lognormal(3.3, 1.0, n).astype(int) + 1)
+    answered = np.where((states != "A") | never_played, 0, answered)
+    levels = 1 + (answered > 40).astype(int) + (answered > 80).astype(int)
+    return {
+        student_id: (str(state), int(count), int(level))
+        for student_id, state, count, level in zip(student_ids, states, answered, levels)
+    }
+
+
+def generate_answers(rng, profiles, difficulty, days, today):
+    """Genera (en orden de estudiante) las filas de student_question"""
+    ids = np.array(sorted(difficulty))
+    weekdays_weight = np.array([1.0, 1.0, 1.0, 1.0, 0.9, 0.5, 0.4])
+
+    for student_id, (_, count, _) in profiles.items():
+        if count == 0:
+            continue
+        skill = rng.beta(5, 3)
+        start_offset = int(rng.integers(0, days))
+        window = max(1, days - start_offset)
+        # Casi siempre se responden primero las preguntas de los niveles bajos (ids bajos)
+        chosen = ids[:count] if rng.random() < 0.7 else rng.choice(ids, size=count, replace=False)
+        for question_id in chosen:
+            p = float(np.clip(skill * (1 - difficulty[int(question_id)]) * 1.6, 0.05, 0.97))
+            first = rng.random() < p
+            attempts = 1 if first and rng.random() < 0.5 else 1 + int(rng.integers(1, 4))
+            second = bool(attempts > 1 and rng.random() < min(0.98, p + 0.15))
+            mistakes = int(not first) + int(np.sum(rng.random(attempts - 1) >= p))
+
+            # Menos actividad en fin de semana
+            first_day = today - timedelta(days=start_offset + int(rng.integers(0, window)))
+            while rng.random() > weekdays_weight[first_day.weekday()]:
+                first_day -= timedelta(days=1)
+            last_day = min(today, first_day + timedelta(days=int(rng.integers(0, 30)) if attempts > 1 else 0))
+            yield (int(student_id), int(question_id), mistakes, attempts,
+                   int(first), int(second), first_day, last_day)
+
+
+def create_schema(db):
+    cursor = db.cursor()
+    for ddl in BASE_SCHEMA_DDL:
+        cursor.execute(ddl)
+    cursor.close()
+
+
+def reset_tables(db):
+    cursor = db.cursor()
+    for table in TABLES:
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.close()
+
+
+def generate(db, n_students, n_subjects=1, per_level=40, levels=3, days=180, seed=42):
+    """Genera el conjunto de datos completo; devuelve el número de filas por tabla"""
+    from database.migrations import ensure_schema
+    from database.student_stats import rebuild_student_stats
+    from database.question_stats import rebuild_question_stats
+    from database.daily_activity import rebuild_daily_activity
+
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    reset_tables(db)
+    # Índices y tablas de resumen (vacías) antes de cargar los datos
+    ensure_schema(db)
+
+    subjects = generate_subjects(n_subjects)
+    _insert_many(db, "INSERT INTO subject (id, name, faculty, num_success, status) VALUES (%s, %s, %s, %s, %s)",
+                 subjects)
+
+    questions, difficulty = generate_questions(rng, n_subjects, per_level, levels)
+    _insert_many(db, """
+        INSERT INTO questions (id, id_subject, state, level, question, solution, why, answer1, answer2, answer3, answer4)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, questions)
+
+    _insert_many(db, "INSERT INTO students (cid, name, email, view_mode) VALUES (%s, %s, %s, %s)",
+                 generate_students(rng, n_students))
+    cursor = db.cursor()
+    cursor.execute("SELECT id FROM students WHERE cid >= %s ORDER BY id", (CID_BASE,))
+    student_ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+
+    profiles = student_profiles(rng, student_ids, len(difficulty))
+    _insert_many(db, """
+        INSERT INTO student_subject (id_student, id_subject, state, level) VALUES (%s, %s, %s, %s)
+    """, [(student_id, subject[0], state, level)
+          for student_id, (state, _, level) in profiles.items() for subject in subjects])
+    answers = _insert_many(db, """
+        INSERT INTO student_question
+        (id_student, id_question, mistake_number, num_attempts, first_attempt, second_attempt,
+         first_attempt_date, last_attempt_date)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, generate_answers(rng, profiles, difficulty, days, today))
+
+    rebuild_student_stats(db)
+    rebuild_question_stats(db)
+    rebuild_daily_activity(db)
+
+    return {
+        "subject": len(subjects),
+        "questions": len(questions),
+        "students": len(student_ids),
+        "student_subject": len(student_ids) * len(subjects),
+        "student_question": answers,
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos del Trivial")
+    parser.add_argument("--scale", choices=sorted(SCALES), help="Tamaño predefinido (número de estudiantes)")
+    parser.add_argument("--students", type=int, help="Número de estudiantes (sustituye a --scale)")
+    parser.add_argument("--subjects", type=int, default=1)
+    parser.add_argument("--per-level", type=int, default=40, help="Preguntas por nivel y asignatura")
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--days", type=int, default=180, help="Días de historial")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--create-schema", action="store_true", help="Crea las tablas base si no existen")
+    args = parser.parse_args(argv[1:])
+
+    n_students = args.students or SCALES[args.scale or "1k"]
+    db = db_connection()
+    try:
+        if args.create_schema:
+            create_schema(db)
+        start = time.perf_counter()
+        counts = generate(db, n_students, args.subjects, args.per_level, args.levels, args.days, args.seed)
+    finally:
+        db.close()
+
+    for table, rows in counts.items():
+        print(f"{table:18s} {rows:10d} filas")
+    print(f"Generado en {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,179 @@
+"""
+Prueba de carga del bot contra un servidor falso de la Bot API
+
+Encola N comandos (uno por chat) en FakeTelegramServer, arranca el runtime
+elegido apuntando a ese servidor y mide actualizaciones/s y latencias p50/p95/p99
+hasta la primera respuesta de cada chat.
+
+Uso (desde la raíz del repositorio):
+    python -m tools.load_test --runtime async --updates 500 --latency 0.05
+    python -m tools.load_test --runtime polling --updates 500 --latency 0.05
+    python -m tools.load_test --runtime webhook --updates 500 --latency 0.05 --queue-size 50 --policy defer
+
+En modo webhook el script hace de Telegram: envía cada actualización por POST
+a la app Flask con --connections peticiones simultáneas y reintenta las que
+reciben 503 (política defer), como hace Telegram. Con una cola pequeña se ve la
+contrapresión: actualizaciones aplazadas (defer) o descartadas (drop).
+
+Con --command ayuda no se toca la base de datos; el resto de comandos
+(jugar, clasificacion, misnumeros, promocion) necesitan un MySQL local
+configurado en config.py.
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot import apihelper
+
+from tools.fake_telegram_server import FakeTelegramServer
+
+
+def percentile(values, p):
+    """Percentil p (0-100) por el método del rango más cercano"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def wait_for_replies(server, expected, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if len(server.first_reply_latencies()) >= expected:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def report(name, server, started, expected):
+    latencies = server.first_reply_latencies()
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    last_reply = max((ts for ts, _, _ in server.calls), default=started)
+    busy = max(last_reply - started, 1e-9)
+
+    print(f"\n=== {name} ===")
+    print(f"Actualizaciones respondidas: {len(latencies)}/{expected}")
+    print(f"Throughput: {len(latencies) / busy:.1f} updates/s (tiempo total {elapsed:.2f}s)")
+    print(f"Latencia p50: {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"Latencia p95: {percentile(latencies, 95) * 1000:.1f} ms")
+    print(f"Latencia p99: {percentile(latencies, 99) * 1000:.1f} ms")
+    return latencies
+
+
+def run_async(server, args):
+    import bot as bot_module
+
+    runtime = bot_module.build_async_runtime(base_url=server.url)
+    application = runtime.build()
+
+    async def main():
+        async with application:
+            await application.start()
+            await application.updater.start_polling(timeout=1, poll_interval=0)
+            started = time.perf_counter()
+            for i in range(args.updates):
+                server.push_command(chat_id=10_000 + i, text=f"/{args.command}")
+            await asyncio.get_running_loop().run_in_executor(
+                None, wait_for_replies, server, args.updates, args.timeout
+            )
+            await application.updater.stop()
+            await application.stop()
+            return started
+
+    started = asyncio.run(main())
+    runtime.dispatcher.shutdown(wait=False)
+    return started
+
+
+def run_polling(server, args):
+    import bot as bot_module
+
+    thread = threading.Thread(
+        target=bot_module.bot.infinity_polling,
+        kwargs={"timeout": 1, "long_polling_timeout": 1},
+        daemon=True
+    )
+    thread.start()
+    started = time.perf_counter()
+    for i in range(args.updates):
+        server.push_command(chat_id=10_000 + i, text=f"/{args.command}")
+    wait_for_replies(server, args.updates, args.timeout)
+    bot_module.bot.stop_polling()
+    return started
+
+
+def run_webhook(server, args):
+    import requests
+    from werkzeug.serving import make_server
+
+    import bot as bot_module
+    from handlers.webhook import WEBHOOK_PATH
+
+    secret = "prueba-de-carga"
+    runtime = bot_module.build_webhook_runtime(
+        queue_size=args.queue_size, shard_queue_size=args.queue_size, policy=args.policy, secret=secret
+    )
+    http = make_server("127.0.0.1", 0, bot_module.app, threaded=True)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{http.server_port}{WEBHOOK_PATH}"
+
+    def deliver(update):
+        # Como Telegram: reintenta mientras el bot conteste 503
+        for _ in range(args.retries + 1):
+            response = requests.post(url, json=update, timeout=30,
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+            if response.status_code != 503:
+                return response.status_code
+            time.sleep(args.retry_delay)
+        return response.status_code
+
+    updates = [server.make_update(chat_id=10_000 + i, text=f"/{args.command}") for i in range(args.updates)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.connections) as pool:
+        codes = list(pool.map(deliver, updates))
+
+    stats = runtime.stats()
+    wait_for_replies(server, stats["encoladas"], args.timeout)
+    http.shutdown()
+    bot_module.dispatcher.shutdown(wait=False)
+
+    print("\nRespuestas HTTP: " + ", ".join(f"{code}: {codes.count(code)}" for code in sorted(set(codes))))
+    print("Webhook: " + ", ".join(f"{k}={v}" for k, v in runtime.stats().items()))
+    return started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del bot con una Bot API falsa")
+    parser.add_argument("--runtime", choices=["async", "polling", "webhook"], default="async")
+    parser.add_argument("--updates", type=int, default=300, help="Número de actualizaciones (una por chat)")
+    parser.add_argument("--command", default="ayuda", help="Comando a enviar sin '/' (ayuda no usa la BD)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Retardo artificial de la Bot API en segundos")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--queue-size", type=int, default=1000, help="Webhook: actualizaciones pendientes máximas")
+    parser.add_argument("--policy", choices=["defer", "drop"], default="defer", help="Webhook: política al saturarse")
+    parser.add_argument("--connections", type=int, default=40, help="Webhook: peticiones simultáneas de 'Telegram'")
+    parser.add_argument("--retries", type=int, default=20, help="Webhook: reintentos de una actualización aplazada")
+    parser.add_argument("--retry-delay", type=float, default=0.2, help="Webhook: segundos entre reintentos")
+    args = parser.parse_args()
+
+    server = FakeTelegramServer(latency=args.latency).start()
+    apihelper.API_URL = server.url + "/bot{0}/{1}"
+    try:
+        if args.runtime == "async":
+            started = run_async(server, args)
+        elif args.runtime == "webhook":
+            started = run_webhook(server, args)
+        else:
+            started = run_polling(server, args)
+        report(f"runtime={args.runtime} comando=/{args.command} latencia_api={args.latency}s",
+               server, started, args.updates)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()